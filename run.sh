@@ -64,8 +64,9 @@ cleanup() {
 # Trap Ctrl+C and cleanup
 trap cleanup SIGINT SIGTERM
 
-# Start backend
-echo "🔧 Starting backend server..."
+# Start backend (WORKERS > 1 serves with several processes sharing preloaded models)
+export WORKERS="${WORKERS:-1}"
+echo "🔧 Starting backend server (workers: $WORKERS)..."
 python src/main.py > backend.log 2>&1 &
 BACKEND_PID=$!
 echo "   Backend PID: $BACKEND_PID"
@@ -37,6 +37,12 @@ def create_market_analyst_agent():
     # Define tools
     tools = [qa_tool, insights_tool, extract_tool]
     
+    # Tool output is already formatted (citations, insights footer, JSON); for
+    # direct-return tools it becomes the response and the run ends there,
+    # saving the model turn that would only restate it
+    for agent_tool in tools:
+        agent_tool.return_direct = agent_tool.name in Config.DIRECT_RETURN_TOOLS
+    
     # Simple system prompt (no placeholders like {tools} or {tool_names} needed!)
     system_prompt = """You are an AI Market Analyst assistant that helps users analyze uploaded documents.
 
@@ -62,6 +68,9 @@ Instructions for tool selection:
   * Structured data export
   * Complete data extraction in schema format
 
+Compound requests:
+- If a request asks for more than one kind of output (e.g. "summarize the competitive landscape and give me the competitor data as JSON"), call every tool it needs in the same turn, each with the part of the request it should handle
+
 Always:
 - Select the most appropriate tool based on the query intent
 - Default to qa_tool for simple, direct questions
@@ -20,6 +20,16 @@ class Config:
     PINECONE_ENVIRONMENT: str = os.getenv("PINECONE_ENVIRONMENT", "us-east-1")
     PINECONE_INDEX_NAME: str = os.getenv("PINECONE_INDEX_NAME", "market-analyst-index")
     PINECONE_NAMESPACE: str = "innovate_inc"
+    PINECONE_SECTIONS_NAMESPACE: str = f"{PINECONE_NAMESPACE}__sections"  # Section/document centroids
+    # Async data-plane client (set PINECONE_INDEX_HOST to skip host lookup or to use a mock server)
+    PINECONE_INDEX_HOST: str = os.getenv("PINECONE_INDEX_HOST", "")
+    PINECONE_CONTROLLER_HOST: str = os.getenv("PINECONE_CONTROLLER_HOST", "https://api.pinecone.io")
+    PINECONE_MAX_CONNECTIONS: int = int(os.getenv("PINECONE_MAX_CONNECTIONS", "20"))
+    PINECONE_MAX_CONCURRENCY: int = int(os.getenv("PINECONE_MAX_CONCURRENCY", "4"))
+    PINECONE_UPSERT_BATCH_SIZE: int = 100
+    PINECONE_DELETE_BATCH_SIZE: int = 1000
+    PINECONE_TIMEOUT_SECONDS: float = 30.0
+    INDEX_STATS_REFRESH_SECONDS: float = float(os.getenv("INDEX_STATS_REFRESH_SECONDS", "30"))
     
     # Model Configuration
     GEMINI_MODEL: str = "gemini-2.5-flash"  # Free tier model
@@ -27,15 +37,154 @@ class Config:
     EMBEDDING_DIMENSION: int = 384
     
     # Chunking Configuration
+    # CHUNK_MODE: "characters" (CHUNK_SIZE/CHUNK_OVERLAP in chars) or
+    # "tokens" (CHUNK_SIZE_TOKENS/CHUNK_OVERLAP_TOKENS in embedding tokenizer tokens)
+    CHUNK_MODE: str = os.getenv("CHUNK_MODE", "characters")
     CHUNK_SIZE: int = 400
     CHUNK_OVERLAP: int = 80
+    CHUNK_SIZE_TOKENS: int = int(os.getenv("CHUNK_SIZE_TOKENS", "120"))
+    CHUNK_OVERLAP_TOKENS: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", "24"))
+    EMBEDDING_MAX_TOKENS: int = 128  # all-MiniLM-L12-v2 max_seq_length (incl. special tokens)
+    TOKEN_COUNT_CACHE_SIZE: int = 50000
     
     # Retrieval Configuration
     RETRIEVAL_K: int = 4
     RELEVANCE_THRESHOLD: float = 0.7
     
+    # Adaptive retrieval depth (k chosen per query from the score curve, within per-tool bounds)
+    ADAPTIVE_K_ENABLED: bool = os.getenv("ADAPTIVE_K_ENABLED", "1") == "1"
+    ADAPTIVE_K_RELATIVE_FLOOR: float = float(os.getenv("ADAPTIVE_K_RELATIVE_FLOOR", "0.9"))  # Fraction of top score
+    ADAPTIVE_K_MAX_GAP: float = float(os.getenv("ADAPTIVE_K_MAX_GAP", "0.05"))  # Largest drop between neighbours
+    QA_MIN_K: int = int(os.getenv("QA_MIN_K", "1"))
+    QA_MAX_K: int = int(os.getenv("QA_MAX_K", "8"))
+    INSIGHTS_MIN_K: int = int(os.getenv("INSIGHTS_MIN_K", "3"))
+    INSIGHTS_MAX_K: int = int(os.getenv("INSIGHTS_MAX_K", "10"))
+    EXTRACT_MIN_K: int = int(os.getenv("EXTRACT_MIN_K", "10"))  # High floor: every schema field must be covered
+    EXTRACT_MAX_K: int = int(os.getenv("EXTRACT_MAX_K", "15"))
+    
+    # Coarse-to-fine retrieval: section centroids first, then chunks within the top sections
+    # (used once the corpus reaches HIERARCHICAL_MIN_CHUNKS; a document stage is added
+    # before the section stage from HIERARCHICAL_DOCUMENT_STAGE_MIN documents)
+    HIERARCHICAL_RETRIEVAL_ENABLED: bool = os.getenv("HIERARCHICAL_RETRIEVAL_ENABLED", "1") == "1"
+    HIERARCHICAL_MIN_CHUNKS: int = int(os.getenv("HIERARCHICAL_MIN_CHUNKS", "20000"))
+    HIERARCHICAL_TOP_SECTIONS: int = int(os.getenv("HIERARCHICAL_TOP_SECTIONS", "8"))
+    HIERARCHICAL_DOCUMENT_STAGE_MIN: int = int(os.getenv("HIERARCHICAL_DOCUMENT_STAGE_MIN", "500"))
+    HIERARCHICAL_TOP_DOCUMENTS: int = int(os.getenv("HIERARCHICAL_TOP_DOCUMENTS", "20"))
+    
+    # Speculative retrieval: search for the query while the agent is still routing it
+    SPECULATIVE_RETRIEVAL_ENABLED: bool = os.getenv("SPECULATIVE_RETRIEVAL_ENABLED", "1") == "1"
+    
+    # Reranking Configuration (cross-encoder over a wider candidate pool)
+    RERANK_ENABLED: bool = os.getenv("RERANK_ENABLED", "0") == "1"
+    RERANK_MODEL: str = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANK_CANDIDATES: int = int(os.getenv("RERANK_CANDIDATES", "25"))
+    RERANK_TOP_N: int = int(os.getenv("RERANK_TOP_N", "5"))
+    RERANK_BATCH_SIZE: int = 16
+    
+    # Digest Configuration (precomputed section digests + document summaries)
+    BUILD_DIGESTS: bool = os.getenv("BUILD_DIGESTS", "0") == "1"
+    DIGEST_SECTION_MAX_CHARS: int = 8000
+    DIGEST_MAX_CONCURRENCY: int = 4
+    DIGEST_MAX_DOCUMENTS: int = 3  # Documents (of the retrieved chunks) whose digests go into broad answers
+    DIGEST_RETRIEVAL_K: int = 3  # Targeted chunks added to digests for broad requests
+    
+    # Rule-based extraction (the LLM only fills missing / low-confidence fields)
+    EXTRACT_RULES_ENABLED: bool = os.getenv("EXTRACT_RULES_ENABLED", "1") == "1"
+    EXTRACT_MIN_CONFIDENCE: float = float(os.getenv("EXTRACT_MIN_CONFIDENCE", "0.75"))
+
+    # Direct return: these tools' output is the final answer (no agent synthesis turn)
+    DIRECT_RETURN_TOOLS: list = [
+        name.strip()
+        for name in os.getenv("DIRECT_RETURN_TOOLS", "qa_tool,insights_tool,extract_tool").split(",")
+        if name.strip()
+    ]
+
+    # Prompt-prefix caching for the tools' static prompts: "gemini" (context caching),
+    # "fake" (local simulation for testing) or "none". The static prompts alone are
+    # below PROMPT_CACHE_MIN_TOKENS; caching needs PROMPT_CACHE_DOCUMENTS=1
+    PROMPT_CACHE_PROVIDER: str = os.getenv("PROMPT_CACHE_PROVIDER", "none")
+    PROMPT_CACHE_TTL_SECONDS: int = int(os.getenv("PROMPT_CACHE_TTL_SECONDS", "3600"))
+    PROMPT_CACHE_MIN_TOKENS: int = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))  # Gemini's minimum cacheable size
+    PROMPT_CACHE_DOCUMENTS: bool = os.getenv("PROMPT_CACHE_DOCUMENTS", "0") == "1"  # Also cache the report context
+
+    # Independent tool calls from one agent turn run concurrently (compound requests)
+    AGENT_MAX_TOOL_CONCURRENCY: int = int(os.getenv("AGENT_MAX_TOOL_CONCURRENCY", "3"))
+
     # Application Settings
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    # Per-request diagnostics (chosen k, prompt sizes, rerank timings) are printed
+    # only at DEBUG; they are always recorded in /api/stats metrics
+    VERBOSE_LOGGING: bool = LOG_LEVEL.upper() == "DEBUG"
+    # Diagnostics: /debug/* endpoints are disabled unless DEBUG_TOKEN is set
+    DEBUG_TOKEN: str = os.getenv("DEBUG_TOKEN", "")
+    PROFILE_MAX_SECONDS: float = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+    SLOW_REQUEST_MS: float = float(os.getenv("SLOW_REQUEST_MS", "5000"))  # 0 disables slow-request capture
+    SLOW_REQUEST_BUFFER_SIZE: int = int(os.getenv("SLOW_REQUEST_BUFFER_SIZE", "50"))
+    EVENT_LOOP_LAG_INTERVAL_MS: float = float(os.getenv("EVENT_LOOP_LAG_INTERVAL_MS", "100"))
+    # Multi-process serving (WORKERS > 1 preloads the app, then forks workers)
+    WORKERS: int = int(os.getenv("WORKERS", "1"))
+    HOST: str = os.getenv("HOST", "0.0.0.0")
+    PORT: int = int(os.getenv("PORT", "8000"))
+    
+    # Shared caches: "sqlite" (shared across worker processes), "redis" or "memory"
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "sqlite")
+    CACHE_PATH: str = os.getenv("CACHE_PATH", "")  # Default: private per-user dir on /dev/shm if available, else STORAGE_DIR
+    CACHE_URL: str = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+    CACHE_MAX_ENTRIES: int = 100000
+    ANSWER_CACHE_TTL_SECONDS: int = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "300"))  # 0 disables
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = 86400
+    # Persistent document-embedding cache (memory-mapped matrix under STORAGE_DIR)
+    EMBEDDING_CACHE_ENABLED: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "1") == "1"
+    EMBEDDING_CACHE_DTYPE: str = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")  # float16 or float32
+    EMBEDDING_CACHE_MAX_ROWS: int = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "1000000"))
+    # Local compressed vector index, searched instead of Pinecone: "none" (disabled),
+    # "float32", "float16", "int8" or "pq" (product quantization)
+    LOCAL_INDEX_CODEC: str = os.getenv("LOCAL_INDEX_CODEC", "none")
+    LOCAL_INDEX_RESCORE: bool = os.getenv("LOCAL_INDEX_RESCORE", "1") == "1"  # Exact rescoring from the embedding cache
+    LOCAL_INDEX_RESCORE_CANDIDATES: int = int(os.getenv("LOCAL_INDEX_RESCORE_CANDIDATES", "4"))  # Candidates per result
+    PQ_SUBVECTORS: int = int(os.getenv("PQ_SUBVECTORS", "48"))  # Bytes per vector; must divide EMBEDDING_DIMENSION
+    PQ_TRAINING_SAMPLE: int = int(os.getenv("PQ_TRAINING_SAMPLE", "65536"))  # Vectors used to learn codec parameters
+    # Chunks needed before int8/pq parameters are learned (Pinecone is searched until then)
+    LOCAL_INDEX_MIN_TRAINING_ROWS: int = int(os.getenv("LOCAL_INDEX_MIN_TRAINING_ROWS", "4096"))
+    
+    MAX_CONCURRENT_QUERIES: int = int(os.getenv("MAX_CONCURRENT_QUERIES", "8"))  # Slots shared by all lanes
+    # Priority lanes: concurrency cap, max queue wait before shedding (503),
+    # requests/minute quota (0 = unlimited) and max queued requests
+    LANES: dict = {
+        "interactive": {
+            "concurrency": int(os.getenv("LANE_INTERACTIVE_CONCURRENCY", "8")),
+            "max_wait_seconds": float(os.getenv("LANE_INTERACTIVE_MAX_WAIT_SECONDS", "10")),
+            "rate_per_minute": int(os.getenv("LANE_INTERACTIVE_RATE_PER_MINUTE", "0")),
+            "max_queue": 64,
+        },
+        "analytical": {
+            "concurrency": int(os.getenv("LANE_ANALYTICAL_CONCURRENCY", "4")),
+            "max_wait_seconds": float(os.getenv("LANE_ANALYTICAL_MAX_WAIT_SECONDS", "30")),
+            "rate_per_minute": int(os.getenv("LANE_ANALYTICAL_RATE_PER_MINUTE", "60")),
+            "max_queue": 32,
+        },
+        "bulk": {
+            "concurrency": int(os.getenv("LANE_BULK_CONCURRENCY", "2")),
+            "max_wait_seconds": float(os.getenv("LANE_BULK_MAX_WAIT_SECONDS", "120")),
+            "rate_per_minute": int(os.getenv("LANE_BULK_RATE_PER_MINUTE", "0")),
+            "max_queue": 16,
+        },
+    }
+    MAX_UPLOAD_BYTES: int = int(os.getenv("MAX_UPLOAD_MB", "100")) * 1024 * 1024
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024
+    UPLOAD_SPOOL_DIR: str = os.getenv("UPLOAD_SPOOL_DIR", "")  # Empty = system temp dir
+    INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+    STORAGE_DIR: str = os.getenv("STORAGE_DIR", "storage")  # Local state (digests, caches)
+    # Document lifecycle: default expiry for ingested documents (0 = never) and sweep interval
+    DOCUMENT_TTL_SECONDS: float = float(os.getenv("DOCUMENT_TTL_SECONDS", "0"))
+    DOCUMENT_SWEEP_INTERVAL_SECONDS: float = float(os.getenv("DOCUMENT_SWEEP_INTERVAL_SECONDS", "300"))
+    
+    # Response compression (brotli preferred when installed and accepted, else gzip)
+    COMPRESSION_ENABLED: bool = os.getenv("COMPRESSION_ENABLED", "1") == "1"
+    COMPRESSION_MIN_BYTES: int = int(os.getenv("COMPRESSION_MIN_BYTES", "500"))
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 4  # Low quality levels are fast enough for dynamic responses
     
     @classmethod
     def validate(cls) -> None:
@@ -0,0 +1,263 @@
+"""
+Bulk document ingestion CLI.
+
+Loads a directory, .zip archive or glob of .txt/.pdf files into the vector
+store using a pool of worker processes (parse → chunk → embed → upsert).
+Progress is checkpointed to a JSONL state file so interrupted runs resume
+where they left off.
+
+Usage:
+    python src/ingest.py data/reports/ --workers 4
+    python src/ingest.py reports_archive.zip
+    python src/ingest.py "data/**/*.pdf" --state-file storage/seed_state.jsonl
+    python src/ingest.py data/reports/ --compact-embeddings
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Add src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import Config
+
+
+SUPPORTED_EXTENSIONS = (".txt", ".pdf")
+ARCHIVE_SEPARATOR = "::"
+
+# Per-process services, created by _init_worker
+_processor = None
+_vector_store_manager = None
+_digest_builder = None
+
+
+def collect_items(target: str) -> List[Tuple[str, str]]:
+    """
+    Expand a directory, zip archive or glob into work items.
+
+    Returns:
+        List of (item_key, source_name) tuples. Keys identify the exact file
+        version (path + size + mtime, or archive member + CRC) for checkpoints.
+    """
+    items = []
+
+    if target.lower().endswith(".zip") and os.path.isfile(target):
+        with zipfile.ZipFile(target) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                    continue
+                key = f"{target}{ARCHIVE_SEPARATOR}{info.filename}:{info.file_size}:{info.CRC}"
+                items.append((key, info.filename))
+        return items
+
+    if os.path.isdir(target):
+        paths = [str(p) for p in sorted(Path(target).rglob("*")) if p.is_file()]
+        base = target
+    else:
+        paths = sorted(glob.glob(target, recursive=True))
+        base = os.path.commonpath(paths) if len(paths) > 1 else os.path.dirname(target)
+
+    for path in paths:
+        if not path.lower().endswith(SUPPORTED_EXTENSIONS):
+            continue
+        stat = os.stat(path)
+        key = f"{path}:{stat.st_size}:{int(stat.st_mtime)}"
+        items.append((key, os.path.relpath(path, base) if base else path))
+    return items
+
+
+def _read_item(item_key: str, source: str) -> Tuple[bytes, str]:
+    """Read raw bytes for a work item (filesystem path or archive member)."""
+    path = item_key.rsplit(":", 2)[0]
+    if ARCHIVE_SEPARATOR in path:
+        archive_path, member = path.split(ARCHIVE_SEPARATOR, 1)
+        with zipfile.ZipFile(archive_path) as archive:
+            return archive.read(member), source
+    with open(path, "rb") as f:
+        return f.read(), source
+
+
+def _init_worker(workers: int, build_digests: bool):
+    """Create per-process services and split CPU threads between workers."""
+    global _processor, _vector_store_manager, _digest_builder
+
+    try:
+        import torch
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    except ImportError:
+        pass
+
+    from services.document_processor import DocumentProcessor
+    from services.vector_store import get_vector_store_manager
+
+    _processor = DocumentProcessor()
+    _vector_store_manager = get_vector_store_manager()
+    if build_digests:
+        from services.digests import DigestBuilder
+        _digest_builder = DigestBuilder()
+
+
+def _ingest_item(item_key: str, source: str) -> Dict:
+    """Parse, chunk, embed and upsert one document (runs in a worker process)."""
+    start_time = time.time()
+    result = {"key": item_key, "source": source, "chunks": 0, "bytes": 0}
+
+    try:
+        data, source = _read_item(item_key, source)
+        result["bytes"] = len(data)
+
+        text = _processor.extract_text(data, source)
+        documents = _processor.process_document(text=text, source=source)
+        if not documents:
+            raise ValueError("No sections with content found")
+
+        # Stable per-source IDs so files never overwrite each other's chunks
+        id_prefix = _vector_store_manager.source_id_prefix(source)
+        ingest_result = _vector_store_manager.ingest_documents(documents, id_prefix=id_prefix)
+        if ingest_result["status"] == "error":
+            raise RuntimeError(ingest_result["error"])
+        result["chunks"] = len(documents)
+
+        if _digest_builder is not None:
+            # Stored by the parent process so only one process writes the digest file
+            result["digests"] = _digest_builder.build(_processor.extract_sections(text), source)
+
+        result["status"] = "success"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+
+    result["seconds"] = round(time.time() - start_time, 3)
+    return result
+
+
+def load_checkpoint(state_file: str) -> Dict[str, Dict]:
+    """Load completed items from the JSONL state file (last entry per key wins)."""
+    completed = {}
+    if not os.path.exists(state_file):
+        return completed
+    with open(state_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partial line from an interrupted write
+            if entry.get("status") == "success":
+                completed[entry["key"]] = entry
+            else:
+                completed.pop(entry["key"], None)
+    return completed
+
+
+def run(target: str, workers: int, state_file: str, build_digests: bool = False) -> Dict:
+    """
+    Ingest everything under target, skipping items already checkpointed.
+
+    Returns:
+        Summary statistics
+    """
+    items = collect_items(target)
+    completed = load_checkpoint(state_file)
+    pending = [(key, source) for key, source in items if key not in completed]
+
+    print(f"[Ingest] {len(items)} documents found, {len(items) - len(pending)} already ingested, {len(pending)} to go")
+    if not pending:
+        return {"documents": 0, "chunks": 0, "errors": 0, "seconds": 0.0}
+
+    Path(state_file).parent.mkdir(parents=True, exist_ok=True)
+    start_time = time.time()
+    done = chunks = errors = total_bytes = 0
+
+    with open(state_file, "a", encoding="utf-8") as state, ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(workers, build_digests)
+    ) as pool:
+        futures = {pool.submit(_ingest_item, key, source): key for key, source in pending}
+
+        digest_store = None
+        if build_digests:
+            from services.digests import get_digest_store
+            digest_store = get_digest_store()
+
+        for future in as_completed(futures):
+            result = future.result()
+            digests = result.pop("digests", None)
+            if digests is not None:
+                digest_store.put(result["source"], digests["summary"], digests["sections"])
+            result["at"] = time.time()
+            state.write(json.dumps(result) + "\n")
+            state.flush()
+
+            done += 1
+            if result["status"] == "success":
+                chunks += result["chunks"]
+                total_bytes += result["bytes"]
+            else:
+                errors += 1
+                print(f"[Ingest] ✗ {result['source']}: {result['error']}")
+
+            elapsed = max(time.time() - start_time, 1e-6)
+            print(
+                f"[Ingest] {done}/{len(pending)} docs | {chunks} chunks | "
+                f"{done / elapsed:.2f} docs/s | {chunks / elapsed:.1f} chunks/s | "
+                f"{total_bytes / elapsed / 1e6:.2f} MB/s"
+            )
+
+    elapsed = time.time() - start_time
+    summary = {
+        "documents": done - errors,
+        "chunks": chunks,
+        "errors": errors,
+        "seconds": round(elapsed, 1),
+    }
+    print(
+        f"[Ingest] Done: {summary['documents']} documents, {chunks} chunks, {errors} errors "
+        f"in {elapsed:.1f}s. Failed items will be retried on the next run."
+    )
+    return summary
+
+
+def compact_embeddings() -> Dict:
+    """Rewrite the embedding cache, keeping only vectors for chunks in the chunk store."""
+    from services.chunk_store import get_chunk_store
+    from services.embedding_cache import get_embedding_cache
+
+    return get_embedding_cache().compact(get_chunk_store().texts())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk-ingest .txt/.pdf documents into the vector store.")
+    parser.add_argument("target", help="Directory, .zip archive or glob pattern (quote globs)")
+    parser.add_argument("--workers", type=int, default=Config.INGEST_WORKERS, help="Worker processes")
+    parser.add_argument(
+        "--state-file",
+        default=os.path.join(Config.STORAGE_DIR, "ingest_state.jsonl"),
+        help="Checkpoint file used to resume interrupted runs"
+    )
+    parser.add_argument("--build-digests", action="store_true", help="Also build section digests and summaries")
+    parser.add_argument(
+        "--compact-embeddings",
+        action="store_true",
+        help="Afterwards, drop cached embeddings for chunks no longer in the chunk store"
+    )
+    args = parser.parse_args(argv)
+
+    summary = run(args.target, max(1, args.workers), args.state_file, build_digests=args.build_digests)
+    if args.compact_embeddings and Config.EMBEDDING_CACHE_ENABLED:
+        compact_embeddings()
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
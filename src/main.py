@@ -4,22 +4,64 @@ FastAPI application for AI Market Analyst.
 MODERN VERSION - Uses LangChain 1.0 create_agent with messages-based invocation
 Migrated from deprecated AgentExecutor to modern agent API
 """
+import asyncio
+import hashlib
+import hmac
+import os
 import time
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional
+from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+try:
+    import orjson  # noqa: F401  (required by ORJSONResponse)
+    from fastapi.responses import ORJSONResponse as DefaultJSONResponse
+except ImportError:
+    DefaultJSONResponse = JSONResponse
 
 from config import Config
 from schemas.models import QueryRequest, QueryResponse
 from agent import agent
 from services.document_processor import DocumentProcessor
-from services.vector_store import VectorStoreManager
+from services.vector_store import get_vector_store_manager
+from services.digests import DigestBuilder, get_digest_store
+from services.reranker import get_reranker
+from services.tokenizer import get_token_counter
+from services.metrics import metrics
+from services.upload_spool import spool_upload, SpooledUpload, UploadTooLargeError
+from services.shared_cache import get_cache, cache_sizes
+from services.compression import CompressionMiddleware
+from services.single_flight import AsyncSingleFlight
+from services.prompt_cache import get_prompt_cache
+from services.scheduler import get_scheduler, classify_query, LaneOverloadedError, BULK
+from services.request_trace import get_request_tracer, in_stage, annotate
+from services.profiling import get_profiler, folded, ProfilerBusyError
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background index stats refresh, local index build, document expiry and loop-lag monitoring; close pooled connections on shutdown."""
+    vector_store_manager.start()
+    if vector_store_manager.local_index is not None:
+        vector_store_manager.local_index.warm()
+    expiry_task = asyncio.create_task(expire_documents())
+    monitor_task = asyncio.create_task(request_tracer.monitor())
+    yield
+    expiry_task.cancel()
+    monitor_task.cancel()
+    await vector_store_manager.aclose()
 
 
 # Initialize FastAPI app
 app = FastAPI(
     title="AI Market Analyst API",
     description="Multi-functional AI agent for market research analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=DefaultJSONResponse
 )
 
 # Add CORS middleware
@@ -31,9 +73,139 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Negotiated brotli/gzip compression for JSON payloads
+if Config.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=Config.COMPRESSION_MIN_BYTES,
+        gzip_level=Config.GZIP_LEVEL,
+        brotli_quality=Config.BROTLI_QUALITY
+    )
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Reject uploads by Content-Length before the multipart body is read."""
+    if request.url.path == "/api/upload" or (
+        request.method == "PUT" and request.url.path.startswith("/api/documents/")
+    ):
+        content_length = request.headers.get("content-length")
+        # Allow some headroom for multipart boundaries and form headers
+        if content_length and content_length.isdigit() and int(content_length) > Config.MAX_UPLOAD_BYTES + 64 * 1024:
+            return DefaultJSONResponse(
+                status_code=413,
+                content={"detail": f"File exceeds the maximum upload size of {Config.MAX_UPLOAD_BYTES // (1024 * 1024)} MB."}
+            )
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def track_in_flight(request: Request, call_next):
+    """Count in-flight requests for the stats endpoint."""
+    metrics.gauge_add("in_flight_requests", 1)
+    try:
+        return await call_next(request)
+    finally:
+        metrics.gauge_add("in_flight_requests", -1)
+
+
+# Stage timings for every request; slow ones are kept for /debug/slow-requests
+request_tracer = get_request_tracer()
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Time requests by stage and record those over SLOW_REQUEST_MS."""
+    if request.url.path.startswith("/debug/"):
+        return await call_next(request)
+    with request_tracer.trace(request.method, request.url.path) as trace:
+        response = await call_next(request)
+        trace.status = response.status_code
+        return response
+
+
 # Initialize services
 document_processor = DocumentProcessor()
-vector_store_manager = VectorStoreManager()
+vector_store_manager = get_vector_store_manager()
+digest_store = get_digest_store()
+digest_builder = None  # Created on first use (needs LLM credentials)
+
+# Agent runs are blocking; run them in worker threads with bounded concurrency
+# so the event loop (and health checks) stay responsive. Interactive questions,
+# analytical runs and uploads get separate lanes with their own budgets.
+scheduler = get_scheduler()
+
+# Concurrent identical queries and uploads attach to one in-flight run
+query_flight = AsyncSingleFlight("queries")
+upload_flight = AsyncSingleFlight("uploads")
+
+# Answer cache, shared across worker processes. Keys include a corpus
+# generation that every upload bumps, so new documents invalidate old answers.
+answer_cache = get_cache("answers")
+
+
+def answer_cache_key(query: str) -> Optional[str]:
+    """Cache key for a query under the current corpus generation (None if disabled)."""
+    if Config.ANSWER_CACHE_TTL_SECONDS <= 0:
+        return None
+    generation = answer_cache.get("__generation__") or 0
+    normalized = " ".join(query.lower().split())
+    return hashlib.sha1(f"{generation}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+def invalidate_answers() -> None:
+    """Start a new corpus generation so cached answers are no longer used."""
+    # Atomic: concurrent uploads in different workers must not bump to the same generation
+    answer_cache.incr("__generation__")
+
+
+# Local stats reported by /api/stats (cheap, in-memory only)
+metrics.register("caches", lambda: {
+    "token_counts": get_token_counter().cache_info(),
+    "rerank_scores": get_reranker().stats() if Config.RERANK_ENABLED else {"enabled": False},
+    "digest_documents": len(digest_store),
+    "chunk_store": vector_store_manager.chunk_store.stats(),
+    "registered_documents": len(vector_store_manager.registry),
+    "document_embeddings": (
+        vector_store_manager.embeddings.document_cache.stats()
+        if vector_store_manager.embeddings.document_cache is not None else {"enabled": False}
+    ),
+    "local_index": (
+        vector_store_manager.local_index.stats()
+        if vector_store_manager.local_index is not None else {"enabled": False}
+    ),
+    "shared": cache_sizes(),
+})
+metrics.register("queue_depth", lambda: scheduler.waiting)
+metrics.register("lanes", scheduler.stats)
+metrics.register("prompt_cache", lambda: get_prompt_cache().stats())
+metrics.register("request_tracing", request_tracer.stats)
+
+
+def overloaded(error: LaneOverloadedError) -> HTTPException:
+    """503 response for a request shed by the lane scheduler."""
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+def build_document_digests(text: str, source: str) -> None:
+    """Build and store section digests and a document summary (background task)."""
+    global digest_builder
+    try:
+        if digest_builder is None:
+            digest_builder = DigestBuilder()
+        start_time = time.time()
+        digests = digest_builder.build(document_processor.extract_sections(text), source)
+        digest_store.put(source, digests["summary"], digests["sections"])
+        print(
+            f"[Digests] Built {len(digests['sections'])} section digests for {source} "
+            f"in {time.time() - start_time:.1f}s"
+        )
+    except Exception as e:
+        print(f"[Digests] Warning: failed to build digests for {source}: {e}")
 
 
 @app.get("/")
@@ -46,11 +218,149 @@ async def root():
         "endpoints": {
             "query": "/api/query",
             "upload": "/api/upload",
-            "health": "/api/health"
+            "documents": "/api/documents",
+            "health": "/api/health",
+            "ready": "/api/ready",
+            "stats": "/api/stats"
         }
     }
 
 
+def message_text(message) -> str:
+    """Text of an agent or tool message (content may be a string or a list of parts)."""
+    # Handle different content formats (string, list, etc.)
+    if hasattr(message, 'content'):
+        content = message.content
+        # If content is a list, extract text from list items
+        if isinstance(content, list):
+            # Handle list of strings or other objects
+            text_parts = []
+            for item in content:
+                if isinstance(item, str):
+                    text_parts.append(item)
+                elif hasattr(item, 'text'):
+                    text_parts.append(item.text)
+                elif hasattr(item, 'content'):
+                    text_parts.append(str(item.content))
+                else:
+                    text_parts.append(str(item))
+            text = '\n'.join(text_parts) if text_parts else str(content)
+        else:
+            text = str(content)
+    else:
+        text = str(message)
+
+    # Final safety check - ensure text is always a non-empty string
+    if not text or not isinstance(text, str):
+        # Fallback: convert entire message to string
+        text = str(message)
+    return text
+
+
+def tool_failed(msg) -> bool:
+    """
+    Check whether a tool message reports a failure.
+    
+    Tools return failures as ordinary text with no artifact (QA, insights)
+    or as an artifact with an "error" key (extract).
+    """
+    if getattr(msg, 'status', None) == 'error':
+        return True
+    artifact = getattr(msg, 'artifact', None)
+    return artifact is None or (isinstance(artifact, dict) and "error" in artifact)
+
+
+async def answer_query(query: str, cache_key: Optional[str]) -> dict:
+    """
+    Run the agent for a query and extract the answer, tools used and tool data.
+    
+    Stores the outcome in the answer cache when cache_key is given and no
+    tool call failed.
+    """
+    # Invoke agent with modern LangChain 1.0 pattern (messages-based)
+    # Input format: {"messages": [{"role": "user", "content": "..."}]}
+    # Tool calls from one model turn run concurrently, bounded by max_concurrency
+    lane = classify_query(query)
+    annotate(lane=lane)
+    async with scheduler.slot(lane):
+        # Tool calls in this run share searches; the search for the query itself
+        # starts now so it overlaps the routing LLM call
+        with vector_store_manager.search_scope(query):
+            result = await asyncio.to_thread(
+                in_stage,
+                "agent",
+                agent.invoke,
+                {"messages": [{"role": "user", "content": query}]},
+                {"max_concurrency": Config.AGENT_MAX_TOOL_CONCURRENCY}
+            )
+    metrics.increment("queries_processed")
+
+    # Extract answer from result
+    # Modern create_agent returns {"messages": [...]} where last message is the response
+    messages = result.get("messages", [])
+
+    if not messages:
+        raise ValueError("No messages in agent response")
+
+    # Direct-return tools end the run with their tool messages (several when the
+    # agent called several tools in one turn); otherwise the agent's last message
+    final_messages = []
+    for msg in reversed(messages):
+        if getattr(msg, 'type', None) != 'tool':
+            break
+        final_messages.insert(0, msg)
+    if final_messages:
+        metrics.increment("direct_returns")
+    else:
+        final_messages = [messages[-1]]
+
+    answer = "\n\n---\n\n".join(message_text(msg) for msg in final_messages)
+
+    # Detect which tools were used by examining messages
+    tools_used = []
+    for msg in messages:
+        # Tool call messages have tool_calls attribute
+        for tool_call in getattr(msg, 'tool_calls', None) or []:
+            name = tool_call.get('name', 'unknown_tool')
+            if name not in tools_used:
+                tools_used.append(name)
+    if not tools_used:
+        # Or check tool messages
+        tools_used = list(dict.fromkeys(
+            getattr(msg, 'name', None) or 'unknown_tool'
+            for msg in messages if getattr(msg, 'type', None) == 'tool'
+        ))
+    tool_used = tools_used[0] if tools_used else None
+
+    # Structured tool output from the last tool turn, passed through as-is
+    # (keyed by tool name when several tools ran)
+    last_turn = []
+    for msg in reversed(messages):
+        if getattr(msg, 'type', None) == 'tool':
+            last_turn.insert(0, msg)
+        elif last_turn:
+            break
+    if len(last_turn) == 1:
+        data = getattr(last_turn[0], 'artifact', None)
+    elif last_turn:
+        data = {getattr(msg, 'name', None) or 'unknown_tool': getattr(msg, 'artifact', None) for msg in last_turn}
+    else:
+        data = None
+
+    outcome = {
+        "answer": answer,
+        "tool_used": tool_used or "direct_response",
+        "tools_used": tools_used,
+        "data": data
+    }
+    if cache_key:
+        if any(tool_failed(msg) for msg in messages if getattr(msg, 'type', None) == 'tool'):
+            metrics.increment("answer_cache_skipped_errors")
+        else:
+            await asyncio.to_thread(answer_cache.set, cache_key, outcome, ttl=Config.ANSWER_CACHE_TTL_SECONDS)
+    return outcome
+
+
 @app.post("/api/query", response_model=QueryResponse)
 async def query_agent(request: QueryRequest):
     """
@@ -68,73 +378,45 @@ async def query_agent(request: QueryRequest):
     # Generate session ID (note: current implementation doesn't use it for memory)
     # For proper session-based memory, would need to implement custom memory management
     session_id = request.session_id or f"session_{int(time.time())}"
+    annotate(query=request.query[:200])
     
     try:
-        # Invoke agent with modern LangChain 1.0 pattern (messages-based)
-        # Input format: {"messages": [{"role": "user", "content": "..."}]}
-        result = agent.invoke({
-            "messages": [{"role": "user", "content": request.query}]
-        })
-        
-        # Extract answer from result
-        # Modern create_agent returns {"messages": [...]} where last message is the response
-        messages = result.get("messages", [])
-        
-        if not messages:
-            raise ValueError("No messages in agent response")
-        
-        # Get the last message (agent's response)
-        last_message = messages[-1]
-        
-        # Handle different content formats (string, list, etc.)
-        if hasattr(last_message, 'content'):
-            content = last_message.content
-            # If content is a list, extract text from list items
-            if isinstance(content, list):
-                # Handle list of strings or other objects
-                text_parts = []
-                for item in content:
-                    if isinstance(item, str):
-                        text_parts.append(item)
-                    elif hasattr(item, 'text'):
-                        text_parts.append(item.text)
-                    elif hasattr(item, 'content'):
-                        text_parts.append(str(item.content))
-                    else:
-                        text_parts.append(str(item))
-                answer = '\n'.join(text_parts) if text_parts else str(content)
-            else:
-                answer = str(content)
-        else:
-            answer = str(last_message)
-        
-        # Final safety check - ensure answer is always a non-empty string
-        if not answer or not isinstance(answer, str):
-            # Fallback: convert entire message to string
-            answer = str(last_message)
+        # Shared answer cache (visible to every worker process); SQLite/Redis
+        # calls run in a worker thread to keep them off the event loop
+        cache_key = await asyncio.to_thread(answer_cache_key, request.query)
+        if cache_key:
+            cached = await asyncio.to_thread(answer_cache.get, cache_key)
+            if cached is not None:
+                metrics.increment("answer_cache_hits")
+                annotate(cached=True)
+                return QueryResponse(
+                    answer=cached["answer"],
+                    tool_used=cached["tool_used"],
+                    tools_used=cached.get("tools_used"),
+                    data=cached.get("data"),
+                    session_id=session_id,
+                    execution_time_ms=int((time.time() - start_time) * 1000),
+                    cached=True
+                )
         
-        # Detect which tool was used by examining messages
-        tool_used = None
-        for msg in messages:
-            # Tool call messages have tool_calls attribute
-            if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                tool_used = msg.tool_calls[0].get('name', 'unknown_tool')
-                break
-            # Or check if it's a tool message
-            elif hasattr(msg, 'type') and msg.type == 'tool':
-                tool_used = getattr(msg, 'name', 'unknown_tool')
-                break
+        # Identical concurrent queries (e.g. dashboard refreshes) share one agent run
+        flight_key = cache_key or " ".join(request.query.lower().split())
+        outcome = await query_flight.do(flight_key, lambda: answer_query(request.query, cache_key))
         
         # Calculate execution time
         execution_time = int((time.time() - start_time) * 1000)
         
         return QueryResponse(
-            answer=answer,
-            tool_used=tool_used or "direct_response",
+            answer=outcome["answer"],
+            tool_used=outcome["tool_used"],
+            tools_used=outcome["tools_used"],
+            data=outcome["data"],
             session_id=session_id,
             execution_time_ms=execution_time
         )
         
+    except LaneOverloadedError as e:
+        raise overloaded(e)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -142,94 +424,148 @@ async def query_agent(request: QueryRequest):
         )
 
 
-@app.post("/api/upload")
-async def upload_document(file: UploadFile = File(...)):
+async def ingest_upload(
+    spooled: SpooledUpload,
+    filename: str,
+    build_digests: bool,
+    background_tasks: BackgroundTasks,
+    source: Optional[str] = None,
+    ttl_seconds: Optional[float] = None,
+    report: bool = False
+) -> dict:
     """
-    Upload and process a new market research document.
-    
-    Supports: .txt and .pdf files
+    Extract, chunk, embed and upsert a spooled upload; returns the upload response.
     
-    This will:
-    1. Extract text from document (TXT or PDF)
-    2. Process the document into chunks
-    3. Generate embeddings
-    4. Store in Pinecone vector database
+    The document is stored under source (defaults to filename), replacing
+    any previous version of that source. The chunking report (tokenizes every
+    chunk and re-splits the text) is only built in token mode or on request.
     """
-    try:
-        # Read file content
-        content = await file.read()
-        
-        # Extract text based on file type
-        filename_lower = file.filename.lower()
-        
-        if filename_lower.endswith('.pdf'):
-            # Handle PDF files
-            try:
-                from pypdf import PdfReader
-                from io import BytesIO
-                
-                pdf_file = BytesIO(content)
-                pdf_reader = PdfReader(pdf_file)
-                
-                # Extract text from all pages
-                text_parts = []
-                for page_num, page in enumerate(pdf_reader.pages, 1):
-                    page_text = page.extract_text()
-                    if page_text.strip():
-                        text_parts.append(page_text)
-                
-                text = "\n\n".join(text_parts)
-                
-                if not text.strip():
-                    raise HTTPException(
-                        status_code=400,
-                        detail="PDF appears to be empty or contains only images. Please upload a PDF with extractable text."
-                    )
-                    
-            except Exception as pdf_error:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Failed to process PDF: {str(pdf_error)}. Ensure the PDF is not password-protected or corrupted."
-                )
-                
-        elif filename_lower.endswith('.txt'):
-            # Handle text files
-            try:
-                text = content.decode('utf-8')
-            except UnicodeDecodeError:
+    source = source or filename
+    is_pdf = filename.lower().endswith('.pdf')
+    
+    # Extract text from the spooled file (pypdf reads pages from disk; text is memory-mapped)
+    with spooled:
+        try:
+            text = await asyncio.to_thread(
+                document_processor.extract_text_from_file, spooled.path, filename
+            )
+        except Exception as extract_error:
+            if is_pdf:
                 raise HTTPException(
                     status_code=400,
-                    detail="Invalid text file encoding. Please ensure the file is UTF-8 encoded."
+                    detail=f"Failed to process PDF: {str(extract_error)}. Ensure the PDF is not password-protected or corrupted."
                 )
-        else:
+            raise HTTPException(status_code=400, detail=str(extract_error))
+    
+    # Process document
+    documents = document_processor.process_document(
+        text=text,
+        source=source
+    )
+    
+    # Ingest into vector store (parallel batched upserts over the pooled async client),
+    # under per-source IDs so a re-upload replaces the previous version
+    result = await vector_store_manager.aingest_documents(
+        documents,
+        id_prefix=vector_store_manager.source_id_prefix(source),
+        ttl_seconds=ttl_seconds
+    )
+    
+    if result["status"] == "error":
+        raise HTTPException(status_code=500, detail=result["error"])
+    
+    await asyncio.to_thread(invalidate_answers)
+    metrics.increment("documents_ingested")
+    metrics.increment("chunks_ingested", len(documents))
+    
+    # Precompute digests for instant broad insights (a previous version's are stale)
+    if build_digests:
+        background_tasks.add_task(build_document_digests, text, source)
+    else:
+        digest_store.remove(source)
+    
+    chunking = None
+    if report or document_processor.chunk_mode == "tokens":
+        chunking = await asyncio.to_thread(document_processor.chunking_report, text, documents)
+    
+    return {
+        "message": "Document processed successfully",
+        "filename": filename,
+        "source": source,
+        "file_type": "PDF" if is_pdf else "TXT",
+        "file_size_bytes": spooled.size,
+        "chunks_created": len(documents),
+        "stale_chunks_deleted": result.get("stale_chunks_deleted", 0),
+        "expires_at": (vector_store_manager.registry.get(source) or {}).get("expires_at"),
+        "chunking": chunking,
+        "namespace": Config.PINECONE_NAMESPACE,
+        "digests": "scheduled" if build_digests else "disabled",
+        "status": "success"
+    }
+
+
+async def handle_upload(
+    file: UploadFile,
+    background_tasks: BackgroundTasks,
+    build_digests: Optional[bool],
+    source: Optional[str] = None,
+    ttl_seconds: Optional[float] = None,
+    report: bool = False
+) -> dict:
+    """Validate, spool and ingest an uploaded file (shared by upload and replace)."""
+    try:
+        filename_lower = file.filename.lower()
+        
+        if not filename_lower.endswith(DocumentProcessor.SUPPORTED_EXTENSIONS):
             raise HTTPException(
                 status_code=400,
                 detail="Unsupported file format. Please upload a .txt or .pdf file."
             )
         
-        # Process document
-        documents = document_processor.process_document(
-            text=text,
-            source=file.filename
-        )
+        # Spool the upload to disk in chunks (bounded memory, size limit enforced as it arrives)
+        try:
+            spooled = await spool_upload(file, suffix=Path(filename_lower).suffix)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
         
-        # Ingest into vector store
-        result = vector_store_manager.ingest_documents(documents)
+        if build_digests is None:
+            build_digests = Config.BUILD_DIGESTS
+        source = source or file.filename
         
-        if result["status"] == "error":
-            raise HTTPException(status_code=500, detail=result["error"])
+        # Identical concurrent uploads (same content and name, e.g. a double click) share one
+        # ingest, which runs in the bulk lane so it can't starve interactive queries.
+        # The ingest owns the spooled file: it outlives a leader request that is cancelled
+        started = []
         
-        return {
-            "message": "Document processed successfully",
-            "filename": file.filename,
-            "file_type": "PDF" if filename_lower.endswith('.pdf') else "TXT",
-            "chunks_created": len(documents),
-            "namespace": Config.PINECONE_NAMESPACE,
-            "status": "success"
-        }
+        async def ingest():
+            try:
+                return await scheduler.run(
+                    BULK, lambda: ingest_upload(
+                        spooled, file.filename, build_digests, background_tasks,
+                        source=source, ttl_seconds=ttl_seconds, report=report
+                    )
+                )
+            finally:
+                spooled.cleanup()
+        
+        def start():
+            started.append(True)
+            return ingest()
+        
+        try:
+            return await upload_flight.do(
+                (spooled.sha256, file.filename, source, build_digests, ttl_seconds, report),
+                start
+            )
+        finally:
+            # Requests that joined another upload's ingest never used their spool
+            if not started:
+                spooled.cleanup()
         
     except HTTPException:
         raise
+    except LaneOverloadedError as e:
+        raise overloaded(e)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -237,31 +573,282 @@ async def upload_document(file: UploadFile = File(...)):
         )
 
 
+@app.post("/api/upload")
+async def upload_document(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    build_digests: Optional[bool] = None,
+    ttl_seconds: Optional[float] = None,
+    report: bool = False
+):
+    """
+    Upload and process a new market research document.
+    
+    Supports: .txt and .pdf files
+    
+    This will:
+    1. Extract text from document (TXT or PDF)
+    2. Process the document into chunks
+    3. Generate embeddings
+    4. Store in Pinecone vector database (re-uploading a filename replaces
+       the previous version)
+    5. Optionally build section digests and a document summary in the
+       background (build_digests, defaults to Config.BUILD_DIGESTS)
+    
+    ttl_seconds expires the document that long after ingest (defaults to
+    Config.DOCUMENT_TTL_SECONDS; 0 = never). report=true adds a chunking
+    report (always included with CHUNK_MODE=tokens).
+    """
+    return await handle_upload(file, background_tasks, build_digests, ttl_seconds=ttl_seconds, report=report)
+
+
+async def delete_document(source: str) -> Optional[dict]:
+    """Delete a document's vectors, chunks and digests, and invalidate cached answers."""
+    result = await vector_store_manager.adelete_source(source)
+    if result is None:
+        return None
+    result["digests_removed"] = digest_store.remove(source)
+    await asyncio.to_thread(invalidate_answers)
+    metrics.increment("documents_deleted")
+    return result
+
+
+def compact_document_caches() -> None:
+    """Drop cached embeddings of chunks that are no longer stored (background task)."""
+    document_cache = vector_store_manager.embeddings.document_cache
+    if document_cache is None:
+        return
+    try:
+        document_cache.compact(vector_store_manager.chunk_store.texts())
+    except Exception as e:
+        print(f"[Documents] Warning: embedding cache compaction failed: {e}")
+
+
+async def expire_documents() -> None:
+    """Delete documents whose TTL has passed (background loop, one worker process at a time)."""
+    while True:
+        await asyncio.sleep(Config.DOCUMENT_SWEEP_INTERVAL_SECONDS)
+        if not vector_store_manager.registry.claim_sweeper():
+            continue
+        expired = vector_store_manager.registry.expired()
+        deleted = 0
+        for source in expired:
+            try:
+                if await scheduler.run(BULK, lambda: delete_document(source)):
+                    deleted += 1
+                    print(f"[Documents] Expired {source}")
+            except Exception as e:
+                print(f"[Documents] Warning: failed to expire {source}: {e}")
+        if deleted:
+            await asyncio.to_thread(compact_document_caches)
+
+
+@app.get("/api/documents")
+async def list_documents():
+    """List ingested documents with chunk counts, ingest and expiry times."""
+    sources = vector_store_manager.list_sources()
+    documents = [
+        {"source": source, **entry, "digests": digest_store.get(source) is not None}
+        for source, entry in sorted(sources.items())
+    ]
+    return {"documents": documents, "count": len(documents)}
+
+
+@app.delete("/api/documents/{source:path}")
+async def remove_document(source: str, background_tasks: BackgroundTasks):
+    """
+    Delete a document: its vectors (batched), local chunks, digests and
+    cached answers. Cached embeddings are compacted in the background.
+    """
+    try:
+        result = await scheduler.run(BULK, lambda: delete_document(source))
+    except LaneOverloadedError as e:
+        raise overloaded(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Delete failed: {str(e)}")
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Document not found: {source}")
+    background_tasks.add_task(compact_document_caches)
+    return {**result, "status": "deleted"}
+
+
+@app.put("/api/documents/{source:path}")
+async def replace_document(
+    source: str,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    build_digests: Optional[bool] = None,
+    ttl_seconds: Optional[float] = None,
+    report: bool = False
+):
+    """
+    Replace a document with a new version, keeping its source name.
+    
+    Chunks of the old version that the new one doesn't overwrite are deleted,
+    and cached embeddings are compacted in the background.
+    """
+    if source not in vector_store_manager.list_sources():
+        raise HTTPException(status_code=404, detail=f"Document not found: {source}")
+    response = await handle_upload(
+        file, background_tasks, build_digests, source=source, ttl_seconds=ttl_seconds, report=report
+    )
+    background_tasks.add_task(compact_document_caches)
+    return response
+
+
 @app.get("/api/health")
 async def health_check():
     """
-    System health check and statistics.
+    Liveness check.
+    
+    Constant-time and local only (no Pinecone or LLM calls), so load
+    balancers can probe it frequently.
     """
-    try:
-        # Get vector store stats
-        stats = vector_store_manager.get_stats()
-        
-        return {
-            "status": "healthy",
-            "configuration": {
-                "gemini_model": Config.GEMINI_MODEL,
-                "embedding_model": Config.EMBEDDING_MODEL,
-                "pinecone_index": Config.PINECONE_INDEX_NAME,
-                "namespace": Config.PINECONE_NAMESPACE,
-                "langchain_version": "1.0.3"
-            },
-            "vector_store": stats
+    return {
+        "status": "healthy",
+        "uptime_seconds": metrics.uptime_seconds
+    }
+
+
+@app.get("/api/ready")
+async def readiness_check():
+    """
+    Readiness check.
+    
+    Reports whether services are initialized and whether index stats have
+    been fetched at least once. Served from memory; returns 503 until ready.
+    """
+    snapshot = vector_store_manager.stats_cache.snapshot()
+    checks = {
+        "agent": agent is not None,
+        "vector_store": vector_store_manager is not None,
+        "index_stats": snapshot["stats"] is not None,
+    }
+    ready = all(checks.values())
+    return DefaultJSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "checks": checks,
+            "index_stats_error": snapshot["last_error"]
         }
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "error": str(e)
+    )
+
+
+@app.get("/api/stats")
+async def stats():
+    """
+    System statistics.
+    
+    Index stats come from the background-refreshed snapshot (with its age);
+    everything else is local counters.
+    """
+    return {
+        "configuration": {
+            "gemini_model": Config.GEMINI_MODEL,
+            "embedding_model": Config.EMBEDDING_MODEL,
+            "pinecone_index": Config.PINECONE_INDEX_NAME,
+            "namespace": Config.PINECONE_NAMESPACE,
+            "langchain_version": "1.0.3"
+        },
+        "vector_store": vector_store_manager.stats_cache.snapshot(),
+        "local": metrics.snapshot()
+    }
+
+
+def require_debug_token(request: Request) -> None:
+    """Guard the /debug endpoints: 404 unless DEBUG_TOKEN is set, 401 without the matching X-Debug-Token header."""
+    if not Config.DEBUG_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = request.headers.get("x-debug-token", "")
+    if not hmac.compare_digest(supplied.encode("utf-8"), Config.DEBUG_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Invalid debug token")
+
+
+@app.get("/debug/profile")
+async def debug_profile(
+    request: Request,
+    seconds: float = 10,
+    interval_ms: Optional[float] = None,
+    format: str = "folded",
+    include_idle: bool = False
+):
+    """
+    Sample every thread's stack for `seconds` (max PROFILE_MAX_SECONDS).
+    
+    Returns folded stacks as text (pipe into flamegraph.pl, or load into
+    speedscope), or the stack counts and run statistics with format=json.
+    Profiles the worker process that serves the request.
+    """
+    require_debug_token(request)
+    try:
+        result = await asyncio.to_thread(get_profiler().profile, seconds, interval_ms, include_idle)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "json":
+        return result
+    return PlainTextResponse(
+        folded(result["stacks"]),
+        headers={
+            "X-Profile-Samples": str(result["samples"]),
+            "X-Profile-Overhead": str(result["overhead"]),
         }
+    )
+
+
+@app.get("/debug/slow-requests")
+async def debug_slow_requests(request: Request):
+    """Requests slower than SLOW_REQUEST_MS (newest first), with stage timings, event-loop lag and a stack sample."""
+    require_debug_token(request)
+    return {
+        "stats": request_tracer.stats(),
+        "requests": request_tracer.slow_requests(),
+    }
+
+
+def run_multiprocess(workers: int) -> None:
+    """
+    Serve with several worker processes sharing preloaded models.
+    
+    The app (embedding model, tokenizer, LLM clients, tools) is already
+    imported in this master process; gunicorn then forks workers, which
+    share those pages copy-on-write instead of each loading their own copy.
+    """
+    import gc
+    from gunicorn.app.base import BaseApplication
+    
+    class PreloadedApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{Config.HOST}:{Config.PORT}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("worker_class", "uvicorn.workers.UvicornWorker")
+            self.cfg.set("preload_app", True)
+            self.cfg.set("timeout", 120)
+            # Freeze preloaded objects so GC doesn't dirty (and un-share) their pages
+            self.cfg.set("pre_fork", lambda server, worker: gc.freeze())
+            self.cfg.set("post_fork", lambda server, worker: _split_torch_threads(workers))
+        
+        def load(self):
+            return app
+    
+    # Tokenizer thread pools don't survive fork; workers tokenize single-threaded
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    
+    # Load lazily-initialized models before forking so workers share them
+    _ = get_token_counter().tokenizer
+    if Config.RERANK_ENABLED:
+        _ = get_reranker().model
+    
+    PreloadedApplication().run()
+
+
+def _split_torch_threads(workers: int) -> None:
+    """Give each worker an equal share of CPU threads for embedding."""
+    try:
+        import torch
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    except ImportError:
+        pass
 
 
 if __name__ == "__main__":
@@ -273,11 +860,14 @@ if __name__ == "__main__":
     if str(src_dir) not in sys.path:
         sys.path.insert(0, str(src_dir))
     
-    import uvicorn
-    uvicorn.run(
-        app,
-        host="0.0.0.0",
-        port=8000,
-        reload=False
-    )
+    if Config.WORKERS > 1:
+        run_multiprocess(Config.WORKERS)
+    else:
+        import uvicorn
+        uvicorn.run(
+            app,
+            host=Config.HOST,
+            port=Config.PORT,
+            reload=False
+        )
 
@@ -1,7 +1,7 @@
 """
 Pydantic models for structured data extraction.
 """
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -40,6 +40,9 @@ class MarketResearchData(BaseModel):
         description="List of main competitors with market shares"
     )
     swot: SWOTAnalysis = Field(description="SWOT analysis")
+    field_confidence: Optional[Dict[str, float]] = Field(
+        None, description="Per-field extraction confidence (rule-based or LLM-filled)"
+    )
 
 
 class QueryRequest(BaseModel):
@@ -52,5 +55,8 @@ class QueryResponse(BaseModel):
     """API response model."""
     answer: str = Field(..., description="Agent's response")
     tool_used: Optional[str] = Field(None, description="Tool that was used")
+    tools_used: Optional[List[str]] = Field(None, description="All tools used, in call order (compound requests)")
+    data: Optional[Any] = Field(None, description="Structured output of the tool (e.g. extracted data)")
     session_id: str = Field(..., description="Session ID")
-    execution_time_ms: Optional[int] = Field(None, description="Execution time in milliseconds")
\ No newline at end of file
+    execution_time_ms: Optional[int] = Field(None, description="Execution time in milliseconds")
+    cached: bool = Field(False, description="Whether the answer was served from the answer cache")
\ No newline at end of file
@@ -0,0 +1,475 @@
+"""
+Compact local store of normalized chunk text and citation IDs.
+
+Chunks are normalized once at ingest and kept in contiguous array-backed
+buffers: one UTF-8 text buffer with an offsets array, plus integer section
+and source IDs that index into interned title tables. Retrieved chunks are
+resolved to rows by their "chunk_key" metadata, so building prompt context
+and citations needs no per-request regex cleanup.
+
+The store is persisted as an append-only record log, shared safely between
+processes (file lock on append; readers pick up new records incrementally).
+Removing a source rewrites the log without its records under a new
+generation ID (in the log header); every process then loads the rewritten
+log into a fresh table and swaps it in, so concurrent readers never see a
+half-renumbered store.
+"""
+import hashlib
+import os
+import re
+import struct
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+from services.request_trace import stage
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+
+class _FileLock:
+    """Exclusive flock on a side file (kept stable across log rewrites)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a")
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+
+
+# Record header: 8-byte key, section length, source length, text length
+_RECORD_HEADER = struct.Struct("<8sIII")
+
+_SPACE_RUNS = re.compile(r"[ \t\u00a0]+")
+
+
+def normalize_chunk_text(text: str) -> str:
+    """Collapse runs of spaces (PDF extraction artifacts) and trim each line."""
+    lines = (_SPACE_RUNS.sub(" ", line).strip() for line in text.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def chunk_key(source: str, text: str) -> str:
+    """Stable key for a chunk (same in every process that ingests it)."""
+    return hashlib.sha1(f"{source}\x00{text}".encode("utf-8")).hexdigest()[:16]
+
+
+def section_key(source: str, section: str) -> str:
+    """Stable key for a document section (chunk "section_id" metadata)."""
+    return hashlib.sha1(f"{source}\x00{section}".encode("utf-8")).hexdigest()[:16]
+
+
+# Log header: magic and generation (a random ID, replaced whenever the log is rewritten).
+# Logs written before the header existed start directly with records (generation 0).
+_LOG_MAGIC = b"CHUNKLOG"
+_LOG_HEADER = struct.Struct("<8sQ")
+
+
+def _new_generation() -> int:
+    return int.from_bytes(os.urandom(8), "little") or 1
+
+
+class ChunkTable:
+    """
+    One generation of the store's rows.
+
+    Rows are only ever appended to a table. A log rewrite (source removal)
+    renumbers rows, so it builds a new table and swaps it in whole; readers
+    holding the old table keep seeing consistent rows.
+    """
+
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.log_position = 0                # Bytes of the log loaded into this table
+
+        self.text_buffer = bytearray()       # All chunk text, UTF-8, contiguous
+        self.offsets = array("Q", [0])       # Row i spans text_buffer[offsets[i]:offsets[i + 1]]
+        self.section_ids = array("I")
+        self.source_ids = array("I")
+        self.rows: Dict[bytes, int] = {}     # chunk key -> row
+
+        # Interned section titles and source names
+        self.sections: List[str] = []
+        self.section_lookup: Dict[str, int] = {}
+        self.sources: List[str] = []
+        self.source_lookup: Dict[str, int] = {}
+        self.source_sizes: List[int] = []    # Chunks per interned source
+
+    def __len__(self) -> int:
+        return len(self.section_ids)
+
+    @staticmethod
+    def intern(value: str, table: List[str], lookup: Dict[str, int]) -> int:
+        idx = lookup.get(value)
+        if idx is None:
+            idx = len(table)
+            table.append(value)
+            lookup[value] = idx
+        return idx
+
+    def append_row(self, key: bytes, section: str, source: str, text: bytes) -> int:
+        row = self.rows.get(key)
+        if row is not None:
+            return row
+        row = len(self.section_ids)
+        self.text_buffer.extend(text)
+        self.offsets.append(len(self.text_buffer))
+        self.section_ids.append(self.intern(section, self.sections, self.section_lookup))
+        source_id = self.intern(source, self.sources, self.source_lookup)
+        self.source_ids.append(source_id)
+        if source_id == len(self.source_sizes):
+            self.source_sizes.append(0)
+        self.source_sizes[source_id] += 1
+        self.rows[key] = row
+        return row
+
+    def text_bytes(self, row: int) -> bytes:
+        return bytes(self.text_buffer[self.offsets[row]:self.offsets[row + 1]])
+
+    def text(self, row: int) -> str:
+        return self.text_buffer[self.offsets[row]:self.offsets[row + 1]].decode("utf-8")
+
+    def section(self, row: int) -> str:
+        return self.sections[self.section_ids[row]]
+
+    def source(self, row: int) -> str:
+        return self.sources[self.source_ids[row]]
+
+
+def _parse_key(key_hex: Optional[str]) -> Optional[bytes]:
+    if not key_hex:
+        return None
+    try:
+        return bytes.fromhex(key_hex)
+    except ValueError:
+        return None
+
+
+class ChunkStore:
+    """Array-backed chunk text, section and source store."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.path.join(Config.STORAGE_DIR, "chunks.log"))
+        self._lock = threading.Lock()
+        self._table = ChunkTable(generation=0)
+        self._loaded = False
+        self._refresh()
+
+    @property
+    def generation(self) -> int:
+        """ID of the current row numbering (changes whenever the log is rewritten)."""
+        return self._table.generation
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    @staticmethod
+    def _record(key: bytes, section: str, source: str, text: bytes) -> bytes:
+        section_bytes = section.encode("utf-8")
+        source_bytes = source.encode("utf-8")
+        return (
+            _RECORD_HEADER.pack(key, len(section_bytes), len(source_bytes), len(text))
+            + section_bytes + source_bytes + text
+        )
+
+    @staticmethod
+    def _read_header(f) -> Tuple[int, int]:
+        """Read a log's (generation, offset of its first record)."""
+        header = f.read(_LOG_HEADER.size)
+        if len(header) == _LOG_HEADER.size:
+            magic, generation = _LOG_HEADER.unpack(header)
+            if magic == _LOG_MAGIC:
+                return generation, _LOG_HEADER.size
+        return 0, 0
+
+    def _refresh(self):
+        """
+        Load records appended to the log since the last read (by any process).
+
+        If the log was rewritten (its header carries a new generation), the
+        whole log is loaded into a new table, which then replaces the current
+        one in a single assignment. Call with self._lock held (or from __init__).
+        """
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            generation, start = self._read_header(f)
+            table = self._table
+            size = os.fstat(f.fileno()).st_size
+            if not self._loaded or generation != table.generation or size < table.log_position:
+                # First load, or the log was rewritten by remove_source()
+                table = ChunkTable(generation)
+                table.log_position = start
+            if size <= table.log_position:
+                self._install(table)
+                return
+            f.seek(table.log_position)
+            data = f.read()
+
+        position = 0
+        while position + _RECORD_HEADER.size <= len(data):
+            key, section_len, source_len, text_len = _RECORD_HEADER.unpack_from(data, position)
+            end = position + _RECORD_HEADER.size + section_len + source_len + text_len
+            if end > len(data):
+                break  # Record still being written
+            cursor = position + _RECORD_HEADER.size
+            section = data[cursor:cursor + section_len].decode("utf-8")
+            cursor += section_len
+            source = data[cursor:cursor + source_len].decode("utf-8")
+            cursor += source_len
+            table.append_row(key, section, source, data[cursor:end])
+            position = end
+        table.log_position += position
+        self._install(table)
+
+    def _install(self, table: ChunkTable):
+        self._table = table
+        self._loaded = True
+
+    def table(self) -> ChunkTable:
+        """
+        Load new records and return the current table.
+
+        Row IDs are only meaningful within one table: use the same table to
+        resolve every row of a search (see ChunkTable).
+        """
+        with self._lock:
+            self._refresh()
+            return self._table
+
+    def add_documents(self, documents: List[Document]) -> List[int]:
+        """
+        Add chunks to the store and tag each document with its "chunk_key".
+
+        Page content is expected to be normalized already (DocumentProcessor
+        does this at ingest). Re-adding an existing chunk is a no-op.
+
+        Returns:
+            Row IDs in the current table, in input order
+        """
+        records = []
+        with self._lock:
+            self._refresh()
+            known = self._table.rows
+            keys = []
+            for doc in documents:
+                source = str(doc.metadata.get("source", "unknown"))
+                section = str(doc.metadata.get("section", "Unknown Section"))
+                key_hex = chunk_key(source, doc.page_content)
+                doc.metadata["chunk_key"] = key_hex
+                key = bytes.fromhex(key_hex)
+                if key not in known:
+                    records.append(self._record(key, section, source, doc.page_content.encode("utf-8")))
+                keys.append(key)
+
+            if records:
+                self._append_log(b"".join(records))
+            return [self._table.rows[key] for key in keys]
+
+    def _append_log(self, payload: bytes):
+        """Append records under an exclusive file lock, then load them."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._log_lock():
+            with open(self.path, "ab") as f:
+                if f.tell() == 0:
+                    f.write(_LOG_HEADER.pack(_LOG_MAGIC, _new_generation()))
+                f.write(payload)
+                f.flush()
+        self._refresh()
+
+    def _log_lock(self):
+        """Exclusive cross-process lock for appends and rewrites."""
+        return _FileLock(self.path.with_suffix(".lock"))
+
+    def remove_source(self, source: str, keep_keys: Optional[set] = None) -> int:
+        """
+        Remove a source's chunks and compact the log.
+
+        The rewritten log gets a new generation; the renumbered rows are
+        loaded into a new table and swapped in.
+
+        Args:
+            source: Source identifier
+            keep_keys: Chunk keys (hex) of the source to keep, e.g. the chunks
+                of a replacement version that was just added
+
+        Returns:
+            Number of chunks removed
+        """
+        keep = {bytes.fromhex(key) for key in keep_keys or ()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, self._log_lock():
+            self._refresh()
+            table = self._table
+            source_id = table.source_lookup.get(source)
+            if source_id is None:
+                return 0
+            removed = {
+                key for key, row in table.rows.items()
+                if table.source_ids[row] == source_id and key not in keep
+            }
+            if not removed:
+                return 0
+
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(_LOG_HEADER.pack(_LOG_MAGIC, _new_generation()))
+                for key, row in sorted(table.rows.items(), key=lambda item: item[1]):
+                    if key not in removed:
+                        f.write(self._record(key, table.section(row), table.source(row), table.text_bytes(row)))
+            os.replace(tmp_path, self.path)
+            self._refresh()
+        print(f"[ChunkStore] Removed {len(removed)} chunks of {source}")
+        return len(removed)
+
+    def snapshot(self) -> Tuple[int, int]:
+        """Load new records and return (generation, rows); rows are stable within a generation."""
+        table = self.table()
+        return table.generation, len(table)
+
+    def _table_for(self, keys: List[Optional[bytes]]) -> ChunkTable:
+        """The current table, refreshed first if it is missing any of the keys."""
+        table = self._table
+        if any(key is not None and key not in table.rows for key in keys):
+            # May have been ingested by another process
+            table = self.table()
+        return table
+
+    def get(self, key_hex: Optional[str]) -> Optional[Tuple[str, str]]:
+        """Get a chunk's (normalized text, section title) by chunk key."""
+        key = _parse_key(key_hex)
+        table = self._table_for([key])
+        row = table.rows.get(key) if key is not None else None
+        if row is None:
+            return None
+        return table.text(row), table.section(row)
+
+    # Row accessors on the current table. Rows are renumbered when the log is
+    # rewritten; to resolve several rows consistently, use one table().
+    def text(self, row: int) -> str:
+        return self._table.text(row)
+
+    def section(self, row: int) -> str:
+        return self._table.section(row)
+
+    def source(self, row: int) -> str:
+        return self._table.source(row)
+
+    def texts(self):
+        """Iterate over the text of every stored chunk (of one table)."""
+        table = self.table()
+        return (table.text(row) for row in range(len(table)))
+
+    def _resolve(self, documents: List[Document]) -> Tuple[ChunkTable, List[Tuple[str, int]]]:
+        keys = [_parse_key(doc.metadata.get("chunk_key")) for doc in documents]
+        table = self._table_for(keys)
+        resolved = []
+        for doc, key in zip(documents, keys):
+            row = table.rows.get(key) if key is not None else None
+            if row is not None:
+                resolved.append((table.text(row), table.section_ids[row]))
+            else:
+                section = str(doc.metadata.get("section", "Unknown Section"))
+                with self._lock:
+                    section_id = table.intern(section, table.sections, table.section_lookup)
+                resolved.append((normalize_chunk_text(doc.page_content), section_id))
+        return table, resolved
+
+    def resolve(self, documents: List[Document]) -> List[Tuple[str, str]]:
+        """
+        Map retrieved documents to (normalized text, section title).
+
+        Chunks ingested before the store existed are normalized on the fly,
+        so callers get the same shape either way.
+        """
+        table, resolved = self._resolve(documents)
+        return [(text, table.sections[section_id]) for text, section_id in resolved]
+
+    def source_sections(self, source: str) -> List[Tuple[str, List[str]]]:
+        """
+        Get every chunk of a source grouped by section, in ingest order.
+
+        Returns:
+            List of (section title, chunk texts) tuples
+        """
+        table = self.table()
+        source_id = table.source_lookup.get(source)
+        if source_id is None:
+            return []
+
+        grouped: Dict[int, List[str]] = {}
+        for row in range(len(table)):
+            if table.source_ids[row] == source_id:
+                grouped.setdefault(table.section_ids[row], []).append(table.text(row))
+        return [(table.sections[section_id], texts) for section_id, texts in grouped.items()]
+
+    def source_counts(self) -> Dict[str, int]:
+        """Get the number of stored chunks per source."""
+        table = self.table()
+        return {
+            source: table.source_sizes[source_id]
+            for source_id, source in enumerate(table.sources) if table.source_sizes[source_id]
+        }
+
+    def build_context(self, documents: List[Document], with_sections: bool = True) -> Tuple[str, List[str]]:
+        """
+        Build prompt context and ordered, de-duplicated citations.
+
+        Args:
+            documents: Retrieved documents
+            with_sections: Prefix each chunk with "Section: <title>"
+
+        Returns:
+            (context string, list of cited section titles)
+        """
+        with stage("build_context"):
+            table, resolved = self._resolve(documents)
+            if with_sections:
+                context = "\n\n".join(
+                    f"Section: {table.sections[section_id]}\n{text}" for text, section_id in resolved
+                )
+            else:
+                context = "\n\n".join(text for text, _ in resolved)
+        # Integer de-duplication, first occurrence order
+        citations = [table.sections[section_id] for section_id in dict.fromkeys(sid for _, sid in resolved)]
+        return context, citations
+
+    def stats(self) -> dict:
+        """Get store size statistics."""
+        table = self._table
+        return {
+            "chunks": len(table),
+            "text_bytes": len(table.text_buffer),
+            "sections": len(table.sections),
+            "sources": len(table.sources),
+        }
+
+
+_chunk_store: Optional[ChunkStore] = None
+
+
+def get_chunk_store() -> ChunkStore:
+    """Get the shared chunk store (singleton pattern)."""
+    global _chunk_store
+    if _chunk_store is None:
+        _chunk_store = ChunkStore()
+    return _chunk_store
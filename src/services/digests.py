@@ -0,0 +1,247 @@
+"""
+Precomputed section digests and document summaries.
+
+Built once at ingestion time so broad "summarize the report" requests can be
+answered from a small, stable context instead of re-deriving an overview from
+retrieved chunks on every call.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from langchain_core.prompts import ChatPromptTemplate
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+
+# Phrases that mark a request as a broad, whole-document request
+BROAD_REQUEST_MARKERS = (
+    "summar", "overview", "executive", "overall", "key takeaways",
+    "tl;dr", "tldr", "big picture", "high-level",
+)
+
+
+def is_broad_request(request: str) -> bool:
+    """Check whether a request asks about the document as a whole."""
+    request_lower = request.lower()
+    return any(marker in request_lower for marker in BROAD_REQUEST_MARKERS)
+
+
+class DigestStore:
+    """
+    Persists per-document summaries and section digests as local JSON.
+
+    Updates are read-modify-write under a file lock, so digests built by
+    different worker processes don't overwrite each other.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.path.join(Config.STORAGE_DIR, "digests.json"))
+        self._lock = threading.Lock()
+        self._documents: Dict[str, dict] = {}
+        self._mtime = None
+        self._load()
+
+    def _load(self):
+        """Load digests from disk (no-op if the file doesn't exist yet)."""
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._documents = json.load(f)
+            self._mtime = self.path.stat().st_mtime
+        except Exception as e:
+            print(f"[DigestStore] Warning: could not load {self.path}: {e}")
+
+    def _save(self):
+        """Atomically write digests to disk (caller holds the file lock)."""
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._documents, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._mtime = self.path.stat().st_mtime
+
+    def _refresh(self):
+        """Reload if another process updated the file."""
+        if self.path.exists() and self.path.stat().st_mtime != self._mtime:
+            self._load()
+
+    @contextmanager
+    def _update(self):
+        """Exclusive read-modify-write across threads and processes."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.path.with_suffix(".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield self._documents
+                self._save()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def put(self, source: str, summary: str, sections: List[dict]):
+        """
+        Store the digests for a document, replacing any previous version.
+
+        Args:
+            source: Source identifier (filename)
+            summary: Document-level summary
+            sections: List of {"section": title, "digest": text} dicts
+        """
+        with self._update() as documents:
+            documents[source] = {
+                "summary": summary,
+                "sections": sections,
+                "created_at": time.time(),
+            }
+
+    def get(self, source: str) -> Optional[dict]:
+        """Get digests for a single document."""
+        with self._lock:
+            self._refresh()
+            return self._documents.get(source)
+
+    def remove(self, source: str) -> bool:
+        """Remove digests for a document. Returns True if something was removed."""
+        if self.get(source) is None:
+            return False
+        with self._update() as documents:
+            return documents.pop(source, None) is not None
+
+    def select(self, sources: List[str], limit: Optional[int] = None) -> Dict[str, dict]:
+        """Get digests for the given sources (in order, skipping those without digests)."""
+        limit = limit or Config.DIGEST_MAX_DOCUMENTS
+        with self._lock:
+            self._refresh()
+            selected = {}
+            for source in dict.fromkeys(sources):
+                entry = self._documents.get(source)
+                if entry is not None:
+                    selected[source] = entry
+                    if len(selected) >= limit:
+                        break
+        return selected
+
+    def build_context(self, sources: List[str], limit: Optional[int] = None) -> str:
+        """
+        Build a compact prompt context from the summaries and digests of some documents.
+
+        Args:
+            sources: Documents to include, most relevant first (e.g. the
+                sources of the chunks retrieved for the request)
+            limit: Maximum number of documents (default DIGEST_MAX_DOCUMENTS)
+
+        Returns:
+            Context string, or "" if none of the sources has digests
+        """
+        parts = []
+        for source, entry in self.select(sources, limit).items():
+            lines = [f"Document: {source}", f"Summary:\n{entry['summary']}"]
+            for section in entry["sections"]:
+                lines.append(f"Section: {section['section']}\n{section['digest']}")
+            parts.append("\n\n".join(lines))
+        return "\n\n---\n\n".join(parts)
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+
+class DigestBuilder:
+    """Builds section digests and a document summary with the LLM."""
+
+    def __init__(self, llm=None):
+        if llm is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            llm = ChatGoogleGenerativeAI(
+                model=Config.GEMINI_MODEL,
+                google_api_key=Config.GOOGLE_API_KEY,
+                temperature=0,  # Deterministic so digests are stable across rebuilds
+                convert_system_message_to_human=True
+            )
+        self.llm = llm
+
+        self.section_prompt = ChatPromptTemplate.from_messages([
+            ("system", "You are a market research analyst. Write a dense 2-4 sentence digest of the report section below. Keep every figure, percentage, date, company and product name exactly as written."),
+            ("human", "Section: {section}\n\n{content}")
+        ])
+        self.summary_prompt = ChatPromptTemplate.from_messages([
+            ("system", "You are a senior market research analyst. Using the section digests below, write an executive summary of the whole report as 5-8 concise bullet points. Keep key figures exact."),
+            ("human", "Document: {source}\n\n{digests}")
+        ])
+
+    def build(self, sections: List[tuple], source: str) -> dict:
+        """
+        Build the digest hierarchy for a document.
+
+        Args:
+            sections: (section_title, section_content) tuples from DocumentProcessor
+            source: Source identifier
+
+        Returns:
+            Dictionary with "summary" and "sections"
+        """
+        sections = [(title, content) for title, content in sections if content]
+        if not sections:
+            return {"summary": "", "sections": []}
+
+        # Section digests in one batched call (bounded concurrency)
+        section_chain = self.section_prompt | self.llm
+        responses = section_chain.batch(
+            [
+                {"section": title, "content": content[:Config.DIGEST_SECTION_MAX_CHARS]}
+                for title, content in sections
+            ],
+            config={"max_concurrency": Config.DIGEST_MAX_CONCURRENCY}
+        )
+        section_digests = [
+            {"section": title, "digest": _message_text(response).strip()}
+            for (title, _), response in zip(sections, responses)
+        ]
+
+        # Document summary from the digests, not the raw text
+        summary_chain = self.summary_prompt | self.llm
+        summary = summary_chain.invoke({
+            "source": source,
+            "digests": "\n\n".join(
+                f"Section: {d['section']}\n{d['digest']}" for d in section_digests
+            )
+        })
+
+        return {
+            "summary": _message_text(summary).strip(),
+            "sections": section_digests,
+        }
+
+
+def _message_text(message) -> str:
+    """Get text content from an LLM response."""
+    content = getattr(message, "content", message)
+    if isinstance(content, list):
+        return "\n".join(
+            item if isinstance(item, str) else str(getattr(item, "text", item))
+            for item in content
+        )
+    return str(content)
+
+
+_digest_store: Optional[DigestStore] = None
+
+
+def get_digest_store() -> DigestStore:
+    """Get the shared digest store (singleton pattern)."""
+    global _digest_store
+    if _digest_store is None:
+        _digest_store = DigestStore()
+    return _digest_store
@@ -1,6 +1,8 @@
 """
 Document processing and chunking service.
 """
+import mmap
+import os
 from typing import List
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
@@ -9,23 +11,124 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import Config
+from services.tokenizer import get_token_counter
+from services.chunk_store import normalize_chunk_text
 
 
 class DocumentProcessor:
     """Handles document loading and chunking."""
     
-    def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
+    SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+    SUPPORTED_EXTENSIONS = (".txt", ".pdf")
+
+    def __init__(self, chunk_mode: str = None):
+        self.chunk_mode = (chunk_mode or Config.CHUNK_MODE).lower()
+        self.token_counter = None
+
+        # Legacy character-based splitter (also used to report truncation)
+        self.char_splitter = RecursiveCharacterTextSplitter(
             chunk_size=Config.CHUNK_SIZE,
             chunk_overlap=Config.CHUNK_OVERLAP,
             length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""],
+            separators=self.SEPARATORS,
         )
-    
+        self.text_splitter = self.char_splitter
+
+        if self.chunk_mode == "tokens":
+            try:
+                self.token_counter = get_token_counter()
+                # Load the tokenizer now so a missing model fails at startup, not mid-upload
+                _ = self.token_counter.tokenizer
+                self.text_splitter = RecursiveCharacterTextSplitter(
+                    chunk_size=Config.CHUNK_SIZE_TOKENS,
+                    chunk_overlap=Config.CHUNK_OVERLAP_TOKENS,
+                    length_function=self.token_counter.count,
+                    separators=self.SEPARATORS,
+                )
+            except Exception as e:
+                print(
+                    f"[DocumentProcessor] Warning: token-aware chunking unavailable ({e}). "
+                    "Falling back to character chunking."
+                )
+                self.chunk_mode = "characters"
+                self.token_counter = None
+
     def load_document(self, file_path: str) -> str:
-        """Load document from file."""
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        """Load document text from a .txt or .pdf file."""
+        return self.extract_text_from_file(file_path, file_path)
+
+    def extract_text_from_file(self, file_path: str, filename: str) -> str:
+        """
+        Extract text from a file on disk without loading the raw bytes first.
+
+        PDFs are read page by page by pypdf; text files are decoded straight
+        from a read-only memory map.
+
+        Args:
+            file_path: Path to the (possibly spooled) file
+            filename: Original filename, used to detect the format
+
+        Raises:
+            ValueError: If the format is unsupported, the text isn't UTF-8,
+                or the PDF has no extractable text
+        """
+        filename_lower = filename.lower()
+        if filename_lower.endswith('.pdf'):
+            return self.extract_pdf_text(file_path)
+        if filename_lower.endswith('.txt'):
+            if os.path.getsize(file_path) == 0:
+                return ""
+            try:
+                with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return str(mapped, 'utf-8')
+            except UnicodeDecodeError:
+                raise ValueError("Invalid text file encoding. Please ensure the file is UTF-8 encoded.")
+        raise ValueError("Unsupported file format. Please upload a .txt or .pdf file.")
+
+    def extract_text(self, data: bytes, filename: str) -> str:
+        """
+        Extract text from raw file bytes based on the file extension.
+
+        Raises:
+            ValueError: If the format is unsupported, the text isn't UTF-8,
+                or the PDF has no extractable text
+        """
+        filename_lower = filename.lower()
+        if filename_lower.endswith('.pdf'):
+            from io import BytesIO
+            return self.extract_pdf_text(BytesIO(data))
+        if filename_lower.endswith('.txt'):
+            try:
+                return data.decode('utf-8')
+            except UnicodeDecodeError:
+                raise ValueError("Invalid text file encoding. Please ensure the file is UTF-8 encoded.")
+        raise ValueError("Unsupported file format. Please upload a .txt or .pdf file.")
+
+    def extract_pdf_text(self, stream) -> str:
+        """
+        Extract text from all pages of a PDF.
+
+        Args:
+            stream: File path or binary file-like object
+
+        Raises:
+            ValueError: If the PDF has no extractable text
+        """
+        from pypdf import PdfReader
+
+        pdf_reader = PdfReader(stream)
+        text_parts = []
+        for page in pdf_reader.pages:
+            page_text = page.extract_text()
+            if page_text.strip():
+                text_parts.append(page_text)
+
+        text = "\n\n".join(text_parts)
+        if not text.strip():
+            raise ValueError(
+                "PDF appears to be empty or contains only images. Please upload a PDF with extractable text."
+            )
+        return text
     
     def extract_sections(self, text: str) -> List[tuple]:
         """
@@ -40,7 +143,13 @@ class DocumentProcessor:
         for line in lines:
             # Check if line starts with a number (section header)
             if line.strip() and line.strip()[0].isdigit() and '.' in line[:3]:
-                # Save previous section
+                # Save previous section; text before the first header (the report
+                # title line) becomes a section named after its first line
+                if current_section is None and current_content:
+                    sections.append((
+                        ' '.join(current_content[0].split()),
+                        '\n'.join(current_content).strip()
+                    ))
                 if current_section:
                     sections.append((
                         current_section,
@@ -82,6 +191,9 @@ class DocumentProcessor:
             if not section_content:
                 continue
             
+            # Normalize whitespace once at ingest so retrieval never has to
+            section_content = normalize_chunk_text(section_content)
+            
             # Create chunks for this section
             chunks = self.text_splitter.create_documents(
                 texts=[section_content],
@@ -92,9 +204,58 @@ class DocumentProcessor:
                 }]
             )
             documents.extend(chunks)
-        
+
+        # Record token counts in one batched tokenizer call
+        if self.token_counter is not None and documents:
+            token_counts = self.token_counter.count_batch([doc.page_content for doc in documents])
+            for doc, n_tokens in zip(documents, token_counts):
+                doc.metadata["token_count"] = n_tokens
+
         return documents
-    
+
+    def chunking_report(self, text: str, documents: List[Document]) -> dict:
+        """
+        Report chunk sizes against the embedding model's input window.
+
+        Also re-chunks the text with the legacy character scheme to show how
+        many of those chunks would have been silently truncated at embed time.
+
+        Args:
+            text: Original document text
+            documents: Chunks produced by process_document
+
+        Returns:
+            Dictionary with chunking statistics
+        """
+        report = {
+            "chunk_mode": self.chunk_mode,
+            "chunks": len(documents),
+        }
+
+        try:
+            counter = self.token_counter or get_token_counter()
+            token_counts = counter.count_batch([doc.page_content for doc in documents])
+
+            legacy_chunks = [
+                chunk
+                for _, section_content in self.extract_sections(text)
+                if section_content
+                for chunk in self.char_splitter.split_text(section_content)
+            ]
+
+            report.update({
+                "max_tokens": counter.max_tokens,
+                "avg_tokens_per_chunk": round(sum(token_counts) / len(token_counts), 1) if token_counts else 0,
+                "max_tokens_in_chunk": max(token_counts) if token_counts else 0,
+                "truncated_chunks": counter.count_truncated([doc.page_content for doc in documents]),
+                "legacy_chunks": len(legacy_chunks),
+                "legacy_truncated_chunks": counter.count_truncated(legacy_chunks),
+            })
+        except Exception as e:
+            report["error"] = f"Token statistics unavailable: {str(e)}"
+
+        return report
+
     def get_full_document(self, file_path: str) -> str:
         """Get full document text for summarization and extraction."""
         return self.load_document(file_path)
\ No newline at end of file
@@ -0,0 +1,180 @@
+"""
+Per-source registry of ingested documents and their vector IDs.
+
+Records which Pinecone IDs belong to each source, so a document can be
+listed, deleted or replaced without scanning the index, plus an optional
+expiry time. Persisted as local JSON under STORAGE_DIR; updates are
+read-modify-write under a file lock, so worker processes and the ingest
+CLI can share it.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+
+class DocumentRegistry:
+    """Source -> vector IDs, chunk count, ingest and expiry times."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.path.join(Config.STORAGE_DIR, "documents.json"))
+        self._lock = threading.Lock()
+        self._documents: Dict[str, dict] = {}
+        self._mtime = None
+        self._sweep_lock_file = None  # Held open while this process is the expiry sweeper
+        self._load()
+
+    def _load(self):
+        """Load the registry from disk (no-op if the file doesn't exist yet)."""
+        if not self.path.exists():
+            self._documents = {}
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._documents = json.load(f)
+            self._mtime = self.path.stat().st_mtime
+        except Exception as e:
+            print(f"[DocumentRegistry] Warning: could not load {self.path}: {e}")
+
+    def _refresh(self):
+        """Reload if another process updated the file."""
+        if self.path.exists() and self.path.stat().st_mtime != self._mtime:
+            self._load()
+
+    def _save(self):
+        """Atomically write the registry to disk."""
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._documents, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._mtime = self.path.stat().st_mtime
+
+    @contextmanager
+    def _update(self):
+        """Exclusive read-modify-write across threads and processes."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.path.with_suffix(".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield self._documents
+                self._save()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def put(
+        self,
+        source: str,
+        ids: List[str],
+        ttl_seconds: Optional[float] = None,
+        centroid_ids: Optional[List[str]] = None
+    ) -> Optional[dict]:
+        """
+        Register the vector IDs of a source, replacing any previous version.
+
+        Args:
+            source: Source identifier (filename)
+            ids: Vector IDs of every chunk of the source
+            ttl_seconds: Expire the document this long after ingest (None or 0 = never)
+            centroid_ids: IDs of the source's section/document centroids
+
+        Returns:
+            The previous entry, if the source was already registered
+        """
+        now = time.time()
+        with self._update() as documents:
+            previous = documents.get(source)
+            documents[source] = {
+                "ids": list(ids),
+                "centroid_ids": list(centroid_ids or []),
+                "chunks": len(ids),
+                "ingested_at": now,
+                "expires_at": now + ttl_seconds if ttl_seconds else None,
+            }
+        return previous
+
+    def get(self, source: str) -> Optional[dict]:
+        with self._lock:
+            self._refresh()
+            return self._documents.get(source)
+
+    def sources_without_centroids(self, sources: Iterable[str]) -> List[str]:
+        """Sources that aren't registered, or were registered without section/document centroids."""
+        with self._lock:
+            self._refresh()
+            return [source for source in sources if not (self._documents.get(source) or {}).get("centroid_ids")]
+
+    def remove(self, source: str) -> Optional[dict]:
+        """Unregister a source. Returns its entry, or None if it wasn't registered."""
+        with self._update() as documents:
+            return documents.pop(source, None)
+
+    def list(self) -> Dict[str, dict]:
+        """Get every registered source (without the ID lists)."""
+        with self._lock:
+            self._refresh()
+            return {
+                source: {key: value for key, value in entry.items() if key not in ("ids", "centroid_ids")}
+                for source, entry in self._documents.items()
+            }
+
+    def expired(self, now: Optional[float] = None) -> List[str]:
+        """Sources whose expiry time has passed."""
+        now = now or time.time()
+        with self._lock:
+            self._refresh()
+            return [
+                source for source, entry in self._documents.items()
+                if entry.get("expires_at") and entry["expires_at"] <= now
+            ]
+
+    def claim_sweeper(self) -> bool:
+        """
+        Try to become the one process that sweeps expired documents.
+
+        Takes a non-blocking lock on a side file and keeps it for the life of
+        the process; if the holder exits, another worker takes over on its
+        next attempt.
+
+        Returns:
+            True if this process holds the sweeper lock
+        """
+        if self._sweep_lock_file is not None or fcntl is None:
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.path.with_suffix(".sweep.lock"), "a")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._sweep_lock_file = lock_file
+        return True
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+
+_document_registry: Optional[DocumentRegistry] = None
+
+
+def get_document_registry() -> DocumentRegistry:
+    """Get the shared document registry (singleton pattern)."""
+    global _document_registry
+    if _document_registry is None:
+        _document_registry = DocumentRegistry()
+    return _document_registry
@@ -0,0 +1,273 @@
+"""
+Persistent on-disk cache of document embeddings.
+
+Vectors live in a memory-mapped row matrix (float16 by default) next to an
+append-only hash -> row index, keyed by embedding model + normalized chunk
+text. Re-ingesting or re-indexing a corpus reads vectors back from disk and
+only encodes text the model hasn't seen.
+
+Files are versioned by a generation number (CURRENT), so compaction can
+rewrite them while other processes keep reading the previous generation.
+Appends and compaction are serialized across processes with a file lock.
+"""
+import hashlib
+import os
+import re
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+from services.chunk_store import normalize_chunk_text
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+
+# Index record: 20-byte SHA-1 key, matrix row
+_INDEX_RECORD = struct.Struct("<20sI")
+
+
+class EmbeddingCache:
+    """Memory-mapped embedding matrix with a hash -> row index."""
+
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        dimension: Optional[int] = None,
+        dtype: Optional[str] = None,
+        max_rows: Optional[int] = None,
+        directory: Optional[str] = None
+    ):
+        self.model_name = model_name or Config.EMBEDDING_MODEL
+        self.dimension = dimension or Config.EMBEDDING_DIMENSION
+        self.dtype = np.dtype(dtype or Config.EMBEDDING_CACHE_DTYPE)
+        self.max_rows = max_rows or Config.EMBEDDING_CACHE_MAX_ROWS
+        slug = re.sub(r"[^\w.-]+", "_", self.model_name)
+        self.directory = Path(directory or os.path.join(
+            Config.STORAGE_DIR, "embeddings", f"{slug}-{self.dimension}-{self.dtype.name}"
+        ))
+        self._row_bytes = self.dimension * self.dtype.itemsize
+        self._lock = threading.Lock()
+
+        self._generation = None
+        self._rows: Dict[bytes, int] = {}
+        self._index_position = 0
+        self._matrix: Optional[np.memmap] = None
+        self._mapped_rows = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def _vectors_path(self, generation: int) -> Path:
+        return self.directory / f"vectors.{generation}.bin"
+
+    def _index_path(self, generation: int) -> Path:
+        return self.directory / f"index.{generation}.log"
+
+    def _current_generation(self) -> int:
+        try:
+            return int((self.directory / "CURRENT").read_text().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive cross-process lock for appends and compaction."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / "lock", "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def key(self, text: str) -> bytes:
+        """Cache key: SHA-1 of model name + normalized text."""
+        return hashlib.sha1(f"{self.model_name}\x00{normalize_chunk_text(text)}".encode("utf-8")).digest()
+
+    def _refresh(self):
+        """Load index records appended since the last read; reload after compaction."""
+        generation = self._current_generation()
+        if generation != self._generation:
+            self._generation = generation
+            self._rows = {}
+            self._index_position = 0
+            self._matrix = None
+            self._mapped_rows = 0
+
+        index_path = self._index_path(generation)
+        try:
+            size = index_path.stat().st_size
+        except FileNotFoundError:
+            return
+        if size <= self._index_position:
+            return
+        with open(index_path, "rb") as f:
+            f.seek(self._index_position)
+            data = f.read(size - self._index_position)
+        usable = len(data) - len(data) % _INDEX_RECORD.size
+        for key, row in _INDEX_RECORD.iter_unpack(data[:usable]):
+            self._rows[key] = row
+        self._index_position += usable
+
+    def _matrix_rows(self, needed: int) -> Optional[np.memmap]:
+        """Map the vector file, remapping if rows beyond the current view are needed."""
+        if self._matrix is None or self._mapped_rows < needed:
+            path = self._vectors_path(self._generation)
+            rows = path.stat().st_size // self._row_bytes if path.exists() else 0
+            self._matrix = (
+                np.memmap(path, dtype=self.dtype, mode="r", shape=(rows, self.dimension)) if rows else None
+            )
+            self._mapped_rows = rows
+        return self._matrix
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up cached vectors.
+
+        Returns:
+            One vector (float32 values) or None per text, in input order
+        """
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            self._refresh()
+            rows = [self._rows.get(key) for key in keys]
+            known = [row for row in rows if row is not None]
+            matrix = self._matrix_rows(max(known) + 1) if known else None
+
+            vectors: List[Optional[List[float]]] = []
+            for row in rows:
+                if row is None or matrix is None or row >= self._mapped_rows:
+                    vectors.append(None)
+                else:
+                    vectors.append(matrix[row].astype(np.float32).tolist())
+            hits = sum(vector is not None for vector in vectors)
+            self.hits += hits
+            self.misses += len(vectors) - hits
+        return vectors
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]) -> int:
+        """
+        Append vectors for texts not already cached.
+
+        Returns:
+            Number of rows written
+        """
+        with self._lock, self._file_lock():
+            self._refresh()
+            pending: Dict[bytes, List[float]] = {}
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                if key not in self._rows:
+                    pending[key] = vector
+            if not pending:
+                return 0
+
+            vectors_path = self._vectors_path(self._generation)
+            first_row = vectors_path.stat().st_size // self._row_bytes if vectors_path.exists() else 0
+            matrix = np.asarray(list(pending.values()), dtype=self.dtype).reshape(-1, self.dimension)
+
+            # Vectors first, so the index never points at rows that aren't written yet
+            with open(vectors_path, "ab") as f:
+                f.write(matrix.tobytes())
+            with open(self._index_path(self._generation), "ab") as f:
+                f.write(b"".join(
+                    _INDEX_RECORD.pack(key, first_row + i) for i, key in enumerate(pending)
+                ))
+            self._refresh()
+
+            if first_row + len(pending) > self.max_rows * 1.25:
+                self._compact_locked()
+            return len(pending)
+
+    def compact(self, keep_texts: Optional[Iterable[str]] = None) -> dict:
+        """
+        Rewrite the cache without duplicate or dropped rows.
+
+        Args:
+            keep_texts: If given, keep only vectors for these texts (e.g. the
+                chunks currently in the corpus)
+
+        Returns:
+            Dictionary with rows before and after compaction
+        """
+        keep = {self.key(text) for text in keep_texts} if keep_texts is not None else None
+        with self._lock, self._file_lock():
+            self._refresh()
+            return self._compact_locked(keep)
+
+    def _compact_locked(self, keep: Optional[set] = None) -> dict:
+        """Compact into the next generation (caller holds both locks)."""
+        old_generation = self._generation
+        old_rows = self._matrix_rows(max(self._rows.values()) + 1 if self._rows else 0)
+        rows_before = self._mapped_rows
+
+        # Newest entries win when over the size limit
+        entries = sorted(
+            ((row, key) for key, row in self._rows.items() if keep is None or key in keep),
+            reverse=True
+        )[:self.max_rows]
+        entries.reverse()
+
+        new_generation = old_generation + 1
+        with open(self._vectors_path(new_generation), "wb") as vectors_file, \
+                open(self._index_path(new_generation), "wb") as index_file:
+            for start in range(0, len(entries), 4096):
+                batch = entries[start:start + 4096]
+                vectors_file.write(np.ascontiguousarray(old_rows[[row for row, _ in batch]]).tobytes())
+                index_file.write(b"".join(
+                    _INDEX_RECORD.pack(key, start + i) for i, (_, key) in enumerate(batch)
+                ))
+
+        current_tmp = self.directory / "CURRENT.tmp"
+        current_tmp.write_text(str(new_generation))
+        os.replace(current_tmp, self.directory / "CURRENT")
+
+        # Readers still mapping the old files keep them alive until they refresh
+        for path in (self._vectors_path(old_generation), self._index_path(old_generation)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+        self._refresh()
+        print(f"[EmbeddingCache] Compacted {rows_before} -> {len(entries)} rows")
+        return {"rows_before": rows_before, "rows_after": len(entries)}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def stats(self) -> dict:
+        """Get size and hit statistics."""
+        with self._lock:
+            self._refresh()
+            vectors_path = self._vectors_path(self._generation)
+            return {
+                "rows": len(self._rows),
+                "dtype": self.dtype.name,
+                "bytes": vectors_path.stat().st_size if vectors_path.exists() else 0,
+                "max_rows": self.max_rows,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get the shared embedding cache (singleton pattern)."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache()
+    return _embedding_cache
@@ -0,0 +1,100 @@
+"""
+Embedding model loading, query-embedding caching and the persistent
+document-embedding cache.
+"""
+import hashlib
+from typing import List, Optional
+from langchain_core.embeddings import Embeddings
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+from services.shared_cache import get_cache
+from services.embedding_cache import EmbeddingCache, get_embedding_cache
+from services.request_trace import stage
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps the embedding model with query and document embedding caches.
+
+    The query cache uses the shared backend, so a query embedded by one worker
+    process is reused by every other worker. Document vectors go to the
+    persistent on-disk cache, so re-ingesting or re-indexing only encodes
+    text the model hasn't seen.
+    """
+
+    def __init__(
+        self,
+        base: Embeddings,
+        model_name: Optional[str] = None,
+        document_cache: Optional[EmbeddingCache] = None
+    ):
+        self.base = base
+        self.model_name = model_name or Config.EMBEDDING_MODEL
+        self.query_cache = get_cache("query_embeddings")
+        self.document_cache = document_cache
+
+    def _query_key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.document_cache is None:
+            with stage("embedding"):
+                return self.base.embed_documents(texts)
+
+        vectors = self.document_cache.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            with stage("embedding"):
+                computed = self.base.embed_documents([texts[i] for i in missing])
+            self.document_cache.put_many([texts[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries in one model call, using the query cache."""
+        keys = [self._query_key(text) for text in texts]
+        cached = self.query_cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        if missing:
+            with stage("embedding"):
+                if len(missing) == 1:
+                    computed = [self.base.embed_query(texts[missing[0]])]
+                else:
+                    computed = self.base.embed_documents([texts[i] for i in missing])
+            new_vectors = {}
+            for i, vector in zip(missing, computed):
+                cached[keys[i]] = vector
+                new_vectors[keys[i]] = vector
+            self.query_cache.set_many(new_vectors, ttl=Config.QUERY_EMBEDDING_CACHE_TTL_SECONDS)
+        return [cached[key] for key in keys]
+
+
+_embeddings: Optional[CachedEmbeddings] = None
+
+
+def get_embeddings() -> CachedEmbeddings:
+    """
+    Get the shared embedding model (singleton pattern).
+
+    Loaded once per process; in multi-worker mode the app is preloaded before
+    forking, so workers share the model weights copy-on-write.
+    """
+    global _embeddings
+    if _embeddings is None:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        _embeddings = CachedEmbeddings(
+            HuggingFaceEmbeddings(
+                model_name=Config.EMBEDDING_MODEL,
+                model_kwargs={'device': 'cpu'},
+                encode_kwargs={'normalize_embeddings': True}  # Normalize for cosine similarity
+            ),
+            document_cache=get_embedding_cache() if Config.EMBEDDING_CACHE_ENABLED else None
+        )
+    return _embeddings
@@ -0,0 +1,292 @@
+"""
+Local compressed vector index over the chunk store.
+
+Index row i is chunk-store row i of one chunk-store generation. Codes are
+persisted in a file per generation under STORAGE_DIR/local_index and
+memory-mapped, so every worker process searches the same pages instead of
+holding its own copy.
+
+The index is filled by a background thread: new chunk-store rows are
+embedded (read back from the embedding cache, so normally without running
+the model), encoded with the configured codec and appended to the codes
+file. A chunk-store rewrite (document delete/replace) renumbers rows, so a
+new file is built from scratch. One process builds at a time (file lock);
+until the file covers every row, searches return None and the caller uses
+Pinecone.
+
+Learned codec parameters (int8 scales, PQ codebooks) are saved alongside,
+so restarts and other worker processes reuse them instead of retraining.
+They are only learned once the chunk store holds
+LOCAL_INDEX_MIN_TRAINING_ROWS rows: codebooks fitted to a tiny first upload
+would misquantize everything added later, so small corpora stay on Pinecone.
+"""
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+import numpy as np
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+from services.chunk_store import ChunkStore, ChunkTable, get_chunk_store
+from services.embedding_cache import EmbeddingCache
+from services.metrics import metrics
+from services.vector_codec import CompressedVectors, make_codec
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+
+# Chunk-store rows embedded and encoded per build step
+_SYNC_BATCH = 4096
+
+
+class LocalVectorIndex:
+    """Compressed vectors for every chunk-store row, with optional exact rescoring."""
+
+    def __init__(
+        self,
+        embeddings,
+        codec_name: Optional[str] = None,
+        chunk_store: Optional[ChunkStore] = None,
+        exact_vectors: Optional[EmbeddingCache] = None,
+        directory: Optional[str] = None
+    ):
+        """
+        Args:
+            embeddings: Document embedder used to fill the index
+            codec_name: float32, float16, int8 or pq (default LOCAL_INDEX_CODEC)
+            chunk_store: Chunk store to index (default: the shared one)
+            exact_vectors: Source of full-precision vectors for rescoring
+                (the document-embedding cache); None disables rescoring
+            directory: Where codes and learned codec parameters are saved
+        """
+        self.embeddings = embeddings
+        self.codec = make_codec(codec_name or Config.LOCAL_INDEX_CODEC, Config.EMBEDDING_DIMENSION)
+        self.chunk_store = chunk_store if chunk_store is not None else get_chunk_store()
+        self.exact_vectors = exact_vectors if Config.LOCAL_INDEX_RESCORE else None
+        if Config.LOCAL_INDEX_RESCORE and exact_vectors is None:
+            print("[LocalIndex] Warning: exact rescoring needs EMBEDDING_CACHE_ENABLED=1; using approximate scores")
+        self.directory = Path(directory or os.path.join(Config.STORAGE_DIR, "local_index"))
+        self.state_path = self.directory / f"{self.codec.name}-{self.codec.dimension}.npz"
+        self._prefix = f"{self.codec.name}-{self.codec.dimension}-{self.codec.code_width}"
+        # Fixed codecs (float32/float16) have nothing to learn
+        self.min_training_rows = 0 if self.codec.trained else Config.LOCAL_INDEX_MIN_TRAINING_ROWS
+        self._state_mtime = None
+
+        # Read-only view of the current generation's codes file
+        self._codes: Optional[np.memmap] = None
+        self._mapped_generation = None
+        self._lock = threading.Lock()
+        self._builder: Optional[threading.Thread] = None
+
+        self.searches = 0
+        self.fallbacks = 0
+        self.builds = 0
+
+    def _codes_path(self, generation: int) -> Path:
+        return self.directory / f"{self._prefix}.{generation:016x}.codes"
+
+    def _embed_rows(self, table: ChunkTable, rows) -> np.ndarray:
+        texts = [table.text(int(row)) for row in rows]
+        return np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+
+    def _load_state(self) -> bool:
+        """
+        Load saved codec parameters (again if another process retrained);
+        returns whether the codec is usable.
+        """
+        if not self.min_training_rows:
+            return True
+        try:
+            mtime = self.state_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if self.codec.trained and mtime == self._state_mtime:
+            return True
+        try:
+            with np.load(self.state_path) as saved:
+                state = dict(saved)
+            # Parameters learned from a smaller corpus than now required are relearned
+            if int(state.pop("training_rows", 0)) < min(self.min_training_rows, Config.PQ_TRAINING_SAMPLE):
+                return False
+            # A fresh codec: in-flight searches keep the one their codes were encoded with
+            codec = make_codec(self.codec.name, self.codec.dimension)
+            codec.load_state(state)
+            self.codec, self._state_mtime = codec, mtime
+            return True
+        except Exception as e:
+            print(f"[LocalIndex] Warning: could not load {self.state_path} ({e}); retraining")
+            return False
+
+    def _train(self, table: ChunkTable) -> bool:
+        """
+        Load saved codec parameters, or learn them from a sample of the corpus
+        (builder only). Returns False while the corpus is too small to train on.
+        """
+        if self._load_state():
+            return True
+        rows = len(table)
+        if rows < self.min_training_rows:
+            return False
+        sample_size = min(rows, Config.PQ_TRAINING_SAMPLE)
+        sample = np.sort(np.random.default_rng(0).choice(rows, sample_size, replace=False))
+        start_time = time.time()
+        vectors = np.concatenate([
+            self._embed_rows(table, sample[start:start + _SYNC_BATCH])
+            for start in range(0, sample_size, _SYNC_BATCH)
+        ])
+        codec = make_codec(self.codec.name, self.codec.dimension)
+        codec.fit(vectors)
+
+        # Codes encoded with earlier parameters are no longer valid
+        self._remove_stale(None)
+        tmp_path = self.state_path.with_suffix(".tmp.npz")
+        np.savez(tmp_path, training_rows=np.int64(sample_size), **codec.state())
+        os.replace(tmp_path, self.state_path)
+        self.codec, self._state_mtime = codec, self.state_path.stat().st_mtime_ns
+        print(f"[LocalIndex] Trained {self.codec.name} codec on {sample_size} vectors in {time.time() - start_time:.1f}s")
+        return True
+
+    def _build(self):
+        """Append codes for chunk-store rows missing from the codes file (background thread)."""
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.directory / f"{self._prefix}.lock", "a") as lock_file:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        return  # Another process is building; its file is picked up when complete
+                while True:
+                    table = self.chunk_store.table()
+                    if not len(table):
+                        return
+                    if not self._train(table):
+                        return  # Too few chunks to learn codec parameters; searches stay on Pinecone
+                    path = self._codes_path(table.generation)
+                    row_bytes = self.codec.bytes_per_vector
+                    size = path.stat().st_size if path.exists() else 0
+                    done = size // row_bytes
+                    if done >= len(table):
+                        break
+                    if size % row_bytes:
+                        os.truncate(path, done * row_bytes)  # Drop a row cut short by a crash
+
+                    start_time = time.time()
+                    rewritten = False
+                    with open(path, "ab") as f:
+                        for start in range(done, len(table), _SYNC_BATCH):
+                            if self.chunk_store.generation != table.generation:
+                                rewritten = True  # Start over on the new generation
+                                break
+                            rows = range(start, min(start + _SYNC_BATCH, len(table)))
+                            f.write(self.codec.encode(self._embed_rows(table, rows)).tobytes())
+                            f.flush()
+                    if rewritten:
+                        continue
+                    self.builds += 1
+                    print(
+                        f"[LocalIndex] Indexed {len(table) - done} chunks ({self.codec.name}, "
+                        f"{len(table)} total) in {time.time() - start_time:.1f}s"
+                    )
+                    self._remove_stale(table.generation)
+        except Exception as e:
+            print(f"[LocalIndex] Warning: index build failed: {e}")
+        finally:
+            with self._lock:
+                self._builder = None
+
+    def _remove_stale(self, generation: Optional[int]):
+        """
+        Delete codes files of other generations, or all of them for None
+        (processes still mapping them keep them alive).
+        """
+        current = self._codes_path(generation) if generation is not None else None
+        for path in self.directory.glob(f"{self._prefix}.*.codes"):
+            if path != current:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def _start_build(self):
+        """Start the background builder unless it is already running (caller holds _lock)."""
+        if self._builder is None:
+            self._builder = threading.Thread(target=self._build, name="local-index-build", daemon=True)
+            self._builder.start()
+
+    def _view(self, table: ChunkTable) -> Optional[CompressedVectors]:
+        """Codes for every row of a table, or None if the file doesn't cover them yet (caller holds _lock)."""
+        rows = len(table)
+        if not rows:
+            return None
+        if self._mapped_generation != table.generation or self._codes is None or len(self._codes) < rows:
+            path = self._codes_path(table.generation)
+            mapped = path.stat().st_size // self.codec.bytes_per_vector if path.exists() else 0
+            if mapped < rows or not self._load_state():
+                return None
+            self._codes = np.memmap(path, dtype=self.codec.code_dtype, mode="r", shape=(mapped, self.codec.code_width))
+            self._mapped_generation = table.generation
+        return CompressedVectors(self.codec, codes=self._codes[:rows])
+
+    def warm(self):
+        """Start building the index in the background (e.g. at startup)."""
+        with self._lock:
+            self._start_build()
+
+    def _exact(self, table: ChunkTable, rows: List[int]) -> List[Optional[np.ndarray]]:
+        texts = [table.text(row) for row in rows]
+        return [
+            np.asarray(vector, dtype=np.float32) if vector is not None else None
+            for vector in self.exact_vectors.get_many(texts)
+        ]
+
+    def search(self, vector: List[float], k: int) -> Optional[Tuple[ChunkTable, List[Tuple[int, float]]]]:
+        """
+        Find the chunk-store rows closest to a query vector.
+
+        Returns:
+            (chunk-store table the rows belong to, [(row, cosine similarity)]
+            best first), or None if the index doesn't cover the chunk store
+            yet (a background build is started; search Pinecone meanwhile)
+        """
+        table = self.chunk_store.table()
+        with self._lock:
+            vectors = self._view(table)
+            if vectors is None:
+                self._start_build()
+        if vectors is None:
+            self.fallbacks += 1
+            metrics.increment(f"local_index.{self.codec.name}.not_ready")
+            return None
+
+        self.searches += 1
+        metrics.increment(f"local_index.{self.codec.name}.searches")
+        rescore = (lambda rows: self._exact(table, rows)) if self.exact_vectors is not None else None
+        return table, vectors.search(np.asarray(vector, dtype=np.float32), k, rescore=rescore)
+
+    def stats(self) -> dict:
+        """Get size, build and search statistics."""
+        table = self.chunk_store.table()
+        with self._lock:
+            ready = self._view(table) is not None
+            rows = len(self._codes) if self._codes is not None else 0
+            building = self._builder is not None
+        return {
+            "codec": self.codec.name,
+            "ready": ready,
+            "building": building,
+            "rows": rows,
+            "bytes": rows * self.codec.bytes_per_vector,
+            "bytes_per_vector": self.codec.bytes_per_vector,
+            "min_training_rows": self.min_training_rows,
+            "rescore": self.exact_vectors is not None,
+            "searches": self.searches,
+            "not_ready_fallbacks": self.fallbacks,
+            "builds": self.builds,
+        }
@@ -0,0 +1,100 @@
+"""
+In-process counters and gauges for the stats endpoint.
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+
+class Metrics:
+    """
+    Thread-safe local counters (monotonic) and gauges (current values).
+
+    Observations (e.g. prompt sizes) keep a bounded window of recent values
+    and are reported as count/p50/p95.
+
+    Components can also register callables that report their own sizes
+    (e.g. cache entries); these are evaluated only when a snapshot is taken.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, float] = {}
+        self._observations: Dict[str, Deque[float]] = {}
+        self._providers: Dict[str, Callable[[], object]] = {}
+        self.started_at = time.time()
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """Increase a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def gauge_add(self, name: str, delta: float) -> None:
+        """Adjust a gauge up or down (e.g. in-flight requests)."""
+        with self._lock:
+            self._gauges[name] = self._gauges.get(name, 0) + delta
+
+    def gauge_set(self, name: str, value: float) -> None:
+        """Set a gauge to an absolute value."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float, window: int = 1000) -> None:
+        """Record a sample (only the most recent `window` samples are kept)."""
+        with self._lock:
+            samples = self._observations.get(name)
+            if samples is None:
+                samples = self._observations[name] = deque(maxlen=window)
+            samples.append(value)
+
+    @staticmethod
+    def _summarize(samples: Deque[float]) -> dict:
+        ordered = sorted(samples)
+        return {
+            "count": len(ordered),
+            "p50": ordered[len(ordered) // 2],
+            "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        }
+
+    def register(self, name: str, provider: Callable[[], object]) -> None:
+        """Register a callable evaluated at snapshot time (must be cheap and local)."""
+        with self._lock:
+            self._providers[name] = provider
+
+    def get(self, name: str, default: Optional[float] = 0) -> Optional[float]:
+        """Get a counter or gauge value."""
+        with self._lock:
+            return self._counters.get(name, self._gauges.get(name, default))
+
+    @property
+    def uptime_seconds(self) -> float:
+        return round(time.time() - self.started_at, 1)
+
+    def snapshot(self) -> dict:
+        """Get all counters, gauges, observation summaries and provider values."""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            observations = {name: self._summarize(samples) for name, samples in self._observations.items() if samples}
+            providers = dict(self._providers)
+
+        reported = {}
+        for name, provider in providers.items():
+            try:
+                reported[name] = provider()
+            except Exception as e:
+                reported[name] = {"error": str(e)}
+
+        return {
+            "uptime_seconds": self.uptime_seconds,
+            "counters": counters,
+            "gauges": gauges,
+            "observations": observations,
+            **reported,
+        }
+
+
+# Shared metrics registry (singleton pattern)
+metrics = Metrics()
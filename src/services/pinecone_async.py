@@ -0,0 +1,264 @@
+"""
+Async Pinecone data-plane access over a pooled HTTP session.
+
+Talks to the Pinecone REST API directly with one persistent httpx client per
+event loop (keep-alive connection pool, HTTP/2 when available). Point
+PINECONE_INDEX_HOST / PINECONE_CONTROLLER_HOST at a local mock server or
+Pinecone Local (e.g. http://localhost:5081) to run against it offline.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+import httpx
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+
+
+PINECONE_API_VERSION = "2024-07"
+
+
+def _with_scheme(host: str) -> str:
+    """Default to https unless the host already has a scheme (mock servers use http)."""
+    return host if host.startswith(("http://", "https://")) else f"https://{host}"
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class AsyncPineconeIndex:
+    """Async client for a single Pinecone index (upsert, query, stats, delete)."""
+
+    def __init__(
+        self,
+        index_name: Optional[str] = None,
+        api_key: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        Args:
+            index_name: Pinecone index (default PINECONE_INDEX_NAME)
+            api_key: API key (default PINECONE_API_KEY)
+            transport: httpx transport for every client (e.g. httpx.MockTransport
+                in tests); None uses the network
+        """
+        self.index_name = index_name or Config.PINECONE_INDEX_NAME
+        self.api_key = api_key or Config.PINECONE_API_KEY
+        self._transport = transport
+        self._host: Optional[str] = _with_scheme(Config.PINECONE_INDEX_HOST) if Config.PINECONE_INDEX_HOST else None
+        self._clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {
+            "Api-Key": self.api_key,
+            "X-Pinecone-API-Version": PINECONE_API_VERSION,
+            "Content-Type": "application/json",
+        }
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Get the pooled client for the running event loop.
+
+        Clients can't cross loops, so each loop gets its own (e.g. the app's
+        and a startup script's); clients of loops that have since closed are
+        dropped.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            for other in [other for other in self._clients if other.is_closed()]:
+                del self._clients[other]
+            client = httpx.AsyncClient(
+                headers=self.headers,
+                http2=_http2_available(),
+                timeout=httpx.Timeout(Config.PINECONE_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=Config.PINECONE_MAX_CONNECTIONS,
+                    max_keepalive_connections=Config.PINECONE_MAX_CONNECTIONS,
+                    keepalive_expiry=60,
+                ),
+                transport=self._transport,
+            )
+            self._clients[loop] = client
+        return client
+
+    async def _resolve_host(self) -> str:
+        """Resolve the index data-plane host once via the control plane."""
+        if self._host is None:
+            response = await self._get_client().get(
+                f"{_with_scheme(Config.PINECONE_CONTROLLER_HOST)}/indexes/{self.index_name}"
+            )
+            response.raise_for_status()
+            self._host = _with_scheme(response.json()["host"])
+        return self._host
+
+    async def _post(self, path: str, payload: dict) -> dict:
+        host = await self._resolve_host()
+        response = await self._get_client().post(f"{host}{path}", json=payload)
+        response.raise_for_status()
+        return response.json() if response.content else {}
+
+    async def upsert(
+        self,
+        vectors: List[dict],
+        namespace: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None
+    ) -> int:
+        """
+        Upsert vectors in parallel batches.
+
+        Args:
+            vectors: List of {"id", "values", "metadata"} dicts
+            namespace: Target namespace
+            batch_size: Vectors per request
+            max_concurrency: Maximum requests in flight
+
+        Returns:
+            Number of vectors upserted
+        """
+        namespace = namespace or Config.PINECONE_NAMESPACE
+        batch_size = batch_size or Config.PINECONE_UPSERT_BATCH_SIZE
+        semaphore = asyncio.Semaphore(max_concurrency or Config.PINECONE_MAX_CONCURRENCY)
+
+        async def upsert_batch(batch: List[dict]) -> int:
+            async with semaphore:
+                result = await self._post("/vectors/upsert", {"vectors": batch, "namespace": namespace})
+                return result.get("upsertedCount", len(batch))
+
+        batches = [vectors[i:i + batch_size] for i in range(0, len(vectors), batch_size)]
+        counts = await asyncio.gather(*(upsert_batch(batch) for batch in batches))
+        return sum(counts)
+
+    async def query(
+        self,
+        vector: List[float],
+        top_k: int,
+        namespace: Optional[str] = None,
+        metadata_filter: Optional[dict] = None,
+        include_metadata: bool = True
+    ) -> List[dict]:
+        """
+        Query the index with a single vector.
+
+        Returns:
+            Matches as {"id", "score", "metadata"} dicts, best first
+        """
+        payload = {
+            "namespace": namespace or Config.PINECONE_NAMESPACE,
+            "vector": vector,
+            "topK": top_k,
+            "includeMetadata": include_metadata,
+            "includeValues": False,
+        }
+        if metadata_filter:
+            payload["filter"] = metadata_filter
+        result = await self._post("/query", payload)
+        return result.get("matches", [])
+
+    async def delete(self, ids: List[str], namespace: Optional[str] = None) -> int:
+        """Delete vectors by ID in batches (bounded concurrency)."""
+        namespace = namespace or Config.PINECONE_NAMESPACE
+        batch_size = Config.PINECONE_DELETE_BATCH_SIZE
+        semaphore = asyncio.Semaphore(Config.PINECONE_MAX_CONCURRENCY)
+
+        async def delete_batch(batch: List[str]):
+            async with semaphore:
+                await self._post("/vectors/delete", {"ids": batch, "namespace": namespace})
+
+        batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+        await asyncio.gather(*(delete_batch(batch) for batch in batches))
+        return len(ids)
+
+    async def delete_by_filter(self, metadata_filter: dict, namespace: Optional[str] = None):
+        """Delete every vector matching a metadata filter."""
+        await self._post("/vectors/delete", {
+            "filter": metadata_filter,
+            "namespace": namespace or Config.PINECONE_NAMESPACE
+        })
+
+    async def describe_index_stats(self) -> dict:
+        """Get index statistics in the same shape as VectorStoreManager.get_stats()."""
+        result = await self._post("/describe_index_stats", {})
+        return {
+            "total_vectors": result.get("totalVectorCount", 0),
+            "dimension": result.get("dimension"),
+            "namespaces": {
+                name: {"vector_count": summary.get("vectorCount", 0)}
+                for name, summary in result.get("namespaces", {}).items()
+            },
+        }
+
+    async def close(self):
+        """Close the running event loop's pooled HTTP client."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None and not client.is_closed:
+            await client.aclose()
+
+
+class IndexStatsCache:
+    """
+    Serves index statistics from memory, refreshed in the background.
+
+    Health and stats endpoints read the snapshot instead of calling
+    describe_index_stats() on every request.
+    """
+
+    def __init__(self, fetch: Callable[[], Awaitable[dict]], interval_seconds: Optional[float] = None):
+        self._fetch = fetch
+        self.interval_seconds = interval_seconds or Config.INDEX_STATS_REFRESH_SECONDS
+        self._stats: Optional[dict] = None
+        self._updated_at: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> Optional[dict]:
+        """Fetch fresh stats; keep the previous snapshot if the fetch fails."""
+        try:
+            self._stats = await self._fetch()
+            self._updated_at = time.time()
+            self._last_error = None
+        except Exception as e:
+            self._last_error = str(e)
+        return self._stats
+
+    def snapshot(self) -> dict:
+        """Get the cached stats with their age (never touches the network)."""
+        return {
+            "stats": self._stats,
+            "age_seconds": round(time.time() - self._updated_at, 1) if self._updated_at else None,
+            "refresh_interval_seconds": self.interval_seconds,
+            "last_error": self._last_error,
+        }
+
+    @property
+    def is_stale(self) -> bool:
+        return self._updated_at is None or time.time() - self._updated_at > self.interval_seconds
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        """Start the background refresh loop on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the background refresh loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
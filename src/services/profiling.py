@@ -0,0 +1,126 @@
+"""
+On-demand sampling profiler.
+
+Samples the Python stack of every thread at a fixed interval (via
+sys._current_frames, so no tracing hooks slow down the profiled code) and
+aggregates identical stacks. The result is in "folded" format, one
+"thread;outer;...;inner count" line per stack, which flamegraph.pl,
+speedscope and inferno read directly.
+
+Threads parked in an idle wait (event-loop select, empty worker queues,
+condition waits) are skipped unless include_idle is set, so the output
+shows where busy time goes. Blocking I/O such as waiting on the LLM API
+shows up as socket/SSL frames.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+
+
+# (file name, function) of innermost frames that mean a thread is idle
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+
+class SamplingProfiler:
+    """Folded-stack sampler over all threads of the process (one run at a time)."""
+
+    def __init__(self):
+        self._running = threading.Lock()
+        self._labels: Dict[object, str] = {}  # Code object -> frame label
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = Path(code.co_filename)
+            label = self._labels[code] = f"{code.co_name} ({path.parent.name}/{path.name}:{code.co_firstlineno})"
+        return label
+
+    def profile(self, seconds: float, interval_ms: Optional[float] = None, include_idle: bool = False) -> dict:
+        """
+        Sample all threads for a while (blocking; run it in a worker thread).
+
+        Args:
+            seconds: Sampling duration (capped at PROFILE_MAX_SECONDS)
+            interval_ms: Time between samples (default PROFILE_INTERVAL_MS)
+            include_idle: Keep samples of threads parked in idle waits
+
+        Returns:
+            Dictionary with the folded stacks (stack -> sample count) and run statistics
+
+        Raises:
+            ProfilerBusyError: If a profile is already running
+        """
+        if not self._running.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running")
+        try:
+            seconds = min(max(seconds, 0.1), Config.PROFILE_MAX_SECONDS)
+            interval = max(interval_ms or Config.PROFILE_INTERVAL_MS, 1) / 1000
+            own_thread = threading.get_ident()
+            stacks: Counter = Counter()
+            samples, sampling_seconds = 0, 0.0
+
+            start = time.perf_counter()
+            deadline = start + seconds
+            while time.perf_counter() < deadline:
+                sample_start = time.perf_counter()
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    code = frame.f_code
+                    if not include_idle and (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(self._label(frame.f_code))
+                        frame = frame.f_back
+                    labels.append(names.get(thread_id, f"thread-{thread_id}").replace(";", ":"))
+                    stacks[";".join(reversed(labels))] += 1
+                samples += 1
+                sampling_seconds += time.perf_counter() - sample_start
+                time.sleep(max(interval - (time.perf_counter() - sample_start), 0))
+
+            elapsed = time.perf_counter() - start
+            return {
+                "seconds": round(elapsed, 2),
+                "interval_ms": round(interval * 1000, 2),
+                "samples": samples,
+                # Share of wall time spent taking samples (GIL held, so roughly the slowdown)
+                "overhead": round(sampling_seconds / elapsed, 4) if elapsed else 0.0,
+                "stacks": dict(stacks.most_common()),
+            }
+        finally:
+            self._running.release()
+
+
+def folded(stacks: Dict[str, int]) -> str:
+    """Render stack counts as folded-stack text."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.items())
+
+
+_profiler: Optional[SamplingProfiler] = None
+
+
+def get_profiler() -> SamplingProfiler:
+    """Get the shared sampling profiler (singleton pattern)."""
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler()
+    return _profiler
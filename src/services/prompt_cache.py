@@ -0,0 +1,290 @@
+"""
+Prompt-prefix caching for the tools' large static prompts.
+
+A prompt is split into a cacheable prefix (the system instructions, and
+optionally the document message) and the fresh remainder. Providers
+(PROMPT_CACHE_PROVIDER):
+- "gemini": registers the prefix with Gemini context caching (CachedContent)
+  and sends only the remainder with cached_content=<name>. Cache names are
+  kept in a shared cache, so worker processes reuse each other's entries.
+  Prefixes below PROMPT_CACHE_MIN_TOKENS, or that fail to register, are
+  sent uncached. Only a not-found/expired cache invalidates the name;
+  other errors (rate limits, outages) are raised as usual. One worker
+  registers a given prefix at a time (a claim in the shared cache); others
+  send it uncached until the name appears.
+- "fake": local simulation for testing. Takes the same path as "gemini",
+  but prefixes are registered in memory and re-attached to the remainder
+  before the model is called.
+- "none": no caching (the default).
+
+The built-in system prompts are all below Gemini's 1024-token minimum, so
+caching only takes effect with PROMPT_CACHE_DOCUMENTS=1, where the report
+context is part of the prefix.
+
+Every call records cached vs fresh input tokens (from the response's usage
+metadata when the provider reports it, otherwise estimated).
+"""
+import hashlib
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+from services.metrics import metrics
+from services.shared_cache import MemoryCache, get_cache
+from services.tokenizer import estimate_llm_tokens
+
+
+# How long a worker's claim to register a prefix blocks the others
+_CLAIM_TTL_SECONDS = 60
+
+
+def _messages_text(messages: list) -> str:
+    return "\n\n".join(str(message.content) for message in messages)
+
+
+class CachedPrefixMissing(Exception):
+    """Raised when a registered prefix is no longer available (expired or deleted)."""
+
+
+class PromptCache:
+    """No-op provider; also the base for accounting and prefix splitting."""
+
+    provider = "none"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hits = 0
+        self.cached_tokens = 0
+        self.fresh_tokens = 0
+
+    def invoke(self, llm, prompt_value, prefix_key: str, prefix_messages: int = 1):
+        """
+        Invoke a chat model with the first prefix_messages messages as a cacheable prefix.
+
+        Args:
+            llm: Chat model
+            prompt_value: Formatted prompt
+            prefix_key: Name of the prefix (e.g. "extract_tool.full"); the cache
+                key also covers the model and the prefix text
+            prefix_messages: Messages in the prefix (at least one message is
+                always left fresh)
+
+        Returns:
+            The model response
+        """
+        messages = prompt_value.to_messages()
+        split = max(0, min(prefix_messages, len(messages) - 1))
+        prefix, rest = messages[:split], messages[split:]
+        key = self._key(llm, prefix_key, prefix)
+
+        response, from_cache = self._invoke(llm, prompt_value, prefix, rest, key)
+        self._account(
+            response,
+            prefix_tokens=estimate_llm_tokens(_messages_text(prefix)),
+            total_tokens=estimate_llm_tokens(_messages_text(messages)),
+            from_cache=from_cache
+        )
+        return response
+
+    def _invoke(self, llm, prompt_value, prefix: list, rest: list, key: str) -> Tuple[object, bool]:
+        """Run the call; returns (response, whether the prefix was served from cache)."""
+        return llm.invoke(prompt_value), False
+
+    @staticmethod
+    def _key(llm, prefix_key: str, prefix: list) -> str:
+        digest = hashlib.sha1(
+            f"{getattr(llm, 'model', '')}\x00{_messages_text(prefix)}".encode("utf-8")
+        ).hexdigest()
+        return f"{prefix_key}:{digest}"
+
+    def _account(self, response, prefix_tokens: int, total_tokens: int, from_cache: bool):
+        usage = getattr(response, "usage_metadata", None) or {}
+        input_tokens = usage.get("input_tokens") or total_tokens
+        cached = (usage.get("input_token_details") or {}).get("cache_read")
+        if cached is None:
+            cached = prefix_tokens if from_cache else 0
+        fresh = max(input_tokens - cached, 0)
+
+        with self._lock:
+            self.calls += 1
+            self.hits += bool(from_cache)
+            self.cached_tokens += cached
+            self.fresh_tokens += fresh
+        metrics.increment("prompt_cache.cached_tokens", cached)
+        metrics.increment("prompt_cache.fresh_tokens", fresh)
+
+    def stats(self) -> dict:
+        """Get call, hit and token statistics."""
+        with self._lock:
+            total = self.cached_tokens + self.fresh_tokens
+            return {
+                "provider": self.provider,
+                "calls": self.calls,
+                "hits": self.hits,
+                "cached_tokens": self.cached_tokens,
+                "fresh_tokens": self.fresh_tokens,
+                "cached_fraction": round(self.cached_tokens / total, 3) if total else 0.0,
+            }
+
+
+class RegisteredPromptCache(PromptCache):
+    """Base for providers that register a prefix once and then reference it by name."""
+
+    def __init__(self, names=None, ttl_seconds: Optional[float] = None):
+        super().__init__()
+        self.ttl_seconds = ttl_seconds or Config.PROMPT_CACHE_TTL_SECONDS
+        self.min_tokens = Config.PROMPT_CACHE_MIN_TOKENS
+        self.invalidations = 0
+        self._names = names if names is not None else get_cache("prompt_prefixes")
+        self._uncacheable = set()  # Keys that failed to register in this process
+
+    def _invoke(self, llm, prompt_value, prefix: list, rest: list, key: str) -> Tuple[object, bool]:
+        if (
+            not prefix
+            or key in self._uncacheable
+            or estimate_llm_tokens(_messages_text(prefix)) < self.min_tokens
+        ):
+            return llm.invoke(prompt_value), False
+
+        name = self._names.get(key) or self._register(llm, prefix, key)
+        if name is None:
+            return llm.invoke(prompt_value), False
+
+        try:
+            return self._invoke_cached(llm, rest, name), True
+        except Exception as e:
+            if not self._is_missing(e):
+                raise
+            # Cache expired or was deleted; recreate on the next call
+            print(f"[PromptCache] Cached prefix {name} is gone ({e}); resending in full")
+            self._names.delete(key)
+            with self._lock:
+                self.invalidations += 1
+            metrics.increment("prompt_cache.invalidations")
+            return llm.invoke(prompt_value), False
+
+    def _register(self, llm, prefix: list, key: str) -> Optional[str]:
+        """
+        Register a prefix unless another worker is already doing so.
+
+        Returns:
+            The new name, or None if the prefix must be sent uncached (claimed
+            by another worker, or registration failed)
+        """
+        claim = f"{key}:registering"
+        if not self._names.add(claim, os.getpid(), ttl=_CLAIM_TTL_SECONDS):
+            metrics.increment("prompt_cache.registration_in_progress")
+            return None
+        try:
+            name = self._create(llm, prefix)
+        except Exception as e:
+            print(f"[PromptCache] Warning: could not cache prefix {key.split(':')[0]} ({e}); sending it uncached")
+            self._uncacheable.add(key)
+            return None
+        else:
+            # Forget the name a little before the provider expires the cache
+            self._names.set(key, name, ttl=max(self.ttl_seconds - 60, 1))
+            return name
+        finally:
+            self._names.delete(claim)
+
+    def _create(self, llm, prefix: list) -> str:
+        """Register a prefix; returns its name."""
+        raise NotImplementedError
+
+    def _invoke_cached(self, llm, rest: list, name: str):
+        """Send the remainder of a prompt whose prefix is registered under name."""
+        return llm.invoke(rest, cached_content=name)
+
+    @staticmethod
+    def _is_missing(error: Exception) -> bool:
+        """Whether an error on a cached call means the registered prefix is gone."""
+        return isinstance(error, CachedPrefixMissing)
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["invalidations"] = self.invalidations
+        return stats
+
+
+class FakePromptCache(RegisteredPromptCache):
+    """Local provider: prefixes are registered in memory and re-attached on each call."""
+
+    provider = "fake"
+
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        super().__init__(names=MemoryCache("prompt_prefixes"), ttl_seconds=ttl_seconds)
+        self._prefixes: Dict[str, Tuple[list, float]] = {}  # Name -> (messages, expiry)
+
+    def _create(self, llm, prefix: list) -> str:
+        with self._lock:
+            name = f"cachedContents/fake-{len(self._prefixes) + 1}"
+            self._prefixes[name] = (list(prefix), time.monotonic() + self.ttl_seconds)
+        return name
+
+    def _invoke_cached(self, llm, rest: list, name: str):
+        with self._lock:
+            prefix, expires_at = self._prefixes.get(name, (None, 0))
+        if prefix is None or expires_at <= time.monotonic():
+            raise CachedPrefixMissing(f"{name} not found or expired")
+        return llm.invoke(prefix + rest)
+
+
+class GeminiPromptCache(RegisteredPromptCache):
+    """Gemini context caching (google-generativeai CachedContent)."""
+
+    provider = "gemini"
+
+    @staticmethod
+    def _is_missing(error: Exception) -> bool:
+        # Gemini answers a deleted/expired cache with 404 "CachedContent not found";
+        # 429/503 and other errors leave the cache (and its billing) intact
+        if isinstance(error, CachedPrefixMissing) or getattr(error, "code", None) == 404:
+            return True
+        text = str(error).lower().replace(" ", "")
+        return "cachedcontent" in text and ("notfound" in text or "expired" in text)
+
+    def _create(self, llm, prefix: list) -> str:
+        """Register a prefix with Gemini; returns the cached content name."""
+        import google.generativeai as genai
+        from google.generativeai import caching
+
+        genai.configure(api_key=Config.GOOGLE_API_KEY)
+        system_text = "\n\n".join(str(m.content) for m in prefix if m.type == "system")
+        contents: List[dict] = [
+            {"role": "model" if m.type == "ai" else "user", "parts": [str(m.content)]}
+            for m in prefix if m.type != "system"
+        ]
+        model = getattr(llm, "model", Config.GEMINI_MODEL)
+        cached = caching.CachedContent.create(
+            model=model if model.startswith("models/") else f"models/{model}",
+            system_instruction=system_text or None,
+            contents=contents or None,
+            ttl=timedelta(seconds=self.ttl_seconds),
+        )
+        print(f"[PromptCache] Registered {cached.name} (~{estimate_llm_tokens(_messages_text(prefix))} tokens)")
+        return cached.name
+
+
+_PROVIDERS = {"none": PromptCache, "fake": FakePromptCache, "gemini": GeminiPromptCache}
+
+_prompt_cache: Optional[PromptCache] = None
+
+
+def get_prompt_cache() -> PromptCache:
+    """Get the configured prompt cache (singleton pattern)."""
+    global _prompt_cache
+    if _prompt_cache is None:
+        provider = _PROVIDERS.get(Config.PROMPT_CACHE_PROVIDER.lower())
+        if provider is None:
+            print(f"[PromptCache] Unknown provider '{Config.PROMPT_CACHE_PROVIDER}'; caching disabled")
+            provider = PromptCache
+        _prompt_cache = provider()
+    return _prompt_cache
@@ -0,0 +1,249 @@
+"""
+Per-request stage timings, event-loop lag and slow-request capture.
+
+Every HTTP request gets a RequestTrace in a context variable. Code on the
+request path wraps expensive steps in stage("name"); the context is copied
+into worker threads (asyncio.to_thread, LangChain's tool executor), so
+stages inside the agent run are attributed to the request that started it.
+When tracing is off for a request, stage() is a no-op.
+
+A background task measures event-loop lag (how late a periodic sleep wakes
+up) and, for requests still running past SLOW_REQUEST_MS, captures the
+Python stacks of the threads currently working on them. Finished requests
+over the threshold are kept, with their stages, lag and stack sample, in a
+bounded ring buffer for /debug/slow-requests.
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+from services.metrics import metrics
+
+
+_current_trace: ContextVar[Optional["RequestTrace"]] = ContextVar("request_trace", default=None)
+
+# Frames kept per captured thread stack (innermost)
+_STACK_DEPTH = 40
+
+
+class RequestTrace:
+    """Timings of one request's stages and the threads currently working on it."""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.status: Optional[int] = None
+        self.fields: Dict[str, Any] = {}
+        self.stages: Dict[str, dict] = {}
+        self.stack_sample: Optional[dict] = None
+        self._open: Dict[int, List[str]] = {}  # Thread ID -> open stage names
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def add(self, name: str, ms: float):
+        """Add time to a stage (calls of the same stage accumulate)."""
+        with self._lock:
+            entry = self.stages.setdefault(name, {"ms": 0.0, "calls": 0})
+            entry["ms"] += ms
+            entry["calls"] += 1
+
+    def _enter(self, name: str):
+        with self._lock:
+            self._open.setdefault(threading.get_ident(), []).append(name)
+
+    def _exit(self):
+        thread_id = threading.get_ident()
+        with self._lock:
+            names = self._open.get(thread_id)
+            if names:
+                names.pop()
+                if not names:
+                    del self._open[thread_id]
+
+    def capture_stacks(self):
+        """Record the current stack of every thread inside one of this request's stages."""
+        with self._lock:
+            open_stages = {thread_id: list(names) for thread_id, names in self._open.items()}
+        frames = sys._current_frames()
+        self.stack_sample = {
+            "at_ms": round(self.elapsed_ms, 1),
+            "threads": [
+                {
+                    "stages": names,
+                    "stack": traceback.format_stack(frames[thread_id], limit=_STACK_DEPTH),
+                }
+                for thread_id, names in open_stages.items() if thread_id in frames
+            ],
+        }
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            stages = {name: {"ms": round(entry["ms"], 1), "calls": entry["calls"]} for name, entry in self.stages.items()}
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.elapsed_ms, 1),
+            **self.fields,
+            "stages": stages,
+        }
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as a stage of the current request (no-op outside a traced request)."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    trace._enter(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace._exit()
+        trace.add(name, (time.perf_counter() - start) * 1000)
+
+
+def in_stage(name: str, fn: Callable, *args, **kwargs):
+    """Call fn inside a stage (e.g. as the target of asyncio.to_thread)."""
+    with stage(name):
+        return fn(*args, **kwargs)
+
+
+def add_stage(name: str, ms: float):
+    """Record an already-measured duration (e.g. a queue wait) on the current request."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, ms)
+
+
+def annotate(**fields):
+    """Attach fields (e.g. a query preview) to the current request's slow-request record."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.fields.update(fields)
+
+
+class RequestTracer:
+    """Active traces, event-loop lag samples and the slow-request ring buffer."""
+
+    def __init__(
+        self,
+        slow_ms: Optional[float] = None,
+        buffer_size: Optional[int] = None,
+        lag_interval_ms: Optional[float] = None
+    ):
+        self.slow_ms = Config.SLOW_REQUEST_MS if slow_ms is None else slow_ms
+        self.lag_interval = (lag_interval_ms or Config.EVENT_LOOP_LAG_INTERVAL_MS) / 1000
+        self._active: Dict[int, RequestTrace] = {}
+        self._slow: Deque[dict] = deque(maxlen=buffer_size or Config.SLOW_REQUEST_BUFFER_SIZE)
+        self._lags: Deque[Tuple[float, float]] = deque(maxlen=10000)  # (perf_counter, lag ms)
+        self._sleep_started: Optional[float] = None  # When the monitor's current sleep began
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    @contextmanager
+    def trace(self, method: str, path: str):
+        """Trace a request for the duration of the block."""
+        trace = RequestTrace(method, path)
+        token = _current_trace.set(trace)
+        with self._lock:
+            self._active[id(trace)] = trace
+        try:
+            yield trace
+        except BaseException:
+            trace.status = trace.status or 500
+            raise
+        finally:
+            _current_trace.reset(token)
+            with self._lock:
+                self._active.pop(id(trace), None)
+            self._finish(trace)
+
+    def _finish(self, trace: RequestTrace):
+        if self.slow_ms <= 0 or trace.elapsed_ms < self.slow_ms:
+            return
+        record = trace.to_dict()
+        now = time.perf_counter()
+        # Include the lag building up right now (a block just before the response)
+        pending = None
+        if self._sleep_started is not None and now - self._sleep_started > self.lag_interval:
+            pending = (now - self._sleep_started - self.lag_interval) * 1000
+        record["event_loop_lag_ms"] = self.lag_between(trace.start, now, pending)
+        record["stack_sample"] = trace.stack_sample
+        with self._lock:
+            self._slow.append(record)
+            self.recorded += 1
+        metrics.increment("slow_requests")
+
+    def lag_between(self, start: float, end: float, pending: Optional[float] = None) -> dict:
+        """Event-loop lag samples taken between two perf_counter times (plus an in-progress one)."""
+        with self._lock:
+            lags = [lag for at, lag in self._lags if start <= at <= end]
+        if pending is not None:
+            lags.append(pending)
+        return {
+            "samples": len(lags),
+            "max": round(max(lags), 1) if lags else 0.0,
+            "mean": round(sum(lags) / len(lags), 1) if lags else 0.0,
+        }
+
+    async def monitor(self):
+        """Measure event-loop lag and sample stacks of requests running past the slow threshold."""
+        while True:
+            start = self._sleep_started = time.perf_counter()
+            await asyncio.sleep(self.lag_interval)
+            now = time.perf_counter()
+            lag_ms = max(now - start - self.lag_interval, 0.0) * 1000
+            with self._lock:
+                self._lags.append((now, lag_ms))
+                running_slow = [
+                    trace for trace in self._active.values()
+                    if trace.stack_sample is None and self.slow_ms > 0 and trace.elapsed_ms >= self.slow_ms
+                ]
+            metrics.observe("event_loop_lag_ms", round(lag_ms, 1))
+            for trace in running_slow:
+                trace.capture_stacks()
+
+    def slow_requests(self) -> List[dict]:
+        """Recorded slow requests, newest first."""
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def stats(self) -> dict:
+        with self._lock:
+            recent = [lag for _, lag in list(self._lags)[-100:]]
+            return {
+                "slow_threshold_ms": self.slow_ms,
+                "active_requests": len(self._active),
+                "slow_recorded": self.recorded,
+                "slow_buffered": len(self._slow),
+                "event_loop_lag_max_ms": round(max(recent), 1) if recent else 0.0,
+            }
+
+
+_request_tracer: Optional[RequestTracer] = None
+
+
+def get_request_tracer() -> RequestTracer:
+    """Get the shared request tracer (singleton pattern)."""
+    global _request_tracer
+    if _request_tracer is None:
+        _request_tracer = RequestTracer()
+    return _request_tracer
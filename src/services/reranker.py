@@ -0,0 +1,166 @@
+"""
+Cross-encoder reranking of retrieved chunks.
+"""
+import hashlib
+import threading
+import time
+from typing import List, Optional
+from langchain_core.documents import Document
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+from services.tokenizer import estimate_llm_tokens
+from services.shared_cache import get_cache
+from services.request_trace import stage
+from services.metrics import metrics
+
+
+class CrossEncoderReranker:
+    """
+    Rescores (query, chunk) pairs with a small local cross-encoder.
+
+    The bi-encoder top-k from Pinecone is a coarse ranking; rescoring a wider
+    candidate pool on CPU lets the tools send only the best few chunks to the
+    LLM. Scores are cached per (query, chunk text) pair in the shared cache.
+    """
+
+    def __init__(self, model_name: Optional[str] = None, batch_size: Optional[int] = None):
+        self.model_name = model_name or Config.RERANK_MODEL
+        self.batch_size = batch_size or Config.RERANK_BATCH_SIZE
+        self._cache = get_cache("rerank_scores")
+        self._lock = threading.Lock()
+        self._model = None
+
+        # Running statistics for reporting
+        self.calls = 0
+        self.candidates_scored = 0
+        self.cache_hits = 0
+        self.total_ms = 0.0
+        self.tokens_saved = 0
+
+    @property
+    def model(self):
+        """Lazily load the cross-encoder on CPU (once, even if first calls are concurrent)."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device="cpu", max_length=512)
+        return self._model
+
+    @staticmethod
+    def _cache_key(query: str, text: str) -> str:
+        return hashlib.sha1(f"{query}\x00{text}".encode("utf-8")).hexdigest()
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        """
+        Score texts against a query, using cached scores where available.
+
+        Args:
+            query: User query
+            texts: Candidate chunk texts
+
+        Returns:
+            Relevance scores, in input order
+        """
+        keys = [self._cache_key(query, text) for text in texts]
+        cached = self._cache.get_many(keys)
+        scores: List[Optional[float]] = [cached.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        with self._lock:
+            self.cache_hits += len(keys) - len(missing)
+
+        if missing:
+            predicted = self.model.predict(
+                [(query, texts[i]) for i in missing],
+                batch_size=self.batch_size,
+                show_progress_bar=False
+            )
+            new_scores = {}
+            for i, score in zip(missing, predicted):
+                scores[i] = float(score)
+                new_scores[keys[i]] = float(score)
+            self._cache.set_many(new_scores)
+
+        return scores
+
+    def rerank(
+        self,
+        query: str,
+        documents: List[Document],
+        top_n: int,
+        baseline_k: Optional[int] = None
+    ) -> List[Document]:
+        """
+        Rerank candidate documents and keep the top_n.
+
+        Args:
+            query: User query
+            documents: Candidate documents (bi-encoder order)
+            top_n: Number of documents to keep
+            baseline_k: How many documents would have been sent without
+                reranking (used to report prompt token savings)
+
+        Returns:
+            Top documents, best first: copies with "rerank_score" in
+            metadata (the candidates may be shared with other tool calls)
+        """
+        if not documents:
+            return []
+
+        start_time = time.perf_counter()
+        with stage("rerank"):
+            scores = self.score(query, [doc.page_content for doc in documents])
+        ranked = sorted(zip(documents, scores), key=lambda pair: pair[1], reverse=True)
+
+        kept = [
+            Document(page_content=doc.page_content, metadata={**doc.metadata, "rerank_score": score})
+            for doc, score in ranked[:top_n]
+        ]
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+        # Compare against what the tool would have sent without reranking
+        baseline_docs = documents[:baseline_k or len(documents)]
+        baseline_tokens = sum(estimate_llm_tokens(doc.page_content) for doc in baseline_docs)
+        kept_tokens = sum(estimate_llm_tokens(doc.page_content) for doc in kept)
+        saved = max(baseline_tokens - kept_tokens, 0)
+
+        with self._lock:
+            self.calls += 1
+            self.candidates_scored += len(documents)
+            self.total_ms += elapsed_ms
+            self.tokens_saved += saved
+
+        metrics.observe("rerank.ms", round(elapsed_ms, 2))
+        if Config.VERBOSE_LOGGING:
+            print(
+                f"[Reranker] {len(documents)} candidates -> {len(kept)} in {elapsed_ms:.1f}ms "
+                f"(~{kept_tokens} prompt tokens vs ~{baseline_tokens} without rerank)"
+            )
+        return kept
+
+    def stats(self) -> dict:
+        """Get reranking latency, cache and token savings statistics."""
+        return {
+            "model": self.model_name,
+            "calls": self.calls,
+            "candidates_scored": self.candidates_scored,
+            "avg_latency_ms": round(self.total_ms / self.calls, 1) if self.calls else 0,
+            "cache_backend": self._cache.backend,
+            "cache_hits": self.cache_hits,
+            "estimated_prompt_tokens_saved": self.tokens_saved,
+        }
+
+
+_reranker: Optional[CrossEncoderReranker] = None
+
+
+def get_reranker() -> CrossEncoderReranker:
+    """Get the shared reranker (singleton pattern)."""
+    global _reranker
+    if _reranker is None:
+        _reranker = CrossEncoderReranker()
+    return _reranker
@@ -0,0 +1,75 @@
+"""
+Adaptive retrieval depth: choose k per query from the score curve.
+"""
+from typing import List, Optional, Tuple
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+from services.metrics import metrics
+from services.tokenizer import estimate_llm_tokens
+
+
+def choose_k(
+    scores: List[float],
+    min_k: int,
+    max_k: int,
+    min_score: Optional[float] = None,
+    relative_floor: Optional[float] = None,
+    max_gap: Optional[float] = None
+) -> Tuple[int, str]:
+    """
+    Pick how many results to keep from a descending score list.
+
+    Results past min_k are kept while they stay above both the absolute
+    floor (min_score) and a floor relative to the best score, and the curve
+    has no sharp drop (elbow) between neighbours.
+
+    Args:
+        scores: Relevance scores, best first
+        min_k: Always keep at least this many (if available)
+        max_k: Never keep more than this many
+        min_score: Absolute minimum marginal score
+        relative_floor: Minimum score as a fraction of the top score
+        max_gap: Largest allowed drop between consecutive scores
+
+    Returns:
+        (k, reason) where reason names the rule that stopped the scan
+    """
+    relative_floor = Config.ADAPTIVE_K_RELATIVE_FLOOR if relative_floor is None else relative_floor
+    max_gap = Config.ADAPTIVE_K_MAX_GAP if max_gap is None else max_gap
+
+    available = min(len(scores), max_k)
+    k = min(min_k, available)
+    if k == 0 or available <= k:
+        return available, "bounds"
+
+    floor = scores[0] * relative_floor
+    if min_score is not None:
+        floor = max(floor, min_score)
+
+    while k < available:
+        score = scores[k]
+        if score < floor:
+            return k, "score_floor"
+        if scores[k - 1] - score > max_gap:
+            return k, "gap"
+        k += 1
+    return k, "max_k"
+
+
+def report_prompt(tool_name: str, documents: list, prompt_text: str) -> int:
+    """
+    Record the chosen k and the resulting prompt size for a tool call
+    (printed too with LOG_LEVEL=DEBUG).
+
+    Returns:
+        Estimated prompt tokens
+    """
+    prompt_tokens = estimate_llm_tokens(prompt_text)
+    metrics.observe(f"{tool_name}.k", len(documents))
+    metrics.observe(f"{tool_name}.prompt_tokens", prompt_tokens)
+    if Config.VERBOSE_LOGGING:
+        print(f"[{tool_name}] k={len(documents)}, ~{prompt_tokens} prompt tokens")
+    return prompt_tokens
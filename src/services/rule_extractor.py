@@ -0,0 +1,303 @@
+"""
+Rule-based extraction of MarketResearchData fields from section-tagged chunks.
+
+Our reports state market size, CAGR, market share, competitor shares and
+SWOT lists in very regular phrasings, so most fields can be read directly
+with patterns. Each field gets a confidence; the extract tool only asks the
+LLM for fields that are missing or below EXTRACT_MIN_CONFIDENCE.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+
+
+REQUIRED_FIELDS = [
+    "company_name", "product_name", "report_period",
+    "current_market_size_billions", "projected_market_size_2030_billions",
+    "cagr_percent", "company_market_share_percent", "competitors", "swot"
+]
+
+SWOT_CATEGORIES = ["strengths", "weaknesses", "opportunities", "threats"]
+
+# Confidence recorded for fields filled in by the LLM gap pass; never below
+# EXTRACT_MIN_CONFIDENCE, so a field the LLM filled doesn't read as a gap
+LLM_FIELD_CONFIDENCE = max(0.8, Config.EXTRACT_MIN_CONFIDENCE)
+
+_NUMBER = r"(\d+(?:,\d{3})*(?:\.\d+)?)"
+_UNIT = r"\s*(trillion|billion|million|bn|B|M)\b"
+_WORD = r"[A-Z][\w&'-]*"
+# Up to five capitalized words on one line; a "." may only end the name ("Innovate Inc.")
+_NAME = r"(" + _WORD + r"(?:[ \t]+(?:of[ \t]+|&[ \t]+)?" + _WORD + r"){0,4}\.?)"
+
+_TITLE = re.compile(r"^\s*" + _NAME + r"\s+Market Research Report\b", re.MULTILINE)
+_PERIOD = re.compile(r"\b((?:Q[1-4]|H[12]|FY)\s*'?(?:19|20)?\d{2})\b")
+_HOLDS_SHARE = re.compile(
+    _NAME + r"\s+(?:currently\s+)?(?:holds|has|commands|captures)\s+(?:an?\s+)?"
+    r"(?:estimated\s+|approximate\s+)?" + _NUMBER + r"%\s+(?:of\s+the\s+)?market\s+share",
+)
+_SHARE_OF = re.compile(r"market\s+share\s+of\s+(?:approximately\s+|about\s+)?" + _NUMBER + "%", re.IGNORECASE)
+# Names may be quoted ("Synergy Systems" (18% market share))
+_COMPETITOR = re.compile(r"[\"“]?" + _NAME + r"[,.]?[\"”]?\s*\(\s*" + _NUMBER + r"%\s*(?:market\s+share)?\s*\)")
+# Quoted name with its share later in the sentence ("QuantumLeap," which ... only a 3% market share)
+_COMPETITOR_SENTENCE = re.compile(
+    r"[\"“]" + _NAME + r"[,.]?[\"”][^.\n(]{0,80}?\b(?:only\s+)?an?\s+" + _NUMBER + r"%\s+market\s+share"
+)
+_PRODUCT_FLAGSHIP = re.compile(
+    r"(?:flagship|leading|core|primary)\s+(?:product|platform|offering)[^\"“\n]{0,60}[\"“]([^\"”\n]{2,80})[\"”]",
+    re.IGNORECASE,
+)
+_PRODUCT_QUOTED = re.compile(r"(?:product|platform|offering),?\s+[\"“]([^\"”\n]{2,80})[\"”]", re.IGNORECASE)
+_VALUED_AT = re.compile(
+    r"(?:currently\s+)?valued\s+at\s+(?:approximately\s+|about\s+|around\s+|roughly\s+|an\s+estimated\s+)?\$"
+    + _NUMBER + _UNIT,
+    re.IGNORECASE,
+)
+_SIZE_OF = re.compile(r"market\s+size\s+(?:of|is|at)\s+(?:approximately\s+|about\s+)?\$" + _NUMBER + _UNIT, re.IGNORECASE)
+_BY_2030 = re.compile(r"\$" + _NUMBER + _UNIT + r"\s+by\s+2030", re.IGNORECASE)
+_CAGR = re.compile(
+    r"CAGR\)?\s+(?:of\s+)?(?:approximately\s+|about\s+|around\s+)?" + _NUMBER + "%"
+    r"|" + _NUMBER + r"%\s+(?:CAGR|compound\s+annual\s+growth)",
+    re.IGNORECASE,
+)
+_SWOT_HEADER = re.compile(
+    r"^(?:[•●▪◦\-*–·]\s*)?(strengths|weaknesses|opportunities|threats)\s*(?:\([^)]*\))?\s*(?::\s*(.*))?$", re.IGNORECASE
+)
+_BULLET = re.compile(r"^(?:[•●▪◦\-*–·]|\d+[.)]|[a-z][.)])\s*")
+_SECTION_NUMBER = re.compile(r"^\d+(?:\.\d+)*\.?\s*")
+
+# Words of common report headings. Section titles from PDFs often run the
+# heading into the first sentence ("3. Competitive Landscape Innovate Inc.
+# holds ..."), so a name captured from a title may start with them.
+_HEADING_WORDS = {
+    "introduction", "overview", "executive", "summary", "competitive", "landscape", "competition",
+    "market", "size", "growth", "analysis", "conclusion", "conclusions", "background", "company",
+    "profile", "outlook", "financial", "performance", "swot", "and", "of", "the",
+}
+# Abbreviations a company name may end with (the only names that keep a trailing ".")
+_NAME_ABBREVIATIONS = ("inc.", "corp.", "ltd.", "co.", "llc.", "plc.", "ag.", "s.a.")
+
+
+def _clean_name(name: str) -> str:
+    """Strip quotes, whitespace runs and trailing punctuation from a captured name."""
+    name = " ".join(name.split()).strip("\"“”'‘’ ")
+    name = name.rstrip(",;:")
+    if name.endswith(".") and not name.lower().endswith(_NAME_ABBREVIATIONS):
+        name = name.rstrip(".")
+    return name.strip("\"“”'‘’ ")
+
+
+def _strip_heading(name: str) -> Tuple[str, bool]:
+    """
+    Drop leading section-heading words from a name captured in a section title.
+
+    Returns:
+        (name, whether heading words were removed)
+    """
+    words = _SECTION_NUMBER.sub("", name).split()
+    start = 0
+    while start < len(words) - 1 and words[start].lower() in _HEADING_WORDS:
+        start += 1
+    return " ".join(words[start:]), start > 0
+
+
+def _to_float(number: str) -> float:
+    return float(number.replace(",", ""))
+
+
+def _to_billions(number: str, unit: str) -> float:
+    value = _to_float(number)
+    unit = unit.lower()
+    if unit.startswith("t"):
+        return value * 1000
+    if unit in ("million", "m"):
+        return value / 1000
+    return value
+
+
+def _merge_chunks(texts: List[str], max_overlap: int = 400) -> str:
+    """Join consecutive chunks of a section, dropping the splitter's overlap."""
+    merged = texts[0] if texts else ""
+    for text in texts[1:]:
+        overlap = 0
+        for size in range(min(len(merged), len(text), max_overlap), 0, -1):
+            if merged.endswith(text[:size]):
+                overlap = size
+                break
+        if overlap:
+            merged += text[overlap:]
+        else:
+            merged += "\n" + text
+    return merged
+
+
+class RuleExtractor:
+    """Pattern-based MarketResearchData extractor with per-field confidence."""
+
+    def extract(
+        self,
+        sections: List[Tuple[str, str]],
+        source: Optional[str] = None
+    ) -> Tuple[dict, Dict[str, float]]:
+        """
+        Extract fields from a document's sections.
+
+        Args:
+            sections: (section title, section text) tuples in document order
+            source: Source name (report filenames usually carry the title)
+
+        Returns:
+            (data, confidence) - data holds only the fields that were found;
+            confidence maps every required field to a score in [0, 1]
+        """
+        # PDF section titles keep extraction's whitespace runs
+        sections = [(" ".join(title.split()), text) for title, text in sections]
+        full_text = "\n".join(f"{title}\n{text}" for title, text in sections)
+        data: dict = {}
+        confidence: Dict[str, float] = {field: 0.0 for field in REQUIRED_FIELDS}
+
+        def found(field: str, value, score: float):
+            if score > confidence[field]:
+                data[field] = value
+                confidence[field] = score
+
+        # Title line ("<Company> Market Research Report - Q3 2025"), possibly only in the filename
+        for title_text, score in ((full_text, 0.9), (source or "", 0.85)):
+            title = _TITLE.search(title_text)
+            if title:
+                found("company_name", _clean_name(title.group(1)), score)
+                period = _PERIOD.search(title_text[title.end():title.end() + 80])
+                if period:
+                    found("report_period", period.group(1), score)
+
+        period = _PERIOD.search(full_text)
+        if period:
+            found("report_period", period.group(1), 0.6)
+
+        # "<Company> holds a 12% market share". A name found in a section title
+        # may have absorbed heading words; it's kept below the confidence
+        # threshold so the LLM confirms it.
+        for match, in_title in self._holds_share(sections):
+            name, share = _clean_name(match.group(1)), _to_float(match.group(2))
+            name_score = 0.8
+            if in_title:
+                name, stripped = _strip_heading(name)
+                if stripped or len(name.split()) > 3:
+                    name_score = 0.6
+            company = data.get("company_name")
+            if company is None or self._same_company(name, company):
+                found("company_name", name, name_score)
+                found("company_market_share_percent", share, 0.9)
+                break
+        share = _SHARE_OF.search(full_text)
+        if share:
+            found("company_market_share_percent", _to_float(share.group(1)), 0.6)
+
+        product = _PRODUCT_FLAGSHIP.search(full_text)
+        if product:
+            found("product_name", _clean_name(product.group(1)), 0.9)
+        else:
+            product = _PRODUCT_QUOTED.search(full_text)
+            if product:
+                found("product_name", _clean_name(product.group(1)), 0.7)
+
+        size = _VALUED_AT.search(full_text)
+        if size:
+            found("current_market_size_billions", _to_billions(size.group(1), size.group(2)), 0.9)
+        else:
+            size = _SIZE_OF.search(full_text)
+            if size and not full_text[size.end():size.end() + 12].lstrip().lower().startswith("by"):
+                found("current_market_size_billions", _to_billions(size.group(1), size.group(2)), 0.6)
+
+        projected = _BY_2030.search(full_text)
+        if projected:
+            found("projected_market_size_2030_billions", _to_billions(projected.group(1), projected.group(2)), 0.9)
+
+        cagr = _CAGR.search(full_text)
+        if cagr:
+            found("cagr_percent", _to_float(cagr.group(1) or cagr.group(2)), 0.9)
+
+        competitors = self._competitors(full_text, data.get("company_name"))
+        if competitors:
+            found("competitors", competitors, 0.85)
+
+        swot, swot_confidence = self._swot(sections)
+        if swot_confidence:
+            found("swot", swot, swot_confidence)
+
+        return data, confidence
+
+    @staticmethod
+    def _holds_share(sections: List[Tuple[str, str]]):
+        """_HOLDS_SHARE matches per section, title line and body searched separately."""
+        for title, text in sections:
+            for part, in_title in ((title, True), (text, False)):
+                for match in _HOLDS_SHARE.finditer(part):
+                    yield match, in_title
+
+    @staticmethod
+    def _same_company(a: str, b: str) -> bool:
+        a, b = a.lower().rstrip("."), b.lower().rstrip(".")
+        return a == b or a.startswith(b) or b.startswith(a)
+
+    def _competitors(self, text: str, company: Optional[str]) -> List[dict]:
+        """Collect "Name (18% market share)" pairs, excluding the company itself."""
+        competitors = {}
+        matches = list(_COMPETITOR.finditer(text)) + list(_COMPETITOR_SENTENCE.finditer(text))
+        for match in sorted(matches, key=lambda m: m.start()):
+            name = _clean_name(match.group(1))
+            if company and self._same_company(name, company):
+                continue
+            competitors.setdefault(name, _to_float(match.group(2)))
+        return [{"company_name": name, "market_share": share} for name, share in competitors.items()]
+
+    @staticmethod
+    def _swot(sections: List[Tuple[str, str]]) -> Tuple[dict, float]:
+        """
+        Read SWOT lists ("Strengths:" headers followed by bullets or inline items).
+
+        Returns:
+            (swot dict, confidence) - confidence is 0 unless every category has items
+        """
+        swot_sections = [text for title, text in sections if "swot" in title.lower()]
+        confidence = 0.9
+        if not swot_sections:
+            # Headers may still appear elsewhere; trust them less
+            swot_sections = [text for _, text in sections]
+            confidence = 0.7
+
+        swot: Dict[str, List[str]] = {category: [] for category in SWOT_CATEGORIES}
+        current = None
+        for line in "\n".join(swot_sections).split("\n"):
+            line = line.strip()
+            header = _SWOT_HEADER.match(line)
+            if header:
+                current = header.group(1).lower()
+                inline = (header.group(2) or "").strip()
+                if inline:
+                    swot[current].extend(
+                        item.strip().rstrip(".") for item in re.split(r";\s*", inline) if item.strip().rstrip(".")
+                    )
+                continue
+            if current is None or not line:
+                continue
+            item = _BULLET.sub("", line).strip().rstrip(".")
+            if item:
+                swot[current].append(item)
+
+        swot = {category: list(dict.fromkeys(items)) for category, items in swot.items()}
+        if not all(swot.values()):
+            return swot, 0.0
+        return swot, confidence
+
+
+def extract_from_store(chunk_store, source: str) -> Tuple[dict, Dict[str, float]]:
+    """Run the rule extractor over every stored chunk of a source."""
+    sections = [
+        (title, _merge_chunks(texts))
+        for title, texts in chunk_store.source_sections(source)
+    ]
+    return RuleExtractor().extract(sections, source=source)
@@ -0,0 +1,258 @@
+"""
+Priority lanes for agent runs and ingestion.
+
+Work is classified into lanes (interactive, analytical, bulk). All lanes
+share a pool of execution slots, but each lane has its own concurrency cap,
+queue limit, maximum queue wait and request-rate quota. Queued interactive
+work is always dispatched ahead of analytical and bulk work, and requests
+that can't start within their lane's wait budget are shed (HTTP 503) rather
+than piling up behind a bulk job.
+"""
+import asyncio
+import bisect
+import itertools
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+from services.metrics import metrics
+from services.request_trace import add_stage
+
+
+INTERACTIVE = "interactive"
+ANALYTICAL = "analytical"
+BULK = "bulk"
+
+# Lower value = dispatched first
+LANE_PRIORITIES = {INTERACTIVE: 0, ANALYTICAL: 1, BULK: 2}
+
+# Requests likely to be routed to insights_tool or extract_tool
+_ANALYTICAL_PATTERN = re.compile(
+    r"\b(json|extract|export|structured|analy[sz]\w*|strateg\w*|summar\w*|recommend\w*|overview|"
+    r"landscape|trends?|opportunit\w+ analysis|deep dive|comprehensive)\b",
+    re.IGNORECASE,
+)
+
+
+def classify_query(query: str) -> str:
+    """Pick a lane for a query before the agent routes it (keyword heuristic)."""
+    return ANALYTICAL if _ANALYTICAL_PATTERN.search(query) else INTERACTIVE
+
+
+class LaneOverloadedError(Exception):
+    """Raised when a lane sheds a request (queue full, wait budget or quota exceeded)."""
+
+    def __init__(self, lane: str, reason: str, retry_after: float):
+        super().__init__(f"Server busy ({lane} lane: {reason}). Please retry shortly.")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+class Lane:
+    """Per-lane limits, rate-quota bucket and counters."""
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int,
+        max_wait_seconds: float,
+        rate_per_minute: int = 0,
+        max_queue: int = 64
+    ):
+        self.name = name
+        self.priority = LANE_PRIORITIES.get(name, len(LANE_PRIORITIES))
+        self.concurrency = concurrency
+        self.max_wait_seconds = max_wait_seconds
+        self.rate_per_minute = rate_per_minute
+        self.max_queue = max_queue
+
+        self.active = 0
+        self.waiting = 0
+        self._tokens = float(rate_per_minute)
+        self._refilled_at = time.monotonic()
+
+        self.admitted = 0
+        self.shed = 0
+        self.total_wait_seconds = 0.0
+
+    def quota_wait(self) -> float:
+        """Take one request from the quota; returns seconds to wait for it (0 if available)."""
+        if self.rate_per_minute <= 0:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(
+            float(self.rate_per_minute),
+            self._tokens + (now - self._refilled_at) * self.rate_per_minute / 60.0
+        )
+        self._refilled_at = now
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens * 60.0 / self.rate_per_minute
+
+    def refund_quota(self):
+        if self.rate_per_minute > 0:
+            self._tokens += 1
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "concurrency": self.concurrency,
+            "max_wait_seconds": self.max_wait_seconds,
+            "rate_per_minute": self.rate_per_minute or None,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "avg_wait_ms": round(self.total_wait_seconds / self.admitted * 1000, 1) if self.admitted else 0,
+        }
+
+
+class LaneScheduler:
+    """Shared slot pool with per-lane caps and priority dispatch."""
+
+    def __init__(self, total_slots: int, lanes: List[Lane]):
+        self.total_slots = total_slots
+        self.lanes: Dict[str, Lane] = {lane.name: lane for lane in lanes}
+        self._active = 0
+        self._queue: List[tuple] = []  # Sorted (priority, seq, lane, future)
+        self._sequence = itertools.count()
+
+    def _has_capacity(self, lane: Lane) -> bool:
+        return self._active < self.total_slots and lane.active < lane.concurrency
+
+    def _start(self, lane: Lane):
+        self._active += 1
+        lane.active += 1
+
+    def _release(self, lane: Lane):
+        self._active -= 1
+        lane.active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots to queued requests, highest priority first."""
+        index = 0
+        while index < len(self._queue) and self._active < self.total_slots:
+            _, _, lane, future = self._queue[index]
+            if future.done():  # Timed out or cancelled
+                self._queue.pop(index)
+                continue
+            if lane.active < lane.concurrency:
+                self._queue.pop(index)
+                lane.waiting -= 1
+                self._start(lane)
+                future.set_result(True)
+                continue
+            index += 1  # Lane at its cap; lower-priority lanes may still run
+
+    def _shed(self, lane: Lane, reason: str, retry_after: float) -> LaneOverloadedError:
+        lane.shed += 1
+        metrics.increment(f"shed.{lane.name}")
+        return LaneOverloadedError(lane.name, reason, retry_after)
+
+    @asynccontextmanager
+    async def slot(self, lane_name: str):
+        """
+        Hold an execution slot in a lane for the duration of the block.
+
+        Raises:
+            LaneOverloadedError: If the lane's queue is full, its quota can't
+                be met within the wait budget, or no slot frees up in time
+        """
+        lane = self.lanes[lane_name]
+        start_time = time.monotonic()
+
+        quota_wait = lane.quota_wait()
+        if quota_wait > lane.max_wait_seconds:
+            lane.refund_quota()
+            raise self._shed(lane, "quota exhausted", quota_wait)
+        if quota_wait:
+            try:
+                await asyncio.sleep(quota_wait)
+            except asyncio.CancelledError:
+                lane.refund_quota()
+                raise
+
+        # Start now only if nothing of equal or higher priority is already queued
+        queued_ahead = any(
+            entry[0] <= lane.priority and not entry[3].done() for entry in self._queue
+        )
+        if self._has_capacity(lane) and not queued_ahead:
+            self._start(lane)
+        else:
+            if lane.waiting >= lane.max_queue:
+                lane.refund_quota()
+                raise self._shed(lane, "queue full", lane.max_wait_seconds)
+            future = asyncio.get_running_loop().create_future()
+            self._enqueue((lane.priority, next(self._sequence), lane, future))
+            lane.waiting += 1
+            remaining = max(lane.max_wait_seconds - (time.monotonic() - start_time), 0)
+            try:
+                await asyncio.wait_for(asyncio.shield(future), remaining)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                # Cancelled after _dispatch granted the slot: give it back
+                if future.done() and not future.cancelled():
+                    self._release(lane)
+                lane.refund_quota()
+                raise
+            finally:
+                if not future.done():
+                    future.cancel()
+                    lane.waiting -= 1
+            if future.cancelled():
+                lane.refund_quota()
+                raise self._shed(lane, "wait budget exceeded", lane.max_wait_seconds)
+
+        wait_seconds = time.monotonic() - start_time
+        lane.admitted += 1
+        lane.total_wait_seconds += wait_seconds
+        metrics.observe(f"lane.{lane.name}.wait_ms", round(wait_seconds * 1000, 1))
+        add_stage("lane_wait", wait_seconds * 1000)
+        try:
+            yield
+        finally:
+            self._release(lane)
+
+    async def run(self, lane_name: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await fn() while holding a slot in a lane."""
+        async with self.slot(lane_name):
+            return await fn()
+
+    def _enqueue(self, entry: tuple):
+        """Insert a waiter in (priority, arrival) order (insort's key= needs Python 3.10)."""
+        keys = [item[:2] for item in self._queue]
+        self._queue.insert(bisect.bisect(keys, entry[:2]), entry)
+
+    @property
+    def waiting(self) -> int:
+        return sum(lane.waiting for lane in self.lanes.values())
+
+    def stats(self) -> dict:
+        """Get per-lane activity and shedding statistics."""
+        return {
+            "total_slots": self.total_slots,
+            "active": self._active,
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()},
+        }
+
+
+_scheduler: Optional[LaneScheduler] = None
+
+
+def get_scheduler() -> LaneScheduler:
+    """Get the shared lane scheduler (singleton pattern)."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LaneScheduler(
+            Config.MAX_CONCURRENT_QUERIES,
+            [Lane(name, **limits) for name, limits in Config.LANES.items()]
+        )
+    return _scheduler
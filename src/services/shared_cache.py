@@ -0,0 +1,436 @@
+"""
+Caches shared between worker processes.
+
+Backends:
+- "sqlite": a WAL-mode SQLite file, in a private (0700, per-user) directory on
+  /dev/shm (shared memory) when available. Every worker process of the
+  service sees the same entries.
+- "redis": a local Redis/Valkey service (CACHE_URL), if the redis package is installed.
+- "memory": per-process LRU dict (fallback when nothing else is available).
+
+Shared backends never unpickle: values are stored as JSON, and lists of
+floats (embedding vectors) as raw float32 bytes.
+"""
+import json
+import os
+import sqlite3
+import stat
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+import numpy as np
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+
+
+# Leading byte of a stored value: its encoding
+_JSON = b"j"
+_FLOAT32 = b"f"
+
+# Atomic increment of a JSON-encoded integer ("j<number>")
+_REDIS_INCR = """
+local value = redis.call('GET', KEYS[1])
+local number = (value and tonumber(string.sub(value, 2)) or 0) + tonumber(ARGV[1])
+redis.call('SET', KEYS[1], 'j' .. number)
+return number
+"""
+
+
+def encode_value(value: Any) -> bytes:
+    """Serialize a cache value (JSON, or raw float32 for vectors)."""
+    if isinstance(value, np.ndarray) or (
+        isinstance(value, (list, tuple)) and value and all(isinstance(x, float) for x in value)
+    ):
+        return _FLOAT32 + np.asarray(value, dtype=np.float32).tobytes()
+    return _JSON + json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def decode_value(data: bytes) -> Optional[Any]:
+    """Deserialize a value written by encode_value (None for unknown encodings)."""
+    data = bytes(data)
+    if data[:1] == _FLOAT32:
+        return np.frombuffer(data, dtype=np.float32, offset=1).tolist()
+    if data[:1] == _JSON:
+        return json.loads(data[1:].decode("utf-8"))
+    # Written by an older version (or something else): treat as a miss
+    return None
+
+
+def private_directory(path: str) -> str:
+    """
+    Create a directory only the current user can access, or check that an
+    existing one is (owned by us, not a symlink, no group/other access).
+
+    Raises:
+        PermissionError: If the directory exists but isn't private
+    """
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f"{path} is not a directory owned by this user")
+    if info.st_mode & 0o077:
+        raise PermissionError(f"{path} is accessible by other users (mode {oct(info.st_mode & 0o777)})")
+    return path
+
+
+def create_private_file(path: str):
+    """
+    Create a file readable only by the current user (O_EXCL, 0600), or check
+    that an existing one is ours and restrict its permissions.
+
+    Raises:
+        PermissionError: If the directory is writable by everyone, or the
+            file is a symlink or owned by another user
+    """
+    parent = Path(path).parent
+    parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if parent.stat().st_mode & 0o002:
+        raise PermissionError(f"{parent} is writable by other users; set CACHE_PATH to a private directory")
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, "O_NOFOLLOW", 0), 0o600))
+        return
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISREG(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f"{path} is not a regular file owned by this user")
+    if info.st_mode & 0o077:
+        os.chmod(path, 0o600)
+
+
+class MemoryCache:
+    """In-process LRU cache with optional TTL."""
+
+    backend = "memory"
+
+    def __init__(self, namespace: str, max_entries: Optional[int] = None):
+        self.namespace = namespace
+        self.max_entries = max_entries or Config.CACHE_MAX_ENTRIES
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = (value, expires_at)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set a key only if it's absent (or expired); returns whether it was set."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and not (entry[1] and entry[1] < time.time()):
+                return False
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+            self._data.move_to_end(key)
+            return True
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        """Atomically add to an integer value (missing counts as 0); returns the new value."""
+        with self._lock:
+            entry = self._data.get(key)
+            value = (entry[0] if entry is not None else 0) + amount
+            self._data[key] = (value, entry[1] if entry is not None else None)
+            self._data.move_to_end(key)
+            return value
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    Cross-process cache in a WAL-mode SQLite file.
+
+    Connections are opened lazily per process and thread, so instances
+    created before a fork (preloaded app) are safe to use in workers.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, namespace: str, path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.namespace = namespace
+        self.path = path or default_sqlite_path()
+        self.max_entries = max_entries or Config.CACHE_MAX_ENTRIES
+        self._local = threading.local()
+        self._writes = 0
+        # Fail fast (and fall back to memory) if the file can't be created safely
+        create_private_file(self.path)
+        self._connection().execute("SELECT 1")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT, key TEXT, value BLOB, expires_at REAL, accessed_at REAL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        now = time.time()
+        found = {}
+        conn = self._connection()
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT key, value FROM cache WHERE namespace = ? AND key IN ({placeholders}) "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                [self.namespace, *batch, now]
+            ).fetchall()
+            for key, value in rows:
+                value = decode_value(value)
+                if value is not None:
+                    found[key] = value
+        return found
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        if not items:
+            return
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            [
+                (self.namespace, key, encode_value(value), expires_at, now)
+                for key, value in items.items()
+            ]
+        )
+        self._writes += len(items)
+        if self._writes >= Config.CACHE_MAX_ENTRIES // 10:
+            self._writes = 0
+            self._evict(conn)
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set a key only if it's absent (or expired); returns whether it was set."""
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO cache (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (namespace, key) DO UPDATE SET "
+            "value = excluded.value, expires_at = excluded.expires_at, accessed_at = excluded.accessed_at "
+            "WHERE cache.expires_at IS NOT NULL AND cache.expires_at <= ?",
+            (self.namespace, key, encode_value(value), now + ttl if ttl else None, now, now)
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        """Atomically add to an integer value (missing counts as 0); returns the new value."""
+        conn = self._connection()
+        # IMMEDIATE takes the write lock up front, so the read-modify-write can't interleave
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (self.namespace, key, time.time())
+            ).fetchone()
+            value = (decode_value(row[0]) if row is not None else None) or 0
+            value += amount
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, NULL, ?)",
+                (self.namespace, key, encode_value(value), time.time())
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop expired entries and the oldest writes beyond max_entries."""
+        conn.execute(
+            "DELETE FROM cache WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at < ?",
+            (self.namespace, time.time())
+        )
+        conn.execute(
+            "DELETE FROM cache WHERE namespace = ? AND key IN ("
+            "SELECT key FROM cache WHERE namespace = ? ORDER BY accessed_at DESC, rowid DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_entries)
+        )
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+    def __len__(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+
+
+class RedisCache:
+    """Cache backed by a local Redis-compatible service."""
+
+    backend = "redis"
+
+    def __init__(self, namespace: str, url: Optional[str] = None):
+        import redis
+        self.namespace = namespace
+        self._client = redis.Redis.from_url(url or Config.CACHE_URL)
+        self._client.ping()
+
+    def _key(self, key: str) -> str:
+        return f"market-analyst:{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self._client.mget([self._key(key) for key in keys])
+        found = {}
+        for key, value in zip(keys, values):
+            value = decode_value(value) if value is not None else None
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        pipe = self._client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(self._key(key), encode_value(value), ex=int(ttl) if ttl else None)
+        pipe.execute()
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set a key only if it's absent (or expired); returns whether it was set."""
+        return bool(self._client.set(self._key(key), encode_value(value), nx=True, ex=int(ttl) if ttl else None))
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        """Atomically add to an integer value (missing counts as 0); returns the new value."""
+        # Server-side, keeping the value in encode_value's JSON format so get() reads it
+        return int(self._client.eval(_REDIS_INCR, 1, self._key(key), amount))
+
+    def delete(self, key: str) -> None:
+        self._client.delete(self._key(key))
+
+    def clear(self) -> None:
+        keys = list(self._client.scan_iter(match=self._key("*")))
+        if keys:
+            self._client.delete(*keys)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._client.scan_iter(match=self._key("*")))
+
+
+def default_sqlite_path() -> str:
+    """
+    Prefer RAM-backed /dev/shm so the shared cache never touches disk.
+
+    /dev/shm is world-writable, so the file goes in a per-user 0700
+    directory there; STORAGE_DIR is used if that directory isn't private.
+    """
+    if Config.CACHE_PATH:
+        return Config.CACHE_PATH
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        try:
+            directory = private_directory(f"/dev/shm/market-analyst-{os.getuid()}")
+            return os.path.join(directory, f"{Config.PINECONE_INDEX_NAME}.db")
+        except OSError as e:
+            print(f"[SharedCache] Warning: not using /dev/shm ({e})")
+    return os.path.join(Config.STORAGE_DIR, "shared_cache.db")
+
+
+_caches: Dict[str, Any] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace: str):
+    """
+    Get the cache for a namespace using Config.CACHE_BACKEND.
+
+    Falls back to an in-process MemoryCache if the shared backend is unavailable.
+    """
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is not None:
+            return cache
+
+        backend = Config.CACHE_BACKEND.lower()
+        try:
+            if backend == "sqlite":
+                cache = SQLiteCache(namespace)
+            elif backend == "redis":
+                cache = RedisCache(namespace)
+        except Exception as e:
+            print(f"[SharedCache] Warning: {backend} cache unavailable ({e}); using in-process cache for '{namespace}'")
+        if cache is None:
+            cache = MemoryCache(namespace)
+
+        _caches[namespace] = cache
+        return cache
+
+
+def cache_sizes() -> Dict[str, dict]:
+    """Get entry counts per cache namespace (for the stats endpoint)."""
+    with _caches_lock:
+        caches = dict(_caches)
+    return {
+        namespace: {"backend": cache.backend, "entries": len(cache)}
+        for namespace, cache in caches.items()
+    }
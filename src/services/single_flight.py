@@ -0,0 +1,117 @@
+"""
+Single-flight deduplication of concurrent identical work.
+
+The first caller for a key runs the work; callers arriving while it is in
+flight wait for the same result (or exception) instead of repeating it.
+Nothing is cached afterwards - that's the answer cache's job. Groups are
+per process; each reports how many calls it coalesced to the metrics
+registry ("coalesced.<name>").
+"""
+import asyncio
+import hashlib
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.metrics import metrics
+from services.prompt_cache import get_prompt_cache
+from services.request_trace import stage
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Thread-based single-flight group (for blocking helpers run in worker threads)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn once per key among concurrent callers and share its result."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.increment(f"coalesced.{self.name}")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """Event-loop single-flight group (for request handlers)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn() once per key among concurrent callers and share its result.
+
+        The work runs as its own task, so a caller that disconnects (and is
+        cancelled) doesn't cancel it for the others.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            metrics.increment(f"coalesced.{self.name}")
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved even if every caller went away
+
+
+# Shared groups for the blocking helpers used by the tools
+retrieval_calls = SingleFlight("retrieval")
+llm_calls = SingleFlight("llm")
+
+
+def invoke_llm(llm, prompt_value, cache_prefix: Optional[str] = None, prefix_messages: int = 1):
+    """
+    Invoke a chat model, sharing one call between identical concurrent prompts.
+
+    With cache_prefix, the first prefix_messages messages go through the
+    prompt cache (see services.prompt_cache).
+    """
+    key = hashlib.sha1(
+        f"{getattr(llm, 'model', '')}\x00{getattr(llm, 'temperature', '')}\x00{prompt_value.to_string()}".encode("utf-8")
+    ).hexdigest()
+    with stage("llm"):
+        if cache_prefix:
+            return llm_calls.do(
+                key, lambda: get_prompt_cache().invoke(llm, prompt_value, cache_prefix, prefix_messages)
+            )
+        return llm_calls.do(key, lambda: llm.invoke(prompt_value))
@@ -0,0 +1,130 @@
+"""
+Token counting with the embedding model's tokenizer.
+"""
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+
+
+class TokenCounter:
+    """
+    Counts word-piece tokens the way the embedding model sees them.
+
+    Uses the model's fast (Rust) tokenizer in batch mode and keeps an LRU
+    cache of token counts, since the text splitter asks for the length of
+    the same separators and pieces many times per document.
+    """
+
+    def __init__(self, model_name: Optional[str] = None, cache_size: Optional[int] = None):
+        self.model_name = model_name or Config.EMBEDDING_MODEL
+        self.max_tokens = Config.EMBEDDING_MAX_TOKENS
+        self._cache_size = cache_size or Config.TOKEN_COUNT_CACHE_SIZE
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._tokenizer = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def tokenizer(self):
+        """Lazily load the fast tokenizer for the embedding model."""
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name, use_fast=True)
+        return self._tokenizer
+
+    @property
+    def special_tokens(self) -> int:
+        """Number of special tokens ([CLS]/[SEP]) added to every encoded input."""
+        return self.tokenizer.num_special_tokens_to_add(pair=False)
+
+    def count(self, text: str) -> int:
+        """Count tokens in a single text (without special tokens)."""
+        with self._lock:
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                self.hits += 1
+                return cached
+        return self.count_batch([text])[0]
+
+    def count_batch(self, texts: List[str]) -> List[int]:
+        """
+        Count tokens for many texts with a single tokenizer call.
+
+        Args:
+            texts: Texts to count
+
+        Returns:
+            Token counts (without special tokens), in input order
+        """
+        counts: List[Optional[int]] = [None] * len(texts)
+        missing = {}
+
+        with self._lock:
+            for i, text in enumerate(texts):
+                cached = self._cache.get(text)
+                if cached is not None:
+                    self._cache.move_to_end(text)
+                    self.hits += 1
+                    counts[i] = cached
+                else:
+                    missing.setdefault(text, []).append(i)
+
+        if missing:
+            unique_texts = list(missing)
+            encoded = self.tokenizer(
+                unique_texts,
+                add_special_tokens=False,
+                truncation=False,
+                return_attention_mask=False,
+                return_token_type_ids=False,
+                verbose=False,
+            )["input_ids"]
+
+            with self._lock:
+                for text, ids in zip(unique_texts, encoded):
+                    n_tokens = len(ids)
+                    self.misses += 1
+                    self._cache[text] = n_tokens
+                    for i in missing[text]:
+                        counts[i] = n_tokens
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+
+        return counts
+
+    def count_truncated(self, texts: List[str]) -> int:
+        """Count how many texts exceed the embedding model's input window."""
+        budget = self.max_tokens - self.special_tokens
+        return sum(1 for n in self.count_batch(texts) if n > budget)
+
+    def cache_info(self) -> dict:
+        """Get token count cache statistics."""
+        return {
+            "size": len(self._cache),
+            "max_size": self._cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_token_counter: Optional[TokenCounter] = None
+
+
+def get_token_counter() -> TokenCounter:
+    """Get the shared token counter (singleton pattern)."""
+    global _token_counter
+    if _token_counter is None:
+        _token_counter = TokenCounter()
+    return _token_counter
+
+
+def estimate_llm_tokens(text: str) -> int:
+    """Rough LLM prompt token estimate (~4 characters per token)."""
+    return (len(text) + 3) // 4
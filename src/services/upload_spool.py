@@ -0,0 +1,97 @@
+"""
+Chunked spooling of uploaded files to disk.
+"""
+import hashlib
+import os
+import tempfile
+from typing import Optional
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds Config.MAX_UPLOAD_BYTES."""
+
+
+class SpooledUpload:
+    """A spooled upload on disk. Use as a context manager to delete the file afterwards."""
+
+    def __init__(self, path: str, size: int, sha256: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    def cleanup(self):
+        """Delete the spooled file."""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+
+
+async def spool_upload(
+    upload,
+    max_bytes: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    suffix: str = ""
+) -> SpooledUpload:
+    """
+    Copy an UploadFile to a temporary file in fixed-size chunks.
+
+    Only one chunk is held in memory at a time. The size limit is checked as
+    bytes arrive, so oversized uploads stop at the limit instead of being
+    read in full. A SHA-256 of the content is computed on the way through.
+
+    Args:
+        upload: FastAPI UploadFile
+        max_bytes: Maximum allowed size (defaults to Config.MAX_UPLOAD_BYTES)
+        chunk_size: Read size per chunk (defaults to Config.UPLOAD_CHUNK_BYTES)
+        suffix: Temp file suffix (e.g. ".pdf")
+
+    Returns:
+        SpooledUpload pointing at the temp file
+
+    Raises:
+        UploadTooLargeError: If the upload exceeds max_bytes
+    """
+    max_bytes = max_bytes or Config.MAX_UPLOAD_BYTES
+    chunk_size = chunk_size or Config.UPLOAD_CHUNK_BYTES
+
+    spool_dir = Config.UPLOAD_SPOOL_DIR or None
+    if spool_dir:
+        os.makedirs(spool_dir, exist_ok=True)
+
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=suffix, dir=spool_dir)
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(
+                        f"File exceeds the maximum upload size of {max_bytes // (1024 * 1024)} MB."
+                    )
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    return SpooledUpload(path, size, digest.hexdigest())
@@ -0,0 +1,306 @@
+"""
+Compressed in-memory vector representations.
+
+Codecs trade memory for recall (bytes per 384-dim vector):
+- "float32": 1536, exact
+- "float16": 768
+- "int8": 384, per-dimension symmetric scalar quantization
+- "pq": PQ_SUBVECTORS (48 by default), product quantization with 256
+  centroids per subvector; scored with per-query lookup tables (ADC)
+
+CompressedVectors keeps a growable code matrix and answers inner-product
+top-k queries, optionally rescoring the best candidates with exact vectors
+supplied by the caller.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+
+
+# Rows scored per block (bounds temporary memory for large corpora)
+_BLOCK_ROWS = 65536
+
+
+class VectorCodec:
+    """Exact float32 storage; also the base codec interface."""
+
+    name = "float32"
+    code_dtype = np.float32
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    @property
+    def code_width(self) -> int:
+        """Code entries per vector."""
+        return self.dimension
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return self.code_width * np.dtype(self.code_dtype).itemsize
+
+    @property
+    def trained(self) -> bool:
+        return True
+
+    def fit(self, vectors: np.ndarray):
+        """Learn codec parameters from a sample (no-op for fixed codecs)."""
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=self.code_dtype)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return np.asarray(codes, dtype=np.float32)
+
+    def scores(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Approximate inner products of a float32 query with every code row."""
+        return self.decode(codes) @ query
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """Learned parameters, for persisting."""
+        return {}
+
+    def load_state(self, state: Dict[str, np.ndarray]):
+        """Restore parameters saved by state()."""
+
+
+class Float16Codec(VectorCodec):
+    """Half-precision storage (scores computed in float32)."""
+
+    name = "float16"
+    code_dtype = np.float16
+
+
+class Int8Codec(VectorCodec):
+    """Per-dimension symmetric int8 quantization (scale = max |x| / 127)."""
+
+    name = "int8"
+    code_dtype = np.int8
+
+    def __init__(self, dimension: int):
+        super().__init__(dimension)
+        self.scale: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.scale is not None
+
+    def fit(self, vectors: np.ndarray):
+        peak = np.abs(np.asarray(vectors, dtype=np.float32)).max(axis=0)
+        self.scale = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        scaled = np.asarray(vectors, dtype=np.float32) / self.scale
+        return np.clip(np.rint(scaled), -127, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * self.scale
+
+    def scores(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # Fold the scale into the query instead of dequantizing every row
+        return codes.astype(np.float32) @ (query * self.scale)
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"scale": self.scale} if self.scale is not None else {}
+
+    def load_state(self, state: Dict[str, np.ndarray]):
+        self.scale = state["scale"].astype(np.float32)
+
+
+class PQCodec(VectorCodec):
+    """
+    Product quantization: each vector is split into subvectors, and each
+    subvector is stored as the uint8 index of its nearest k-means centroid.
+    """
+
+    name = "pq"
+    code_dtype = np.uint8
+
+    def __init__(self, dimension: int, subvectors: Optional[int] = None, iterations: int = 20):
+        super().__init__(dimension)
+        self.subvectors = subvectors or Config.PQ_SUBVECTORS
+        if dimension % self.subvectors:
+            raise ValueError(f"PQ_SUBVECTORS ({self.subvectors}) must divide the dimension ({dimension})")
+        self.sub_dimension = dimension // self.subvectors
+        self.iterations = iterations
+        self.centroids: Optional[np.ndarray] = None  # (subvectors, 256, sub_dimension)
+
+    @property
+    def code_width(self) -> int:
+        return self.subvectors
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, dimension) -> (subvectors, n, sub_dimension)."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return np.ascontiguousarray(vectors.reshape(len(vectors), self.subvectors, self.sub_dimension).transpose(1, 0, 2))
+
+    @staticmethod
+    def _assign(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Nearest centroid per point (squared L2)."""
+        distances = points @ (-2.0 * centroids.T)
+        distances += (centroids ** 2).sum(axis=1)
+        return distances.argmin(axis=1)
+
+    def fit(self, vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) > Config.PQ_TRAINING_SAMPLE:
+            sample = np.random.default_rng(0).choice(len(vectors), Config.PQ_TRAINING_SAMPLE, replace=False)
+            vectors = vectors[sample]
+        clusters = min(256, len(vectors))
+        rng = np.random.default_rng(0)
+
+        centroids = np.zeros((self.subvectors, 256, self.sub_dimension), dtype=np.float32)
+        for j, points in enumerate(self._split(vectors)):
+            current = points[rng.choice(len(points), clusters, replace=False)].copy()
+            for _ in range(self.iterations):
+                labels = self._assign(points, current)
+                sums = np.stack([
+                    np.bincount(labels, weights=points[:, d], minlength=clusters)
+                    for d in range(self.sub_dimension)
+                ], axis=1)
+                counts = np.bincount(labels, minlength=clusters)[:, None]
+                # Empty clusters keep their previous centroid
+                current = np.where(counts > 0, sums / np.maximum(counts, 1), current).astype(np.float32)
+            centroids[j, :clusters] = current
+            # Unused code slots (tiny samples) repeat a real centroid
+            centroids[j, clusters:] = current[0]
+        self.centroids = centroids
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        parts = self._split(vectors)
+        codes = np.empty((parts.shape[1], self.subvectors), dtype=np.uint8)
+        for j, points in enumerate(parts):
+            codes[:, j] = self._assign(points, self.centroids[j])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = [self.centroids[j][codes[:, j]] for j in range(self.subvectors)]
+        return np.concatenate(parts, axis=1)
+
+    def scores(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # Lookup table of subvector-centroid inner products, summed per code row
+        table = np.einsum("jkd,jd->jk", self.centroids, query.reshape(self.subvectors, self.sub_dimension))
+        return table[np.arange(self.subvectors), codes].sum(axis=1)
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"centroids": self.centroids} if self.centroids is not None else {}
+
+    def load_state(self, state: Dict[str, np.ndarray]):
+        centroids = state["centroids"].astype(np.float32)
+        if centroids.shape != (self.subvectors, 256, self.sub_dimension):
+            raise ValueError(f"PQ codebook shape {centroids.shape} doesn't match PQ_SUBVECTORS={self.subvectors}")
+        self.centroids = centroids
+
+
+CODECS = {codec.name: codec for codec in (VectorCodec, Float16Codec, Int8Codec, PQCodec)}
+
+
+def make_codec(name: str, dimension: Optional[int] = None) -> VectorCodec:
+    """Create a codec by name (float32, float16, int8 or pq)."""
+    codec = CODECS.get(name.lower())
+    if codec is None:
+        raise ValueError(f"Unknown vector codec '{name}' (expected one of: {', '.join(CODECS)})")
+    return codec(dimension or Config.EMBEDDING_DIMENSION)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best], kind="stable")]
+
+
+class CompressedVectors:
+    """Growable matrix of codes with approximate (optionally rescored) top-k search."""
+
+    def __init__(self, codec: VectorCodec, codes: Optional[np.ndarray] = None):
+        """
+        Args:
+            codec: Codec the codes were encoded with
+            codes: Existing code matrix to search (e.g. a read-only memmap);
+                None starts empty
+        """
+        self.codec = codec
+        if codes is None:
+            codes = np.empty((0, codec.code_width), dtype=codec.code_dtype)
+        self._codes = codes
+        self._size = len(codes)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the stored codes."""
+        return self._size * self.codec.bytes_per_vector
+
+    def clear(self):
+        # Keep the buffer: concurrent searches may still be reading it
+        self._size = 0
+
+    def add(self, vectors: np.ndarray):
+        """Encode and append vectors (the codec must be trained)."""
+        codes = self.codec.encode(vectors)
+        needed = self._size + len(codes)
+        if needed > len(self._codes):
+            # Grow geometrically so incremental adds stay amortized O(1)
+            grown = np.empty((max(needed, len(self._codes) * 2, 1024), self.codec.code_width), dtype=self._codes.dtype)
+            grown[:self._size] = self._codes[:self._size]
+            self._codes = grown
+        self._codes[self._size:needed] = codes
+        self._size = needed
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        rescore: Optional[Callable[[List[int]], List[Optional[np.ndarray]]]] = None,
+        candidates: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Find the rows with the highest inner product with a query.
+
+        Args:
+            query: Query vector
+            k: Number of results
+            rescore: Optional callback returning exact vectors (or None) for
+                candidate rows; candidates are then re-ranked by exact score
+            candidates: Approximate candidates to rescore (default k x
+                LOCAL_INDEX_RESCORE_CANDIDATES)
+
+        Returns:
+            (row, score) tuples, best first
+        """
+        # Size before buffer: add() swaps in a grown buffer before raising the size
+        size = self._size
+        codes = self._codes
+        if not size:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        scores = np.empty(size, dtype=np.float32)
+        for start in range(0, size, _BLOCK_ROWS):
+            end = min(start + _BLOCK_ROWS, size)
+            scores[start:end] = self.codec.scores(query, codes[start:end])
+
+        if rescore is None:
+            best = top_k(scores, k)
+            return [(int(row), float(scores[row])) for row in best]
+
+        pool = top_k(scores, candidates or k * Config.LOCAL_INDEX_RESCORE_CANDIDATES)
+        exact = rescore([int(row) for row in pool])
+        rescored = np.array([
+            float(np.dot(vector, query)) if vector is not None else float(scores[row])
+            for row, vector in zip(pool, exact)
+        ], dtype=np.float32)
+        order = top_k(rescored, k)
+        return [(int(pool[i]), float(rescored[i])) for i in order]
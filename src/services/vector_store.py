@@ -1,10 +1,16 @@
 """
 Vector store management using Pinecone.
 """
+import asyncio
+import hashlib
+import threading
 import time
-from typing import List
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
 from pinecone import Pinecone as PineconeClient, ServerlessSpec
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_pinecone import Pinecone as PineconeVectorStore
 from langchain_core.documents import Document
 import sys
@@ -12,6 +18,101 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import Config
+from services.reranker import get_reranker
+from services.pinecone_async import AsyncPineconeIndex, IndexStatsCache
+from services.chunk_store import chunk_key, get_chunk_store, section_key
+from services.document_registry import get_document_registry
+from services.embeddings import get_embeddings
+from services.local_index import LocalVectorIndex
+from services.retrieval_depth import choose_k
+from services.single_flight import retrieval_calls
+from services.metrics import metrics
+from services.request_trace import stage
+
+
+# Indexes already checked/created in this process (avoids list_indexes() per construction)
+_verified_indexes = set()
+
+# Pinecone's top_k limit (used to list a legacy source's vectors)
+_QUERY_TOP_K_LIMIT = 10000
+
+# Searches shared by the tool calls of the current request (see VectorStoreManager.search_scope)
+_request_searches: ContextVar[Optional["RequestSearches"]] = ContextVar("request_searches", default=None)
+
+
+def _on_event_loop() -> bool:
+    """Whether the current thread is running an event loop (blocking on it would deadlock)."""
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class RequestSearches:
+    """
+    Scored searches shared by the tool calls of one request.
+    
+    Each distinct query text is searched once, at the largest depth any tool
+    uses, whether it was prefetched while the agent was routing or requested
+    by a tool (concurrent tool calls for the same text wait for one search).
+    """
+    
+    def __init__(self, k: int):
+        self.k = k
+        self._lock = threading.Lock()
+        self._searches: Dict[str, Future] = {}
+        self.prefetched: Optional[str] = None
+        self.prefetch_used = False
+    
+    def prefetch(self, query: str, executor: ThreadPoolExecutor, search: Callable[[str, int], List[tuple]]):
+        """Start searching for a query in the background."""
+        self.prefetched = _normalize_query(query)
+        with self._lock:
+            # In the caller's context, so the search is timed as part of its request
+            self._searches[self.prefetched] = executor.submit(copy_context().run, search, query, self.k)
+    
+    def search(self, query: str, fetch_k: int, search: Callable[[str, int], List[tuple]]) -> List[tuple]:
+        """
+        Get (Document, score) pairs for a query, searching only if no tool
+        call in this request has searched for the same text yet.
+        
+        Documents are copied, since every tool call annotates metadata.
+        """
+        if fetch_k > self.k:
+            return search(query, fetch_k)
+        normalized = _normalize_query(query)
+        with self._lock:
+            future = self._searches.get(normalized)
+            leader = future is None
+            if leader:
+                future = self._searches[normalized] = Future()
+        
+        if leader:
+            try:
+                future.set_result(search(query, self.k))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            metrics.increment("shared_searches")
+        
+        try:
+            scored = future.result()
+        except Exception as e:
+            if leader:
+                raise
+            print(f"[Retrieval] Shared search failed, searching again: {e}")
+            return search(query, fetch_k)
+        if normalized == self.prefetched:
+            self.prefetch_used = True
+        return [
+            (Document(page_content=doc.page_content, metadata=dict(doc.metadata)), score)
+            for doc, score in scored[:fetch_k]
+        ]
 
 
 class VectorStoreManager:
@@ -22,12 +123,8 @@ class VectorStoreManager:
         self.pc = PineconeClient(api_key=Config.PINECONE_API_KEY)
         self.index_name = Config.PINECONE_INDEX_NAME
         
-        # Initialize HuggingFace embeddings (all-MiniLM-L12-v2)
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=Config.EMBEDDING_MODEL,
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}  # Normalize for cosine similarity
-        )
+        # Shared HuggingFace embeddings (all-MiniLM-L12-v2) with query-embedding cache
+        self.embeddings = get_embeddings()
         
         # Initialize or get index
         self._init_index()
@@ -42,9 +139,36 @@ class VectorStoreManager:
             text_key="text",
             namespace=Config.PINECONE_NAMESPACE
         )
+        
+        # Local compact store of normalized chunk text for context building
+        self.chunk_store = get_chunk_store()
+        
+        # Source -> vector IDs, for listing, deleting and replacing documents
+        self.registry = get_document_registry()
+        
+        # Optional compressed in-memory index, searched instead of Pinecone
+        self.local_index = (
+            LocalVectorIndex(self.embeddings, exact_vectors=self.embeddings.document_cache)
+            if Config.LOCAL_INDEX_CODEC.lower() != "none" else None
+        )
+        
+        # Async data-plane client (pooled HTTP session) and cached index stats
+        self.async_index = AsyncPineconeIndex(self.index_name)
+        self.stats_cache = IndexStatsCache(self.async_index.describe_index_stats)
+        # App event loop (set by start()); worker-thread searches send their
+        # Pinecone queries through the async client on it
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Speculative searches run here while the routing call is in flight
+        self._prefetch_executor = ThreadPoolExecutor(
+            max_workers=Config.MAX_CONCURRENT_QUERIES, thread_name_prefix="prefetch"
+        )
     
     def _init_index(self):
-        """Initialize Pinecone index if it doesn't exist."""
+        """Initialize Pinecone index if it doesn't exist (checked once per process)."""
+        if self.index_name in _verified_indexes:
+            return
+        
         existing_indexes = [idx["name"] for idx in self.pc.list_indexes()]
         
         if self.index_name not in existing_indexes:
@@ -60,30 +184,257 @@ class VectorStoreManager:
             )
             # Wait for index to be ready
             time.sleep(1)
+        
+        _verified_indexes.add(self.index_name)
+    
+    @staticmethod
+    def source_id_prefix(source: str) -> str:
+        """Stable per-source ID prefix, so documents never overwrite each other's chunks."""
+        return "doc_" + hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+    
+    @staticmethod
+    def _chunk_ids(documents: List[Document], id_prefix: Optional[str] = None) -> List[str]:
+        """Generate chunk IDs, optionally namespaced per source to avoid collisions."""
+        prefix = f"{id_prefix}_chunk_" if id_prefix else "chunk_"
+        return [f"{prefix}{i}" for i in range(len(documents))]
+    
+    def _centroids(self, documents: List[Document], vectors: List[List[float]]) -> List[dict]:
+        """
+        Section and document centroid vectors for the coarse retrieval stage.
+        
+        Each centroid is the normalized mean of its chunks' embeddings. Also
+        tags every chunk with its "section_id" (the fine stage filters on it).
+        """
+        sections: Dict[str, dict] = {}
+        documents_by_source: Dict[str, list] = {}
+        for doc, vector in zip(documents, vectors):
+            source = str(doc.metadata.get("source", "unknown"))
+            section = str(doc.metadata.get("section", "Unknown Section"))
+            section_id = section_key(source, section)
+            doc.metadata["section_id"] = section_id
+            entry = sections.setdefault(section_id, {"source": source, "section": section, "vectors": []})
+            entry["vectors"].append(vector)
+            documents_by_source.setdefault(source, []).append(vector)
+        
+        def unit_mean(group: list) -> List[float]:
+            mean = np.asarray(group, dtype=np.float32).mean(axis=0)
+            norm = float(np.linalg.norm(mean))
+            return (mean / norm if norm else mean).tolist()
+        
+        records = [
+            {
+                "id": f"section_{section_id}",
+                "values": unit_mean(entry["vectors"]),
+                "metadata": {
+                    "level": "section",
+                    "source": entry["source"],
+                    "section": entry["section"],
+                    "section_id": section_id,
+                    "document_id": self.source_id_prefix(entry["source"]),
+                    "chunks": len(entry["vectors"]),
+                },
+            }
+            for section_id, entry in sections.items()
+        ]
+        records.extend(
+            {
+                "id": f"document_{self.source_id_prefix(source)}",
+                "values": unit_mean(group),
+                "metadata": {"level": "document", "source": source, "document_id": self.source_id_prefix(source)},
+            }
+            for source, group in documents_by_source.items()
+        )
+        return records
     
-    def ingest_documents(self, documents: List[Document]) -> dict:
+    def _register(
+        self,
+        documents: List[Document],
+        ids: List[str],
+        centroids: List[dict],
+        ttl_seconds: Optional[float]
+    ) -> Tuple[List[str], List[str]]:
+        """
+        Record each source's vector and centroid IDs and drop chunks of its
+        previous version from the chunk store.
+        
+        Returns:
+            (chunk IDs, centroid IDs) of previous versions that the new
+            version didn't overwrite
+        """
+        by_source: Dict[str, tuple] = {}
+        for doc, vector_id in zip(documents, ids):
+            source_ids, keys = by_source.setdefault(str(doc.metadata.get("source", "unknown")), ([], set()))
+            source_ids.append(vector_id)
+            keys.add(doc.metadata["chunk_key"])
+        centroid_ids: Dict[str, List[str]] = {}
+        for record in centroids:
+            centroid_ids.setdefault(record["metadata"]["source"], []).append(record["id"])
+        
+        ttl_seconds = Config.DOCUMENT_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        stale, stale_centroids = [], []
+        for source, (source_ids, keys) in by_source.items():
+            previous = self.registry.put(source, source_ids, ttl_seconds, centroid_ids.get(source))
+            if previous:
+                stale.extend(set(previous["ids"]) - set(source_ids))
+                stale_centroids.extend(set(previous.get("centroid_ids", [])) - set(centroid_ids.get(source, [])))
+            if self.chunk_store.source_counts().get(source, 0) > len(keys):
+                self.chunk_store.remove_source(source, keep_keys=keys)
+        return stale, stale_centroids
+    
+    def _legacy_sources(self, documents: List[Document]) -> List[str]:
+        """
+        Sources being ingested that are in the chunk store but not the registry.
+        
+        They were ingested before the registry existed (under chunk_N IDs), so
+        their previous version can only be found by metadata filter.
+        """
+        stored = self.chunk_store.source_counts()
+        sources = dict.fromkeys(str(doc.metadata.get("source", "unknown")) for doc in documents)
+        return [source for source in sources if source in stored and self.registry.get(source) is None]
+    
+    @staticmethod
+    def _tag_chunk_keys(documents: List[Document]):
+        """Add "chunk_key" to metadata (as chunk_store.add_documents() does) without storing the chunks."""
+        for doc in documents:
+            doc.metadata["chunk_key"] = chunk_key(str(doc.metadata.get("source", "unknown")), doc.page_content)
+    
+    @staticmethod
+    def _legacy_probes(
+        legacy: List[str],
+        documents: List[Document],
+        vectors: List[List[float]]
+    ) -> Dict[str, List[float]]:
+        """A new chunk vector per legacy source, to query the source's vectors with."""
+        probes = {}
+        for doc, vector in zip(documents, vectors):
+            source = str(doc.metadata.get("source", "unknown"))
+            if source in legacy:
+                probes.setdefault(source, vector)
+        return probes
+    
+    def _delete_legacy(self, legacy: List[str], documents: List[Document], vectors: List[List[float]], ids: List[str]):
+        """
+        Delete an unregistered previous version after the new one is upserted.
+        
+        Its IDs are unknown, so they're listed by querying with a source
+        filter; every match that isn't a new chunk ID is deleted.
+        """
+        keep = set(ids)
+        for source, probe in self._legacy_probes(legacy, documents, vectors).items():
+            while True:
+                response = self.index.query(
+                    vector=probe, top_k=_QUERY_TOP_K_LIMIT, namespace=Config.PINECONE_NAMESPACE,
+                    filter={"source": {"$eq": source}}, include_metadata=False
+                )
+                stale = [match.id for match in response.matches if match.id not in keep]
+                for start in range(0, len(stale), Config.PINECONE_DELETE_BATCH_SIZE):
+                    self.index.delete(
+                        ids=stale[start:start + Config.PINECONE_DELETE_BATCH_SIZE], namespace=Config.PINECONE_NAMESPACE
+                    )
+                if not stale or len(response.matches) < _QUERY_TOP_K_LIMIT:
+                    break
+    
+    async def _adelete_legacy(
+        self,
+        legacy: List[str],
+        documents: List[Document],
+        vectors: List[List[float]],
+        ids: List[str]
+    ):
+        """Async version of _delete_legacy()."""
+        keep = set(ids)
+        
+        async def delete_source(source: str, probe: List[float]):
+            while True:
+                matches = await self.async_index.query(
+                    probe, _QUERY_TOP_K_LIMIT, metadata_filter={"source": {"$eq": source}}, include_metadata=False
+                )
+                stale = [match["id"] for match in matches if match["id"] not in keep]
+                if stale:
+                    await self.async_index.delete(stale)
+                if not stale or len(matches) < _QUERY_TOP_K_LIMIT:
+                    break
+        
+        await asyncio.gather(*(
+            delete_source(source, probe)
+            for source, probe in self._legacy_probes(legacy, documents, vectors).items()
+        ))
+    
+    @staticmethod
+    def _records(ids: List[str], vectors: List[List[float]], documents: List[Document]) -> List[dict]:
+        """Pinecone upsert records (text stored under the "text" metadata key)."""
+        return [
+            {
+                "id": vector_id,
+                "values": values,
+                "metadata": {**doc.metadata, "text": doc.page_content}
+            }
+            for vector_id, values, doc in zip(ids, vectors, documents)
+        ]
+    
+    def ingest_documents(
+        self,
+        documents: List[Document],
+        id_prefix: Optional[str] = None,
+        ttl_seconds: Optional[float] = None
+    ) -> dict:
         """
         Ingest documents into Pinecone.
         
+        Re-ingesting a registered source replaces it: chunks of the previous
+        version that weren't overwritten are deleted. A source ingested before
+        the registry existed has its old chunks found by a source-filtered
+        query and deleted. Section and document centroids are upserted to the
+        sections namespace alongside.
+        
+        The new version is upserted before anything is deleted or recorded
+        locally, so a failed ingest leaves the previous version, the chunk
+        store and the registry as they were.
+        
         Args:
             documents: List of Document objects
+            id_prefix: Optional per-source ID prefix (bulk loads use one per file
+                so documents don't overwrite each other's chunks)
+            ttl_seconds: Expire the documents this long after ingest
+                (defaults to DOCUMENT_TTL_SECONDS; 0 = never)
             
         Returns:
             Dictionary with ingestion statistics
         """
         try:
             # Generate unique IDs
-            ids = [f"chunk_{i}" for i in range(len(documents))]
+            ids = self._chunk_ids(documents, id_prefix)
+            legacy = self._legacy_sources(documents)
+            self._tag_chunk_keys(documents)
             
-            # Upsert to vector store
-            self.vector_store.add_documents(
-                documents=documents,
-                ids=ids
-            )
+            # Embed once; the vectors also feed the section/document centroids
+            vectors = self.embeddings.embed_documents([doc.page_content for doc in documents])
+            centroids = self._centroids(documents, vectors)
+            
+            # Upsert to vector store in batches
+            batch_size = Config.PINECONE_UPSERT_BATCH_SIZE
+            records = self._records(ids, vectors, documents)
+            for start in range(0, len(records), batch_size):
+                self.index.upsert(vectors=records[start:start + batch_size], namespace=Config.PINECONE_NAMESPACE)
+            for start in range(0, len(centroids), batch_size):
+                self.index.upsert(vectors=centroids[start:start + batch_size], namespace=Config.PINECONE_SECTIONS_NAMESPACE)
+            
+            # Only now that the new version is stored: drop the old one and record the new chunks
+            self._delete_legacy(legacy, documents, vectors, ids)
+            self.chunk_store.add_documents(documents)
+            stale, stale_centroids = self._register(documents, ids, centroids, ttl_seconds)
+            batch_size = Config.PINECONE_DELETE_BATCH_SIZE
+            for namespace, stale_ids in (
+                (Config.PINECONE_NAMESPACE, stale), (Config.PINECONE_SECTIONS_NAMESPACE, stale_centroids)
+            ):
+                for start in range(0, len(stale_ids), batch_size):
+                    self.index.delete(ids=stale_ids[start:start + batch_size], namespace=namespace)
             
             return {
                 "status": "success",
                 "chunks_processed": len(documents),
+                "sections_indexed": len(centroids) - len({doc.metadata.get("source") for doc in documents}),
+                "stale_chunks_deleted": len(stale),
                 "namespace": Config.PINECONE_NAMESPACE
             }
         except Exception as e:
@@ -92,6 +443,110 @@ class VectorStoreManager:
                 "error": str(e)
             }
     
+    async def aingest_documents(
+        self,
+        documents: List[Document],
+        id_prefix: Optional[str] = None,
+        ttl_seconds: Optional[float] = None
+    ) -> dict:
+        """
+        Ingest documents through the async client with parallel batched upserts.
+        
+        Embedding runs in a worker thread so the event loop stays responsive.
+        Uses the same IDs, metadata layout and replacement behaviour as
+        ingest_documents().
+        
+        Args:
+            documents: List of Document objects
+            id_prefix: Optional per-source ID prefix
+            ttl_seconds: Expire the documents this long after ingest
+            
+        Returns:
+            Dictionary with ingestion statistics
+        """
+        try:
+            ids = self._chunk_ids(documents, id_prefix)
+            legacy = self._legacy_sources(documents)
+            self._tag_chunk_keys(documents)
+            texts = [doc.page_content for doc in documents]
+            vectors = await asyncio.to_thread(self.embeddings.embed_documents, texts)
+            centroids = self._centroids(documents, vectors)
+            
+            upserted, _ = await asyncio.gather(
+                self.async_index.upsert(self._records(ids, vectors, documents)),
+                self.async_index.upsert(centroids, namespace=Config.PINECONE_SECTIONS_NAMESPACE)
+            )
+            
+            await self._adelete_legacy(legacy, documents, vectors, ids)
+            await asyncio.to_thread(self.chunk_store.add_documents, documents)
+            stale, stale_centroids = self._register(documents, ids, centroids, ttl_seconds)
+            if stale:
+                await self.async_index.delete(stale)
+            if stale_centroids:
+                await self.async_index.delete(stale_centroids, namespace=Config.PINECONE_SECTIONS_NAMESPACE)
+            
+            return {
+                "status": "success",
+                "chunks_processed": upserted,
+                "sections_indexed": len(centroids) - len({doc.metadata.get("source") for doc in documents}),
+                "stale_chunks_deleted": len(stale),
+                "namespace": Config.PINECONE_NAMESPACE
+            }
+        except Exception as e:
+            return {
+                "status": "error",
+                "error": str(e)
+            }
+    
+    def list_sources(self) -> Dict[str, dict]:
+        """
+        Get every known source with its chunk count and expiry.
+        
+        Sources ingested before the registry existed are included with
+        "registered": False (they can still be deleted, by metadata filter).
+        """
+        sources = {
+            source: {**entry, "registered": True}
+            for source, entry in self.registry.list().items()
+        }
+        for source, chunks in self.chunk_store.source_counts().items():
+            if source not in sources:
+                sources[source] = {"chunks": chunks, "ingested_at": None, "expires_at": None, "registered": False}
+        return sources
+    
+    async def adelete_source(self, source: str) -> Optional[dict]:
+        """
+        Delete every chunk of a source from Pinecone and the chunk store.
+        
+        Returns:
+            Deletion summary, or None if the source is unknown
+        """
+        entry = self.registry.get(source)
+        if entry is not None:
+            vectors_deleted = await self.async_index.delete(entry["ids"])
+            if entry.get("centroid_ids"):
+                await self.async_index.delete(entry["centroid_ids"], namespace=Config.PINECONE_SECTIONS_NAMESPACE)
+        elif source in self.chunk_store.source_counts():
+            # Ingested before the registry existed; IDs unknown
+            await self.async_index.delete_by_filter({"source": {"$eq": source}})
+            vectors_deleted = None
+        else:
+            return None
+        
+        chunks_removed = await asyncio.to_thread(self.chunk_store.remove_source, source)
+        self.registry.remove(source)
+        return {"source": source, "vectors_deleted": vectors_deleted, "chunks_removed": chunks_removed}
+    
+    @staticmethod
+    def _match_to_document(match: dict) -> tuple:
+        """Convert a raw Pinecone match into (Document, relevance score)."""
+        metadata = dict(match.get("metadata") or {})
+        text = metadata.pop("text", "")
+        # Same cosine relevance normalization as langchain_pinecone ((score + 1) / 2)
+        score = (match.get("score", 0.0) + 1) / 2
+        metadata["score"] = score
+        return Document(page_content=text, metadata=metadata), score
+    
     def get_retriever(self, k: int = None, score_threshold: float = None):
         """
         Get retriever for RAG.
@@ -121,14 +576,289 @@ class VectorStoreManager:
             }
         )
     
+    def retrieve(
+        self,
+        query: str,
+        k: int = None,
+        score_threshold: float = None,
+        rerank_top_n: int = None,
+        min_k: int = None
+    ) -> List[Document]:
+        """
+        Retrieve chunks for a query.
+
+        Falls back to the unfiltered results if the threshold removes every
+        chunk. When reranking is enabled, a wider candidate pool is fetched
+        and rescored with the cross-encoder before keeping the best few.
+        Otherwise, when min_k is given and ADAPTIVE_K_ENABLED is set, the
+        number of documents kept is chosen from the score curve between
+        min_k and k.
+
+        Args:
+            query: Search query
+            k: Number of documents the caller would send to the LLM (upper bound
+                when min_k is given)
+            score_threshold: Minimum relevance score (None means no threshold filtering)
+            rerank_top_n: Documents to keep after reranking (defaults to min(k, RERANK_TOP_N))
+            min_k: Lower bound for adaptive depth (None keeps exactly k)
+
+        Returns:
+            List of Document objects, most relevant first (identical concurrent
+            retrievals share one search, as do calls for the same text
+            within a search_scope())
+        """
+        k = k or Config.RETRIEVAL_K
+        key = (query, k, score_threshold, rerank_top_n, min_k)
+        return list(retrieval_calls.do(
+            key, lambda: self._retrieve(query, k, score_threshold, rerank_top_n, min_k)
+        ))
+
+    @staticmethod
+    def _fetch_k(k: int) -> int:
+        """Number of search results needed to keep k documents."""
+        return max(k, Config.RERANK_CANDIDATES) if Config.RERANK_ENABLED else k
+    
+    def _search(self, query: str, fetch_k: int) -> List[tuple]:
+        """
+        Embed the query and run a scored similarity search.
+        
+        Large corpora (HIERARCHICAL_MIN_CHUNKS and up) are searched coarse to
+        fine: the closest section centroids first, then only the chunks in
+        those sections. Falls back to a flat search if no centroids match, and
+        stays flat while any stored source lacks centroids. With LOCAL_INDEX_CODEC set, the local compressed index is searched instead
+        once it covers the whole chunk store.
+        """
+        with stage("retrieval"):
+            if self.local_index is not None:
+                try:
+                    scored = self._search_local(query, fetch_k)
+                    if scored is not None:
+                        return scored
+                except Exception as e:
+                    print(f"[Retrieval] Warning: local index search failed, searching Pinecone: {e}")
+            if (
+                Config.HIERARCHICAL_RETRIEVAL_ENABLED
+                and len(self.chunk_store) >= Config.HIERARCHICAL_MIN_CHUNKS
+                and self._sections_cover_corpus()
+            ):
+                try:
+                    scored = self._search_sections(query, fetch_k)
+                    if scored:
+                        return scored
+                except Exception as e:
+                    print(f"[Retrieval] Warning: section search failed, searching all chunks: {e}")
+            return self.vector_store.similarity_search_with_relevance_scores(query, k=fetch_k)
+    
+    def _search_local(self, query: str, fetch_k: int) -> Optional[List[tuple]]:
+        """
+        Search the local compressed index; rows become Documents like Pinecone matches.
+        
+        Rows are resolved in the chunk-store table they were searched in, and
+        only if that is still the current generation (a rewrite in between
+        means the results may include deleted documents).
+        
+        Returns:
+            Scored documents, or None if the index is still being built or
+            the chunk store was rewritten since
+        """
+        found = self.local_index.search(self.embeddings.embed_query(query), fetch_k)
+        if found is None:
+            return None
+        table, hits = found
+        if table.generation != self.chunk_store.snapshot()[0]:
+            metrics.increment("local_index.stale_generation")
+            return None
+        scored = []
+        for row, similarity in hits:
+            text, source, section = table.text(row), table.source(row), table.section(row)
+            scored.append(self._match_to_document({
+                "score": similarity,
+                "metadata": {
+                    "text": text,
+                    "source": source,
+                    "section": section,
+                    "section_id": section_key(source, section),
+                    "chunk_key": chunk_key(source, text),
+                },
+            }))
+        return scored
+    
+    def _sections_cover_corpus(self) -> bool:
+        """
+        Whether every stored source has section/document centroids.
+        
+        Chunks ingested before centroids existed have no section_id, so a
+        two-stage search would never return them; until those sources are
+        re-uploaded, searches stay flat.
+        """
+        missing = self.registry.sources_without_centroids(self.chunk_store.source_counts())
+        if missing:
+            metrics.increment("section_searches_skipped_legacy")
+        return not missing
+    
+    def _query_matches(self, vector: List[float], top_k: int, namespace: str, metadata_filter: dict) -> list:
+        """
+        Query Pinecone from a worker thread.
+        
+        Goes through the async client's pooled connections on the app's
+        event loop when it's running, otherwise (CLI, or called on the loop
+        itself) through the sync client.
+        """
+        loop = self._loop
+        if loop is not None and loop.is_running() and not _on_event_loop():
+            return asyncio.run_coroutine_threadsafe(
+                self.async_index.query(vector, top_k, namespace, metadata_filter), loop
+            ).result()
+        response = self.index.query(
+            vector=vector, top_k=top_k, namespace=namespace, filter=metadata_filter, include_metadata=True
+        )
+        return [{"id": match.id, "score": match.score, "metadata": match.metadata} for match in response.matches]
+    
+    def _search_sections(self, query: str, fetch_k: int) -> List[tuple]:
+        """Two-stage search: top sections (within the top documents for large libraries), then their chunks."""
+        vector = self.embeddings.embed_query(query)
+        
+        section_filter = {"level": {"$eq": "section"}}
+        if len(self.registry) >= Config.HIERARCHICAL_DOCUMENT_STAGE_MIN:
+            top_documents = self._query_matches(
+                vector, Config.HIERARCHICAL_TOP_DOCUMENTS, Config.PINECONE_SECTIONS_NAMESPACE,
+                {"level": {"$eq": "document"}}
+            )
+            if top_documents:
+                section_filter["document_id"] = {"$in": [m["metadata"]["document_id"] for m in top_documents]}
+        
+        top_sections = self._query_matches(
+            vector, Config.HIERARCHICAL_TOP_SECTIONS, Config.PINECONE_SECTIONS_NAMESPACE, section_filter
+        )
+        if not top_sections:
+            return []
+        
+        chunks = self._query_matches(
+            vector, fetch_k, Config.PINECONE_NAMESPACE,
+            {"section_id": {"$in": [m["metadata"]["section_id"] for m in top_sections]}}
+        )
+        metrics.increment("section_searches")
+        return [self._match_to_document(match) for match in chunks]
+    
+    @contextmanager
+    def search_scope(self, query: Optional[str] = None):
+        """
+        Share searches between the retrieve() calls made in this context.
+        
+        Args:
+            query: User query to start searching for right away, so the
+                search overlaps agent routing (when SPECULATIVE_RETRIEVAL_ENABLED)
+        """
+        searches = RequestSearches(self._fetch_k(max(
+            Config.QA_MAX_K, Config.INSIGHTS_MAX_K, Config.EXTRACT_MAX_K,
+            Config.DIGEST_RETRIEVAL_K, Config.RETRIEVAL_K
+        )))
+        if query and Config.SPECULATIVE_RETRIEVAL_ENABLED:
+            searches.prefetch(query, self._prefetch_executor, self._search)
+        token = _request_searches.set(searches)
+        try:
+            yield searches
+        finally:
+            _request_searches.reset(token)
+            if searches.prefetched is not None:
+                metrics.increment(
+                    "speculative_retrieval.used" if searches.prefetch_used else "speculative_retrieval.wasted"
+                )
+    
+    def _retrieve(
+        self,
+        query: str,
+        k: int,
+        score_threshold: Optional[float],
+        rerank_top_n: Optional[int],
+        min_k: Optional[int]
+    ) -> List[Document]:
+        fetch_k = self._fetch_k(k)
+
+        searches = _request_searches.get()
+        if searches is not None:
+            scored = searches.search(query, fetch_k, self._search)
+        else:
+            scored = self._search(query, fetch_k)
+        for doc, score in scored:
+            doc.metadata["score"] = score
+
+        documents = [
+            doc for doc, score in scored
+            if score_threshold is None or score >= score_threshold
+        ]
+
+        # Fallback: if threshold filtering removed all docs, use unfiltered results
+        if not documents:
+            documents = [doc for doc, _ in scored]
+
+        if Config.RERANK_ENABLED and documents:
+            top_n = rerank_top_n or min(k, Config.RERANK_TOP_N)
+            return get_reranker().rerank(query, documents, top_n=top_n, baseline_k=k)
+
+        if Config.ADAPTIVE_K_ENABLED and min_k is not None and len(documents) > min_k:
+            scores = [doc.metadata["score"] for doc in documents]
+            chosen_k, reason = choose_k(scores, min_k=min_k, max_k=k)
+            metrics.increment(f"adaptive_k.stopped_by.{reason}")
+            if Config.VERBOSE_LOGGING:
+                print(f"[Retrieval] k={chosen_k} (bounds {min_k}-{k}, stopped by {reason})")
+            return documents[:chosen_k]
+
+        return documents[:k]
+
     def get_stats(self) -> dict:
-        """Get index statistics."""
+        """Get index statistics (uncached, synchronous)."""
         try:
             stats = self.index.describe_index_stats()
             return {
                 "total_vectors": stats.total_vector_count,
                 "dimension": stats.dimension,
-                "namespaces": dict(stats.namespaces)
+                "namespaces": {
+                    name: {"vector_count": summary.vector_count}
+                    for name, summary in stats.namespaces.items()
+                }
             }
         except Exception as e:
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
+    
+    async def aget_stats(self) -> dict:
+        """
+        Get index statistics from the in-memory cache.
+        
+        Only calls Pinecone when the snapshot is missing or older than
+        INDEX_STATS_REFRESH_SECONDS (normally the background refresher keeps it fresh).
+        """
+        if self.stats_cache.is_stale:
+            await self.stats_cache.refresh()
+        snapshot = self.stats_cache.snapshot()
+        if snapshot["stats"] is None:
+            return {"error": snapshot["last_error"]}
+        return {**snapshot["stats"], "age_seconds": snapshot["age_seconds"]}
+    
+    def start(self):
+        """Start background stats refresh, and route worker-thread section searches through the running loop."""
+        self._loop = asyncio.get_running_loop()
+        self.stats_cache.start()
+    
+    async def aclose(self):
+        """Stop background stats refresh and close the pooled HTTP session."""
+        self._loop = None
+        await self.stats_cache.stop()
+        await self.async_index.close()
+        self._prefetch_executor.shutdown(wait=False)
+
+
+_vector_store_manager: Optional[VectorStoreManager] = None
+
+
+def get_vector_store_manager() -> VectorStoreManager:
+    """
+    Get the shared vector store manager (singleton pattern).
+    
+    The API and all tools share one embedding model, Pinecone client and
+    connection pool instead of constructing their own.
+    """
+    global _vector_store_manager
+    if _vector_store_manager is None:
+        _vector_store_manager = VectorStoreManager()
+    return _vector_store_manager
\ No newline at end of file
@@ -1,10 +1,12 @@
 """
 Structured Data Extraction Tool.
 """
+from typing import Tuple
 from langchain_core.tools import tool
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 import json
+import time
 
 import sys
 from pathlib import Path
@@ -12,13 +14,17 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import Config
 from schemas.models import MarketResearchData
-from services.vector_store import VectorStoreManager
+from services.vector_store import get_vector_store_manager
+from services.retrieval_depth import report_prompt
+from services.single_flight import invoke_llm
+from services.rule_extractor import REQUIRED_FIELDS, LLM_FIELD_CONFIDENCE, extract_from_store
+from services.metrics import metrics
+from services.request_trace import stage
 
 
 # Initialize components
-vector_store_manager = VectorStoreManager()
-# Get retriever with more documents for comprehensive extraction
-retriever = vector_store_manager.get_retriever(k=15, score_threshold=0.3)
+vector_store_manager = get_vector_store_manager()
+chunk_store = vector_store_manager.chunk_store
 
 llm = ChatGoogleGenerativeAI(
     model=Config.GEMINI_MODEL,
@@ -26,9 +32,56 @@ llm = ChatGoogleGenerativeAI(
     temperature=0,  # Deterministic for data extraction
 )
 
+# JSON shape of each field, for the targeted gap-filling prompt
+FIELD_SPECS = {
+    "company_name": '"company_name": string (exact company name)',
+    "product_name": '"product_name": string (exact flagship product name)',
+    "report_period": '"report_period": string (e.g. "Q3 2025")',
+    "current_market_size_billions": '"current_market_size_billions": float (e.g. 15.0 for "$15 billion")',
+    "projected_market_size_2030_billions": '"projected_market_size_2030_billions": float (e.g. 40.0 for "$40 billion by 2030")',
+    "cagr_percent": '"cagr_percent": float (e.g. 22.0 for "CAGR of 22%")',
+    "company_market_share_percent": '"company_market_share_percent": float (e.g. 12.0 for "holds a 12% market share")',
+    "competitors": '"competitors": [{"company_name": string, "market_share": float}] (ALL competitors)',
+    "swot": '"swot": {"strengths": [string], "weaknesses": [string], "opportunities": [string], "threats": [string]} (ALL items)',
+}
 
-@tool
-def extract_tool(request: str) -> str:
+# Section title keywords that hold each field (used to trim the gap prompt's context)
+FIELD_SECTION_HINTS = {
+    "current_market_size_billions": ("market", "overview"),
+    "projected_market_size_2030_billions": ("market", "overview", "outlook"),
+    "cagr_percent": ("market", "overview", "growth"),
+    "company_market_share_percent": ("compet", "landscape", "market"),
+    "competitors": ("compet", "landscape"),
+    "swot": ("swot",),
+}
+
+gap_prompt = ChatPromptTemplate.from_messages([
+    ("system", """You are a data extraction specialist. Extract ONLY the fields listed in the request from the market research report excerpts.
+
+Use the ACTUAL values stated in the text. Return ONLY a valid JSON object with exactly the listed keys - no markdown, no explanation."""),
+    ("human", "Fields:\n{fields}\n\nReport excerpts:\n{document}\n\nReturn the JSON object:")
+])
+
+
+def _json_result(data: dict) -> Tuple[str, dict]:
+    """Tool result: compact JSON content plus the dict itself as the artifact."""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False), data
+
+
+def _gap_documents(documents: list, gaps: list) -> list:
+    """Keep retrieved chunks from sections likely to hold the missing fields."""
+    if any(field not in FIELD_SECTION_HINTS for field in gaps):
+        return documents
+    hints = {hint for field in gaps for hint in FIELD_SECTION_HINTS[field]}
+    selected = [
+        doc for doc in documents
+        if any(hint in str(doc.metadata.get("section", "")).lower() for hint in hints)
+    ]
+    return selected or documents
+
+
+@tool(response_format="content_and_artifact")
+def extract_tool(request: str) -> Tuple[str, dict]:
     """
     Extract structured data from uploaded documents in JSON format.
     
@@ -48,7 +101,8 @@ def extract_tool(request: str) -> str:
         request: Description of the extraction request
         
     Returns:
-        JSON string with complete structured market research data
+        Compact JSON string with complete structured market research data
+        (the dict is also returned as the artifact, so the API never re-parses it)
     """
     
     # Define the extraction prompt
@@ -104,68 +158,106 @@ DO NOT:
 - Use "Unknown" for text fields unless the data is truly missing
 - Skip any competitors mentioned in the document
 - Miss any SWOT items listed"""),
-        ("human", "Market Research Report:\n{document}\n\nExtract ALL data into the exact JSON structure above. Read the document carefully and extract the ACTUAL values mentioned. Return only valid JSON (no markdown, no code blocks):")
+        # Report and instruction are separate messages so the report can be part of the cached prefix
+        ("human", "Market Research Report:\n{document}"),
+        ("human", "Extract ALL data into the exact JSON structure above. Read the document carefully and extract the ACTUAL values mentioned. Return only valid JSON (no markdown, no code blocks):")
     ])
     
     try:
         # Retrieve relevant documents from vector store (uploaded files)
-        # LangChain 1.0 uses .invoke() instead of .get_relevant_documents()
+        # More documents for comprehensive extraction; keep a larger reranked set
+        # since every schema field must be covered (adaptive depth keeps a high floor)
         try:
-            source_docs = retriever.invoke(request)
-            
-            # Fallback: if threshold filtering removed all docs, try without threshold
-            if not source_docs:
-                fallback_retriever = vector_store_manager.get_retriever(k=15, score_threshold=None)
-                source_docs = fallback_retriever.invoke(request)
+            source_docs = vector_store_manager.retrieve(
+                request,
+                k=Config.EXTRACT_MAX_K,
+                score_threshold=0.3,
+                rerank_top_n=max(Config.RERANK_TOP_N, 10),
+                min_k=Config.EXTRACT_MIN_K
+            )
         except Exception as retriever_error:
-            return json.dumps({
+            return _json_result({
                 "error": "Error retrieving documents",
                 "details": str(retriever_error),
                 "message": "Please check if documents are uploaded and the vector store is configured correctly."
-            }, indent=2)
+            })
         
         # Combine retrieved documents
         if not source_docs:
-            return json.dumps({
+            return _json_result({
                 "error": "No documents found",
                 "message": "Please upload a .txt file first via the upload endpoint."
-            }, indent=2)
+            })
+        
+        # Rule pass: read the regularly-phrased fields straight from the stored
+        # chunks of the best-matching report; only the gaps go to the LLM
+        rule_data, confidence = {}, {field: 0.0 for field in REQUIRED_FIELDS}
+        if Config.EXTRACT_RULES_ENABLED:
+            start_time = time.perf_counter()
+            source = source_docs[0].metadata.get("source")
+            if source:
+                with stage("extract.rules"):
+                    rule_data, confidence = extract_from_store(chunk_store, str(source))
+            metrics.observe("extract_tool.rules_ms", round((time.perf_counter() - start_time) * 1000, 2))
+        gaps = [field for field in REQUIRED_FIELDS if confidence[field] < Config.EXTRACT_MIN_CONFIDENCE]
+        
+        if not gaps:
+            metrics.increment("extractions_rules_only")
+            if Config.VERBOSE_LOGGING:
+                print("[extract_tool] All fields extracted by rules (no LLM call)")
+            return _json_result(MarketResearchData(**rule_data, field_confidence=confidence).model_dump())
         
-        # Clean PDF extraction artifacts (extra spaces)
-        import re
-        document_context = "\n\n".join([
-            f"Section: {doc.metadata.get('section', 'Unknown')}\n{re.sub(r' +', ' ', doc.page_content)}"
-            for doc in source_docs
-        ])
+        # Full extraction prompt when rules found nothing, a targeted one for the gaps otherwise
+        targeted = len(gaps) < len(REQUIRED_FIELDS)
+        if targeted:
+            source_docs = _gap_documents(source_docs, gaps)
+        
+        # Build context from pre-normalized chunk text (no per-request cleanup)
+        document_context, _ = chunk_store.build_context(source_docs)
         
         # If no documents found, return helpful message
         if not document_context.strip():
-            return json.dumps({
+            return _json_result({
                 "error": "Documents retrieved but no content found",
                 "message": "Please check the uploaded document format."
-            }, indent=2)
+            })
         
-        # Create chain
+        # Format prompt, log its size, and execute extraction with retrieved context
         try:
-            chain = extraction_prompt | llm
-            
-            # Execute extraction with retrieved context
-            response = chain.invoke({"document": document_context})
+            # The static system prompt (plus the report, with PROMPT_CACHE_DOCUMENTS)
+            # is sent as a cached prefix where the provider supports it
+            if targeted:
+                metrics.increment("extractions_llm_gaps")
+                for field in gaps:
+                    metrics.increment(f"extract_tool.gap.{field}")
+                if Config.VERBOSE_LOGGING:
+                    print(f"[extract_tool] LLM filling {len(gaps)} field(s): {', '.join(gaps)}")
+                prompt_value = gap_prompt.invoke({
+                    "fields": "\n".join(FIELD_SPECS[field] for field in gaps),
+                    "document": document_context
+                })
+                cache_prefix, prefix_messages = "extract_tool.gaps", 1
+            else:
+                metrics.increment("extractions_llm_full")
+                prompt_value = extraction_prompt.invoke({"document": document_context})
+                cache_prefix, prefix_messages = "extract_tool.full", 2 if Config.PROMPT_CACHE_DOCUMENTS else 1
+            report_prompt("extract_tool", source_docs, prompt_value.to_string())
+            response = invoke_llm(llm, prompt_value, cache_prefix=cache_prefix, prefix_messages=prefix_messages)
         except Exception as llm_error:
-            return json.dumps({
+            return _json_result({
                 "error": "Error calling language model",
                 "details": str(llm_error),
                 "message": "Please check API key and model configuration."
-            }, indent=2)
+            })
         
         # Extract JSON from response (handle markdown code blocks)
         content = response.content.strip() if hasattr(response, 'content') else str(response).strip()
         
         if not content:
-            return json.dumps({
+            return _json_result({
                 "error": "Empty response from language model",
                 "message": "Please try again."
-            }, indent=2)
+            })
         
         # Remove markdown code blocks if present
         if content.startswith("```json"):
@@ -180,51 +272,55 @@ DO NOT:
         
         # Validate JSON
         try:
-            parsed_data = json.loads(content)
+            with stage("extract.parse"):
+                llm_data = json.loads(content)
+            
+            # Merge LLM-filled gaps over the rule-based fields
+            parsed_data = dict(rule_data)
+            for field in gaps:
+                if field in llm_data:
+                    parsed_data[field] = llm_data[field]
+                    confidence[field] = LLM_FIELD_CONFIDENCE
             
             # Check for missing required fields before validation
-            required_fields = [
-                "company_name", "product_name", "report_period",
-                "current_market_size_billions", "projected_market_size_2030_billions",
-                "cagr_percent", "company_market_share_percent", "competitors", "swot"
-            ]
-            missing_fields = [field for field in required_fields if field not in parsed_data]
+            missing_fields = [field for field in REQUIRED_FIELDS if field not in parsed_data]
             
             if missing_fields:
-                return json.dumps({
+                return _json_result({
                     "error": "Missing required fields in extracted data",
                     "missing_fields": missing_fields,
                     "extracted_fields": list(parsed_data.keys()),
                     "partial_data": parsed_data,
                     "raw_response": content[:1000]
-                }, indent=2)
+                })
             
             # Validate against Pydantic model
-            validated_data = MarketResearchData(**parsed_data)
+            with stage("extract.validation"):
+                validated_data = MarketResearchData(**parsed_data, field_confidence=confidence)
             
-            # Return formatted JSON
-            return validated_data.model_dump_json(indent=2)
+            # Return compact JSON for the agent, the dict for the API
+            return _json_result(validated_data.model_dump())
         except json.JSONDecodeError as e:
-            return json.dumps({
+            return _json_result({
                 "error": "Failed to parse JSON",
                 "details": str(e),
                 "raw_response": content[:1000]
-            }, indent=2)
+            })
         except Exception as validation_error:
             # Provide more detailed validation error
             error_msg = str(validation_error)
-            return json.dumps({
+            return _json_result({
                 "error": "Failed to validate extracted data",
                 "details": error_msg,
                 "parsed_data": parsed_data if 'parsed_data' in locals() else None,
                 "raw_response": content[:1000]
-            }, indent=2)
+            })
         
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
-        return json.dumps({
+        return _json_result({
             "error": "Extraction failed",
             "details": str(e),
             "traceback": error_details[:500]
-        }, indent=2)
\ No newline at end of file
+        })
\ No newline at end of file
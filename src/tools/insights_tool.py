@@ -1,6 +1,7 @@
 """
 Strategic Insights and Summary Generation Tool.
 """
+from typing import Optional, Tuple
 from langchain_core.tools import tool
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_google_genai import ChatGoogleGenerativeAI
@@ -10,13 +11,16 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import Config
-from services.vector_store import VectorStoreManager
+from services.vector_store import get_vector_store_manager
+from services.digests import get_digest_store, is_broad_request
+from services.retrieval_depth import report_prompt
+from services.single_flight import invoke_llm
 
 
 # Initialize components
-vector_store_manager = VectorStoreManager()
-# Get retriever with more documents for comprehensive analysis
-retriever = vector_store_manager.get_retriever(k=10, score_threshold=0.3)
+vector_store_manager = get_vector_store_manager()
+chunk_store = vector_store_manager.chunk_store
+digest_store = get_digest_store()
 
 llm = ChatGoogleGenerativeAI(
     model=Config.GEMINI_MODEL,
@@ -26,8 +30,8 @@ llm = ChatGoogleGenerativeAI(
 )
 
 
-@tool
-def insights_tool(request: str) -> str:
+@tool(response_format="content_and_artifact")
+def insights_tool(request: str) -> Tuple[str, Optional[dict]]:
     """
     Generate strategic insights, summaries, and market analysis from uploaded documents.
     
@@ -52,7 +56,8 @@ def insights_tool(request: str) -> str:
         request: The analysis or summary request
         
     Returns:
-        Comprehensive strategic insights and analysis
+        Comprehensive strategic insights and analysis (also returned as a
+        structured artifact)
     """
     
     # Define analysis categories and prompts
@@ -71,67 +76,77 @@ Guidelines:
 8. Use professional business language
 
 Always ground your analysis in the provided report data."""),
+        # Report and request are separate messages so the report can be part of the cached prefix
         ("human", """Market Research Report:
-{document}
-
-Analysis Request: {request}
+{document}"""),
+        ("human", """Analysis Request: {request}
 
 Please provide comprehensive strategic insights addressing this request:""")
     ])
     
     try:
-        # Retrieve relevant documents from vector store (uploaded files)
-        # LangChain 1.0 uses .invoke() instead of .get_relevant_documents()
+        # Broad requests: answer from the precomputed digests of the documents the
+        # request matches, plus a small targeted retrieval. Retrieval depth adapts
+        # to the score curve otherwise (more documents for comprehensive analysis).
+        digest_context = ""
         try:
-            source_docs = retriever.invoke(request)
-            
-            # Fallback: if threshold filtering removed all docs, try without threshold
-            if not source_docs:
-                fallback_retriever = vector_store_manager.get_retriever(k=10, score_threshold=None)
-                source_docs = fallback_retriever.invoke(request)
+            if is_broad_request(request):
+                source_docs = vector_store_manager.retrieve(
+                    request, k=Config.DIGEST_RETRIEVAL_K, score_threshold=0.3
+                )
+                digest_context = digest_store.build_context(
+                    [str(doc.metadata.get("source")) for doc in source_docs if doc.metadata.get("source")]
+                )
+            if not digest_context:
+                source_docs = vector_store_manager.retrieve(
+                    request, k=Config.INSIGHTS_MAX_K, score_threshold=0.3, min_k=Config.INSIGHTS_MIN_K
+                )
         except Exception as retriever_error:
-            return f"Error retrieving documents: {str(retriever_error)}. Please check if documents are uploaded and the vector store is configured correctly."
+            return f"Error retrieving documents: {str(retriever_error)}. Please check if documents are uploaded and the vector store is configured correctly.", None
         
         # Combine retrieved documents
-        if not source_docs:
-            return "No documents found in the vector database. Please upload a .txt file first via the upload endpoint."
+        if not source_docs and not digest_context:
+            return "No documents found in the vector database. Please upload a .txt file first via the upload endpoint.", None
+        
+        # Build context from pre-normalized chunk text (no per-request cleanup)
+        document_context, _ = chunk_store.build_context(source_docs)
         
-        # Clean PDF extraction artifacts (extra spaces)
-        import re
-        document_context = "\n\n".join([
-            f"Section: {doc.metadata.get('section', 'Unknown')}\n{re.sub(r' +', ' ', doc.page_content)}"
-            for doc in source_docs
-        ])
+        if digest_context:
+            document_context = f"{digest_context}\n\n---\n\nSupporting Excerpts:\n\n{document_context}"
         
         # If no documents found, return helpful message
         if not document_context.strip():
-            return "Documents retrieved but no content found. Please check the uploaded document format."
+            return "Documents retrieved but no content found. Please check the uploaded document format.", None
         
-        # Create chain
+        # Format prompt, log its size, and execute analysis with retrieved context
         try:
-            chain = analysis_prompt | llm
-            
-            # Execute analysis with retrieved context
-            response = chain.invoke({
+            prompt_value = analysis_prompt.invoke({
                 "document": document_context,
                 "request": request
             })
+            report_prompt("insights_tool", source_docs, prompt_value.to_string())
+            # Static system prompt (plus the report, with PROMPT_CACHE_DOCUMENTS) as a cached prefix
+            response = invoke_llm(
+                llm, prompt_value,
+                cache_prefix="insights_tool", prefix_messages=2 if Config.PROMPT_CACHE_DOCUMENTS else 1
+            )
         except Exception as llm_error:
-            return f"Error calling language model: {str(llm_error)}. Please check API key and model configuration."
+            return f"Error calling language model: {str(llm_error)}. Please check API key and model configuration.", None
         
         # Extract content
         insights = response.content if hasattr(response, 'content') else str(response)
         
         if not insights or insights.strip() == "":
-            return "Received empty response from the language model. Please try again."
+            return "Received empty response from the language model. Please try again.", None
         
         # Add metadata footer
-        footer = "\n\n---\n💡 **Analysis Type**: Strategic Insights\n📊 **Source**: Uploaded Documents"
+        source_label = "Precomputed Digests + Uploaded Documents" if digest_context else "Uploaded Documents"
+        footer = f"\n\n---\n💡 **Analysis Type**: Strategic Insights\n📊 **Source**: {source_label}"
         
-        return f"{insights}{footer}"
+        return f"{insights}{footer}", {"insights": insights, "source": source_label}
         
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
-        return f"Error generating insights: {str(e)}\n\nDetails: {error_details[:500]}"
+        return f"Error generating insights: {str(e)}\n\nDetails: {error_details[:500]}", None
 
@@ -1,6 +1,7 @@
 """
 Q&A Tool using RAG (Retrieval-Augmented Generation).
 """
+from typing import Optional, Tuple
 from langchain_core.tools import tool
 from langchain_core.prompts import ChatPromptTemplate
 try:
@@ -17,13 +18,14 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import Config
-from services.vector_store import VectorStoreManager
+from services.vector_store import get_vector_store_manager
+from services.retrieval_depth import report_prompt
+from services.single_flight import invoke_llm
 
 
 # Initialize components
-vector_store_manager = VectorStoreManager()
-# Get retriever with lower threshold for better recall
-retriever = vector_store_manager.get_retriever(k=8, score_threshold=0.3)
+vector_store_manager = get_vector_store_manager()
+chunk_store = vector_store_manager.chunk_store
 
 llm = ChatGoogleGenerativeAI(
     model=Config.GEMINI_MODEL,
@@ -33,8 +35,8 @@ llm = ChatGoogleGenerativeAI(
 )
 
 
-@tool
-def qa_tool(query: str) -> str:
+@tool(response_format="content_and_artifact")
+def qa_tool(query: str) -> Tuple[str, Optional[dict]]:
     """
     Answer QUICK, FACTUAL questions about market research documents. Provides concise, direct answers.
     
@@ -57,38 +59,30 @@ def qa_tool(query: str) -> str:
         query: The factual question to answer from the report
         
     Returns:
-        Concise answer with source citations
+        Concise answer with source citations (the answer and sources are also
+        returned as a structured artifact)
     """
     try:
-        # Retrieve relevant documents (LangChain 1.0 uses .invoke() instead of .get_relevant_documents())
+        # Retrieve relevant documents (lower threshold for better recall; falls back
+        # to unfiltered results and reranks when enabled). k adapts to the score
+        # curve, so simple lookups send only the few chunks that matter.
         try:
-            source_docs = retriever.invoke(query)
-            
-            # Fallback: if threshold filtering removed all docs, try without threshold
-            if not source_docs:
-                fallback_retriever = vector_store_manager.get_retriever(k=8, score_threshold=None)
-                source_docs = fallback_retriever.invoke(query)
-                
+            source_docs = vector_store_manager.retrieve(
+                query, k=Config.QA_MAX_K, score_threshold=0.3, min_k=Config.QA_MIN_K
+            )
         except Exception as retriever_error:
-            return f"Error retrieving documents: {str(retriever_error)}. Please check if documents are uploaded and the vector store is configured correctly."
+            return f"Error retrieving documents: {str(retriever_error)}. Please check if documents are uploaded and the vector store is configured correctly.", None
 
         # Prepare context
         if not source_docs:
-            return "No relevant documents found in the vector database. Please upload a .txt file first via the upload endpoint."
+            return "No relevant documents found in the vector database. Please upload a .txt file first via the upload endpoint.", None
 
-        # Clean and prepare context (remove extra spaces from PDF extraction)
-        import re
-        cleaned_docs = []
-        for doc in source_docs:
-            # Replace multiple spaces with single space
-            cleaned_text = re.sub(r'\s+', ' ', doc.page_content)
-            cleaned_docs.append(cleaned_text)
-        
-        context = "\n\n".join(cleaned_docs)
+        # Prepare context from pre-normalized chunk text (no per-request cleanup)
+        context, unique_sources = chunk_store.build_context(source_docs, with_sections=False)
 
         # Check if context is empty
         if not context.strip():
-            return "Documents retrieved but no content found. Please check the uploaded document format."
+            return "Documents retrieved but no content found. Please check the uploaded document format.", None
 
         # Build prompt template (proper messages format for Gemini)
         qa_prompt = ChatPromptTemplate.from_messages([
@@ -96,15 +90,16 @@ def qa_tool(query: str) -> str:
             ("human", "Context:\n{context}\n\nQuestion: {query}")
         ])
 
-        # Create chain and invoke
+        # Format prompt, log its size, and invoke
         try:
-            chain = qa_prompt | llm
-            answer_msg = chain.invoke({
+            prompt_value = qa_prompt.invoke({
                 "context": context,
                 "query": query
             })
+            report_prompt("qa_tool", source_docs, prompt_value.to_string())
+            answer_msg = invoke_llm(llm, prompt_value)
         except Exception as llm_error:
-            return f"Error calling language model: {str(llm_error)}. Please check API key and model configuration."
+            return f"Error calling language model: {str(llm_error)}. Please check API key and model configuration.", None
 
         # Normalize answer text
         try:
@@ -113,23 +108,17 @@ def qa_tool(query: str) -> str:
             answer = str(answer_msg)
         
         if not answer or answer.strip() == "":
-            return "Received empty response from the language model. Please try again."
+            return "Received empty response from the language model. Please try again.", None
 
-        # Extract sources
-        sources = [
-            doc.metadata.get("section", "Unknown Section")
-            for doc in source_docs
-        ]
-        
-        # Format response with citations
-        unique_sources = list(set(sources))
+        # Format response with citations (ordered, de-duplicated section titles)
+        data = {"answer": answer, "sources": unique_sources}
         if unique_sources:
             citations = f"\n\n📚 Sources: {', '.join(unique_sources)}"
-            return f"{answer}{citations}"
+            return f"{answer}{citations}", data
         
-        return answer
+        return answer, data
         
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
-        return f"Error processing query: {str(e)}\n\nDetails: {error_details[:500]}"  # Limit error details length
\ No newline at end of file
+        return f"Error processing query: {str(e)}\n\nDetails: {error_details[:500]}", None  # Limit error details length
\ No newline at end of file
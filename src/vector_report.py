@@ -0,0 +1,180 @@
+"""
+Memory/recall report for the local vector codecs.
+
+Reads document vectors for the chunk store from the embedding cache,
+holds out a set of queries, and measures each codec (float32, float16, int8,
+pq) against exact float32 search: bytes per vector, memory for the sample
+and projected for a larger corpus, recall@k without and with exact
+rescoring, and search latency.
+
+Codes are memory-mapped and shared by worker processes, but the chunk
+store keeps all chunk text in RAM in every process; the report states that
+cost too (per worker, for the current corpus and projected).
+
+Usage:
+    python src/vector_report.py
+    python src/vector_report.py --codecs int8,pq --k 10 --queries 500
+    python src/vector_report.py --query-file queries.txt --project-rows 50000000
+    python src/vector_report.py --pq-subvectors 96 --json
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+# Add src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import Config
+
+
+def load_vectors(sample: int, embed_missing: bool) -> np.ndarray:
+    """Vectors for up to `sample` chunk-store rows (from the embedding cache)."""
+    from services.chunk_store import get_chunk_store
+    from services.embedding_cache import get_embedding_cache
+
+    table = get_chunk_store().table()
+    rows = len(table)
+    picked = np.sort(np.random.default_rng(0).choice(rows, min(sample, rows), replace=False)) if rows else []
+
+    cache = get_embedding_cache()
+    vectors, missing = [], []
+    for start in range(0, len(picked), 4096):
+        texts = [table.text(int(row)) for row in picked[start:start + 4096]]
+        for text, vector in zip(texts, cache.get_many(texts)):
+            if vector is not None:
+                vectors.append(vector)
+            else:
+                missing.append(text)
+    if missing:
+        if embed_missing:
+            from services.embeddings import get_embeddings
+            print(f"[VectorReport] Embedding {len(missing)} chunks missing from the embedding cache")
+            vectors.extend(get_embeddings().embed_documents(missing))
+        else:
+            print(f"[VectorReport] Skipping {len(missing)} chunks missing from the embedding cache (--embed-missing to include)")
+    return np.asarray(vectors, dtype=np.float32).reshape(-1, Config.EMBEDDING_DIMENSION)
+
+
+def chunk_text_cost(project_rows: int) -> Dict:
+    """RAM the chunk store holds per worker process (text buffer and row arrays)."""
+    from services.chunk_store import get_chunk_store
+
+    table = get_chunk_store().table()
+    rows = len(table)
+    row_bytes = table.offsets.itemsize + table.section_ids.itemsize + table.source_ids.itemsize
+    total = len(table.text_buffer) + rows * row_bytes
+    per_chunk = total / rows if rows else 0.0
+    return {
+        "chunks": rows,
+        "mb_per_worker": round(total / 1e6, 2),
+        "bytes_per_chunk": round(per_chunk, 1),
+        "projected_gb_per_worker": round(project_rows * per_chunk / 1e9, 2),
+    }
+
+
+def measure(codec_name: str, base: np.ndarray, queries: np.ndarray, truth: List[set], k: int, project_rows: int) -> Dict:
+    """Fit, encode and search with one codec; compare against exact results."""
+    from services.vector_codec import CompressedVectors, make_codec
+
+    codec = make_codec(codec_name, base.shape[1])
+    start_time = time.time()
+    codec.fit(base)
+    vectors = CompressedVectors(codec)
+    vectors.add(base)
+    build_seconds = time.time() - start_time
+
+    def exact(rows: List[int]) -> List[np.ndarray]:
+        return [base[row] for row in rows]
+
+    results = {}
+    for label, rescore in (("approximate", None), ("rescored", exact)):
+        hits, start_time = 0, time.time()
+        for query, expected in zip(queries, truth):
+            found = {row for row, _ in vectors.search(query, k, rescore=rescore)}
+            hits += len(found & expected)
+        results[label] = {
+            "recall": round(hits / (len(queries) * k), 4) if len(queries) else 0.0,
+            "ms_per_query": round((time.time() - start_time) / max(len(queries), 1) * 1000, 2),
+        }
+
+    return {
+        "codec": codec_name,
+        "bytes_per_vector": codec.bytes_per_vector,
+        "compression": round(base.shape[1] * 4 / codec.bytes_per_vector, 1),
+        "sample_mb": round(vectors.nbytes / 1e6, 2),
+        "projected_gb": round(project_rows * codec.bytes_per_vector / 1e9, 2),
+        "build_seconds": round(build_seconds, 2),
+        f"recall@{k}": results["approximate"]["recall"],
+        f"recall@{k}_rescored": results["rescored"]["recall"],
+        "ms_per_query": results["approximate"]["ms_per_query"],
+        "ms_per_query_rescored": results["rescored"]["ms_per_query"],
+    }
+
+
+def run(codecs: List[str], sample: int, queries: int, query_file: str, k: int, project_rows: int, embed_missing: bool) -> List[Dict]:
+    vectors = load_vectors(sample, embed_missing)
+    if query_file:
+        from services.embeddings import get_embeddings
+        texts = [line.strip() for line in open(query_file, encoding="utf-8") if line.strip()]
+        query_vectors = np.asarray(get_embeddings().embed_queries(texts), dtype=np.float32)
+        base = vectors
+    else:
+        # Held-out chunks serve as queries
+        held_out = min(queries, len(vectors) // 10)
+        query_vectors, base = vectors[:held_out], vectors[held_out:]
+    if len(base) < k or not len(query_vectors):
+        raise SystemExit(f"[VectorReport] Not enough vectors ({len(base)} base, {len(query_vectors)} queries); ingest documents first")
+
+    truth = [set(np.argpartition(-(base @ query), k - 1)[:k].tolist()) for query in query_vectors]
+    print(
+        f"[VectorReport] {len(base)} vectors, {len(query_vectors)} queries, k={k} "
+        f"(reference: exact search over {Config.EMBEDDING_CACHE_DTYPE} cached vectors)"
+    )
+    return [measure(name, base, query_vectors, truth, k, project_rows) for name in codecs]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Report memory vs recall for compressed vector codecs.")
+    parser.add_argument("--codecs", default="float32,float16,int8,pq", help="Comma-separated codecs to compare")
+    parser.add_argument("--sample", type=int, default=200000, help="Chunk vectors to load")
+    parser.add_argument("--queries", type=int, default=200, help="Held-out chunks used as queries")
+    parser.add_argument("--query-file", default="", help="Text file of real queries, one per line (embeds them)")
+    parser.add_argument("--k", type=int, default=Config.RETRIEVAL_K, help="Results per query")
+    parser.add_argument("--project-rows", type=int, default=10_000_000, help="Corpus size for the memory projection")
+    parser.add_argument("--pq-subvectors", type=int, default=Config.PQ_SUBVECTORS, help="PQ bytes per vector")
+    parser.add_argument("--embed-missing", action="store_true", help="Embed chunks missing from the embedding cache")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    Config.PQ_SUBVECTORS = args.pq_subvectors
+    rows = run(
+        [name.strip() for name in args.codecs.split(",") if name.strip()],
+        args.sample, args.queries, args.query_file, args.k, args.project_rows, args.embed_missing
+    )
+
+    text_cost = chunk_text_cost(args.project_rows)
+
+    if args.json:
+        print(json.dumps({"codecs": rows, "chunk_store_text": text_cost}, indent=2))
+        return 0
+    columns = list(rows[0])
+    widths = [max(len(column), *(len(str(row[column])) for row in rows)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[column]).ljust(width) for column, width in zip(columns, widths)))
+    print(f"(projected_gb: codes for {args.project_rows:,} vectors, mapped once and shared by all workers)")
+    print(
+        f"Chunk store text (in RAM in every worker): {text_cost['mb_per_worker']} MB for {text_cost['chunks']} chunks, "
+        f"{text_cost['bytes_per_chunk']} bytes/chunk, ~{text_cost['projected_gb_per_worker']} GB per worker "
+        f"at {args.project_rows:,} chunks"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
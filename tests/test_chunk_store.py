@@ -0,0 +1,73 @@
+"""Tests for the append-log chunk store (dedup, reload, rewrites and generations)."""
+import sys
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from services.chunk_store import ChunkStore, normalize_chunk_text
+
+
+def doc(text: str, source: str = "a.txt", section: str = "1. Intro") -> Document:
+    return Document(page_content=text, metadata={"source": source, "section": section})
+
+
+def test_add_is_idempotent_and_tags_chunk_keys(tmp_path):
+    store = ChunkStore(str(tmp_path / "chunks.log"))
+    first = [doc("alpha"), doc("beta")]
+    assert store.add_documents(first) == [0, 1]
+    assert store.add_documents([doc("beta"), doc("gamma")]) == [1, 2]
+    assert len(store) == 3
+    assert store.get(first[1].metadata["chunk_key"]) == ("beta", "1. Intro")
+
+
+def test_other_processes_see_appends(tmp_path):
+    path = str(tmp_path / "chunks.log")
+    writer, reader = ChunkStore(path), ChunkStore(path)
+    writer.add_documents([doc("alpha"), doc("beta", source="b.txt")])
+    assert reader.source_counts() == {"a.txt": 1, "b.txt": 1}
+    assert ChunkStore(path).source_sections("a.txt") == [("1. Intro", ["alpha"])]
+
+
+def test_remove_source_rewrites_under_a_new_generation(tmp_path):
+    path = str(tmp_path / "chunks.log")
+    store, other = ChunkStore(path), ChunkStore(path)
+    store.add_documents([doc("alpha"), doc("beta", source="b.txt"), doc("gamma")])
+    old_table = other.table()
+
+    assert store.remove_source("a.txt") == 2
+    assert store.generation != old_table.generation
+    assert store.source_counts() == {"b.txt": 1}
+    assert store.text(0) == "beta"
+    # A table held across the rewrite keeps its own consistent rows
+    assert [old_table.text(row) for row in range(len(old_table))] == ["alpha", "beta", "gamma"]
+    assert other.table().generation == store.generation
+    assert other.source_counts() == {"b.txt": 1}
+
+
+def test_remove_source_keeps_requested_keys(tmp_path):
+    store = ChunkStore(str(tmp_path / "chunks.log"))
+    old, new = doc("old version"), doc("new version")
+    store.add_documents([old, new])
+    assert store.remove_source("a.txt", keep_keys={new.metadata["chunk_key"]}) == 1
+    assert list(store.texts()) == ["new version"]
+
+
+def test_build_context_falls_back_for_unknown_chunks(tmp_path):
+    store = ChunkStore(str(tmp_path / "chunks.log"))
+    stored = doc("stored chunk", section="2. Market")
+    store.add_documents([stored])
+    legacy = doc("legacy   chunk  ", section="3. Legacy")
+
+    context, citations = store.build_context([stored, legacy, stored])
+    assert context.split("\n\n") == [
+        "Section: 2. Market\nstored chunk",
+        "Section: 3. Legacy\nlegacy chunk",
+        "Section: 2. Market\nstored chunk",
+    ]
+    assert citations == ["2. Market", "3. Legacy"]
+
+
+def test_normalize_chunk_text():
+    assert normalize_chunk_text("  a   b \n\n\t c  d ") == "a b\nc d"
@@ -0,0 +1,67 @@
+"""Tests for bulk-ingest work items and checkpoint resume."""
+import json
+import sys
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from ingest import ARCHIVE_SEPARATOR, collect_items, load_checkpoint
+
+
+def write_state(path: Path, *entries, partial: str = ""):
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+        f.write(partial)
+
+
+def test_missing_checkpoint_is_empty(tmp_path):
+    assert load_checkpoint(str(tmp_path / "state.jsonl")) == {}
+
+
+def test_last_entry_per_key_wins(tmp_path):
+    state = tmp_path / "state.jsonl"
+    write_state(
+        state,
+        {"key": "a", "status": "success", "chunks": 3},
+        {"key": "b", "status": "success", "chunks": 1},
+        {"key": "b", "status": "error", "error": "boom"},
+        {"key": "c", "status": "error", "error": "boom"},
+        {"key": "c", "status": "success", "chunks": 2},
+    )
+
+    completed = load_checkpoint(str(state))
+    assert set(completed) == {"a", "c"}
+    assert completed["c"]["chunks"] == 2
+
+
+def test_partial_and_blank_lines_are_skipped(tmp_path):
+    state = tmp_path / "state.jsonl"
+    write_state(state, {"key": "a", "status": "success"}, partial='\n{"key": "b", "stat')
+    assert set(load_checkpoint(str(state))) == {"a"}
+
+
+def test_collect_items_keys_change_with_the_file(tmp_path):
+    docs = tmp_path / "docs"
+    (docs / "sub").mkdir(parents=True)
+    (docs / "a.txt").write_text("alpha")
+    (docs / "sub" / "b.pdf").write_bytes(b"%PDF")
+    (docs / "ignored.md").write_text("skip")
+
+    items = collect_items(str(docs))
+    assert [source for _, source in items] == ["a.txt", str(Path("sub") / "b.pdf")]
+
+    (docs / "a.txt").write_text("alpha, edited")
+    assert collect_items(str(docs))[0][0] != items[0][0]
+
+
+def test_collect_items_from_zip(tmp_path):
+    archive = tmp_path / "docs.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("a.txt", "alpha")
+        zf.writestr("notes.md", "skip")
+
+    [(key, source)] = collect_items(str(archive))
+    assert source == "a.txt"
+    assert key.startswith(f"{archive}{ARCHIVE_SEPARATOR}a.txt:")
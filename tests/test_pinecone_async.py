@@ -0,0 +1,116 @@
+"""Tests for the async Pinecone client against an in-process mock of the REST API."""
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from config import Config
+from services.pinecone_async import AsyncPineconeIndex
+
+HOST = "http://index.test"
+
+
+class MockPinecone:
+    """Records requests; stores vectors per namespace like the data plane."""
+
+    def __init__(self):
+        self.requests = []
+        self.vectors = {}
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content or b"{}")
+        self.requests.append((request.url.path, body))
+        namespace = self.vectors.setdefault(body.get("namespace", ""), {})
+        if request.url.path == "/vectors/upsert":
+            namespace.update({vector["id"]: vector for vector in body["vectors"]})
+            return httpx.Response(200, json={"upsertedCount": len(body["vectors"])})
+        if request.url.path == "/query":
+            matches = [
+                {"id": vector["id"], "score": sum(a * b for a, b in zip(vector["values"], body["vector"])),
+                 "metadata": vector["metadata"]}
+                for vector in namespace.values()
+                if all(vector["metadata"].get(field) == condition["$eq"]
+                       for field, condition in body.get("filter", {}).items())
+            ]
+            matches.sort(key=lambda match: -match["score"])
+            return httpx.Response(200, json={"matches": matches[:body["topK"]]})
+        if request.url.path == "/vectors/delete":
+            if "ids" in body:
+                for vector_id in body["ids"]:
+                    namespace.pop(vector_id, None)
+            else:
+                source = body["filter"]["source"]["$eq"]
+                for vector_id in [i for i, v in namespace.items() if v["metadata"]["source"] == source]:
+                    del namespace[vector_id]
+            return httpx.Response(200)
+        return httpx.Response(404)
+
+
+def make_index(monkeypatch) -> tuple:
+    monkeypatch.setattr(Config, "PINECONE_INDEX_HOST", HOST)
+    monkeypatch.setattr(Config, "PINECONE_UPSERT_BATCH_SIZE", 2)
+    server = MockPinecone()
+    return AsyncPineconeIndex(api_key="test-key", transport=httpx.MockTransport(server)), server
+
+
+def records(source: str, count: int) -> list:
+    return [
+        {"id": f"{source}_chunk_{i}", "values": [1.0, float(i)], "metadata": {"source": source, "text": str(i)}}
+        for i in range(count)
+    ]
+
+
+def test_upsert_in_batches_then_query(monkeypatch):
+    index, server = make_index(monkeypatch)
+
+    async def run():
+        upserted = await index.upsert(records("a.txt", 5))
+        matches = await index.query([0.0, 1.0], top_k=2, metadata_filter={"source": {"$eq": "a.txt"}})
+        await index.close()
+        return upserted, matches
+
+    upserted, matches = asyncio.run(run())
+    assert upserted == 5
+    assert [path for path, _ in server.requests].count("/vectors/upsert") == 3
+    assert [match["id"] for match in matches] == ["a.txt_chunk_4", "a.txt_chunk_3"]
+    assert matches[0]["metadata"]["text"] == "4"
+
+
+def test_delete_by_id_and_by_filter(monkeypatch):
+    index, server = make_index(monkeypatch)
+
+    async def run():
+        await index.upsert(records("a.txt", 3) + records("b.txt", 3))
+        await index.delete(["a.txt_chunk_0"])
+        await index.delete_by_filter({"source": {"$eq": "b.txt"}})
+        await index.close()
+
+    asyncio.run(run())
+    assert sorted(server.vectors[Config.PINECONE_NAMESPACE]) == ["a.txt_chunk_1", "a.txt_chunk_2"]
+    path, body = server.requests[-1]
+    assert body == {"filter": {"source": {"$eq": "b.txt"}}, "namespace": Config.PINECONE_NAMESPACE}
+
+
+def test_one_client_per_event_loop(monkeypatch):
+    index, _ = make_index(monkeypatch)
+
+    async def client():
+        return index._get_client()
+
+    first_loop, second_loop = asyncio.new_event_loop(), asyncio.new_event_loop()
+    first = first_loop.run_until_complete(client())
+    second = second_loop.run_until_complete(client())
+    assert first is not second and not first.is_closed
+    assert first_loop.run_until_complete(client()) is first
+
+    first_loop.run_until_complete(index.close())
+    assert first.is_closed
+    first_loop.close()
+    second_loop.run_until_complete(client())  # Prunes the closed loop's entry
+    assert list(index._clients) == [second_loop]
+    second_loop.run_until_complete(index.close())
+    second_loop.close()
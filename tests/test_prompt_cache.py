@@ -0,0 +1,128 @@
+"""Tests for the fake prompt-cache provider (same prefix/remainder path as Gemini)."""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from services.prompt_cache import FakePromptCache, GeminiPromptCache
+from services.shared_cache import SQLiteCache
+
+
+class Message:
+    def __init__(self, type: str, content: str):
+        self.type = type
+        self.content = content
+
+
+class PromptValue:
+    def __init__(self, *messages: Message):
+        self.messages = list(messages)
+
+    def to_messages(self) -> list:
+        return list(self.messages)
+
+
+class Response:
+    content = "ok"
+    usage_metadata = None
+
+
+class RecordingLLM:
+    model = "fake-model"
+
+    def __init__(self):
+        self.calls = []
+
+    def invoke(self, prompt, **kwargs):
+        messages = prompt.to_messages() if hasattr(prompt, "to_messages") else list(prompt)
+        self.calls.append(([m.content for m in messages], kwargs))
+        return Response()
+
+
+def make_cache(ttl_seconds: float = 3600) -> FakePromptCache:
+    cache = FakePromptCache(ttl_seconds=ttl_seconds)
+    cache.min_tokens = 0
+    return cache
+
+
+def prompt(request: str) -> PromptValue:
+    return PromptValue(Message("system", "Static instructions"), Message("human", request))
+
+
+def test_prefix_registered_once_and_reused():
+    cache, llm = make_cache(), RecordingLLM()
+
+    cache.invoke(llm, prompt("first"), "tool")
+    cache.invoke(llm, prompt("second"), "tool")
+
+    stats = cache.stats()
+    assert (stats["calls"], stats["hits"]) == (2, 2)
+    # The model still receives prefix + remainder, re-attached by the fake provider
+    assert llm.calls[1][0] == ["Static instructions", "second"]
+
+
+def test_expired_prefix_is_resent_in_full_and_re_registered():
+    cache, llm = make_cache(ttl_seconds=0.01), RecordingLLM()
+    cache.invoke(llm, prompt("first"), "tool")
+    time.sleep(0.02)
+
+    cache.invoke(llm, prompt("second"), "tool")
+    assert cache.stats()["invalidations"] == 1
+    assert llm.calls[-1][0] == ["Static instructions", "second"]
+
+    cache.invoke(llm, prompt("third"), "tool")
+    assert cache.stats()["hits"] == 2
+
+
+def test_other_errors_keep_the_registered_prefix():
+    cache = make_cache()
+    cache.invoke(RecordingLLM(), prompt("first"), "tool")
+
+    class FailingLLM(RecordingLLM):
+        def invoke(self, prompt, **kwargs):
+            raise RuntimeError("429 Resource exhausted")
+
+    try:
+        cache.invoke(FailingLLM(), prompt("second"), "tool")
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("transient error was swallowed")
+    assert cache.stats()["invalidations"] == 0
+
+    cache.invoke(RecordingLLM(), prompt("third"), "tool")
+    assert cache.stats()["hits"] == 2
+
+
+def test_gemini_invalidates_only_on_missing_cache():
+    assert GeminiPromptCache._is_missing(RuntimeError("404 CachedContent not found (or permission denied)"))
+    assert not GeminiPromptCache._is_missing(RuntimeError("429 Resource has been exhausted"))
+    assert not GeminiPromptCache._is_missing(RuntimeError("503 The model is overloaded"))
+
+
+def test_prefix_claimed_by_another_worker_is_sent_uncached():
+    cache, llm = make_cache(), RecordingLLM()
+    key = cache._key(llm, "tool", prompt("first").to_messages()[:1])
+    cache._names.add(f"{key}:registering", 1234, ttl=60)
+
+    cache.invoke(llm, prompt("first"), "tool")
+    assert cache.stats()["hits"] == 0
+    assert llm.calls[0][0] == ["Static instructions", "first"]
+    assert cache._prefixes == {}  # Nothing registered by this worker
+
+    cache._names.delete(f"{key}:registering")
+    cache.invoke(llm, prompt("second"), "tool")
+    assert cache.stats()["hits"] == 1
+
+
+def test_sqlite_add_only_sets_absent_or_expired_keys(tmp_path):
+    names = SQLiteCache("prompt_prefixes", path=str(tmp_path / "cache.db"))
+    assert names.add("claim", 1, ttl=60)
+    assert not names.add("claim", 2, ttl=60)
+    assert names.get("claim") == 1
+
+    names.set("expired", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert names.add("expired", 2)
+    assert names.get("expired") == 2
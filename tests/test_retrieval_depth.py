@@ -0,0 +1,49 @@
+"""Tests for adaptive retrieval depth (choose_k) and prompt-size reporting."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from config import Config
+from services.metrics import metrics
+from services.retrieval_depth import choose_k, report_prompt
+
+
+def test_keeps_results_until_the_relative_floor():
+    scores = [0.80, 0.78, 0.76, 0.70, 0.69]
+    assert choose_k(scores, min_k=1, max_k=5, relative_floor=0.9, max_gap=0.1) == (3, "score_floor")
+
+
+def test_stops_at_a_sharp_gap():
+    scores = [0.80, 0.79, 0.70, 0.69]
+    assert choose_k(scores, min_k=1, max_k=4, relative_floor=0.5, max_gap=0.05) == (2, "gap")
+
+
+def test_min_k_is_kept_regardless_of_scores():
+    scores = [0.9, 0.2, 0.1, 0.05]
+    assert choose_k(scores, min_k=3, max_k=4, relative_floor=0.9, max_gap=0.05) == (3, "score_floor")
+
+
+def test_absolute_floor_applies_past_min_k():
+    scores = [0.5, 0.49, 0.48]
+    assert choose_k(scores, min_k=1, max_k=3, min_score=0.485, relative_floor=0.5, max_gap=0.1) == (2, "score_floor")
+
+
+def test_bounds():
+    assert choose_k([0.9, 0.8], min_k=3, max_k=5) == (2, "bounds")
+    assert choose_k([0.9, 0.9, 0.9], min_k=1, max_k=2, relative_floor=0.5, max_gap=0.1) == (2, "max_k")
+    assert choose_k([], min_k=1, max_k=5) == (0, "bounds")
+
+
+def test_report_prompt_records_metrics_and_prints_only_when_verbose(monkeypatch, capsys):
+    monkeypatch.setattr(Config, "VERBOSE_LOGGING", False)
+    before = metrics.snapshot()["observations"].get("test_tool.k", {"count": 0})["count"]
+
+    tokens = report_prompt("test_tool", [object()] * 3, "word " * 100)
+    assert tokens > 0
+    assert metrics.snapshot()["observations"]["test_tool.k"]["count"] == before + 1
+    assert capsys.readouterr().out == ""
+
+    monkeypatch.setattr(Config, "VERBOSE_LOGGING", True)
+    report_prompt("test_tool", [object()] * 3, "word " * 100)
+    assert "[test_tool] k=3" in capsys.readouterr().out
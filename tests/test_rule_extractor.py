@@ -0,0 +1,69 @@
+"""Tests for the rule-based extractor against the sample report in data/."""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from config import Config
+from services.chunk_store import ChunkStore
+from services.document_processor import DocumentProcessor
+from services.rule_extractor import RuleExtractor, extract_from_store
+
+REPORT = Path(__file__).parent.parent / "data" / "innovate_inc_report.pdf"
+SOURCE = REPORT.name
+
+
+@pytest.fixture(scope="module")
+def documents():
+    processor = DocumentProcessor("characters")
+    return processor.process_document(processor.load_document(str(REPORT)), source=SOURCE)
+
+
+@pytest.fixture
+def extracted(documents, tmp_path):
+    store = ChunkStore(str(tmp_path / "chunks"))
+    store.add_documents(documents)
+    return extract_from_store(store, SOURCE)
+
+
+def test_company_and_period_come_from_the_title_line(extracted):
+    data, confidence = extracted
+    assert data["company_name"] == "Innovate Inc."
+    assert data["report_period"] == "Q3 2025"
+    assert confidence["company_name"] >= Config.EXTRACT_MIN_CONFIDENCE
+    assert data["company_market_share_percent"] == 12.0
+
+
+def test_market_figures(extracted):
+    data, _ = extracted
+    assert data["current_market_size_billions"] == 15.0
+    assert data["projected_market_size_2030_billions"] == 40.0
+    assert data["cagr_percent"] == 22.0
+
+
+def test_quoted_names_lose_their_punctuation(extracted):
+    data, _ = extracted
+    assert data["product_name"] == "Automata Pro"
+    assert data["competitors"] == [
+        {"company_name": "Synergy Systems", "market_share": 18.0},
+        {"company_name": "FutureFlow", "market_share": 15.0},
+        {"company_name": "QuantumLeap", "market_share": 3.0},
+    ]
+
+
+def test_bulleted_swot_headers(extracted):
+    data, confidence = extracted
+    swot = data["swot"]
+    assert swot["strengths"] == ["Robust and scalable architecture of Automata Pro", "strong customer loyalty"]
+    assert all(swot[category] for category in ("weaknesses", "opportunities", "threats"))
+    assert confidence["swot"] >= Config.EXTRACT_MIN_CONFIDENCE
+
+
+def test_heading_words_in_a_title_line_are_not_trusted():
+    sections = [("3.  Competitive  Landscape  Acme  Corp.  holds  a  12%  market  share.", "More text.")]
+    data, confidence = RuleExtractor().extract(sections, source="report.txt")
+    assert data["company_name"] == "Acme Corp."
+    assert confidence["company_name"] < Config.EXTRACT_MIN_CONFIDENCE
+    assert data["company_market_share_percent"] == 12.0
@@ -0,0 +1,106 @@
+"""Tests for the priority-lane scheduler."""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from services.scheduler import (
+    ANALYTICAL, BULK, INTERACTIVE, Lane, LaneOverloadedError, LaneScheduler, classify_query,
+)
+
+
+def make_scheduler(total_slots: int = 1, max_wait_seconds: float = 5, **limits) -> LaneScheduler:
+    return LaneScheduler(total_slots, [
+        Lane(name, concurrency=total_slots, max_wait_seconds=max_wait_seconds, **limits)
+        for name in (INTERACTIVE, ANALYTICAL, BULK)
+    ])
+
+
+def test_classify_query():
+    assert classify_query("What is the market share of Innovate Inc.?") == INTERACTIVE
+    assert classify_query("Extract the competitors as JSON") == ANALYTICAL
+
+
+def test_queued_interactive_work_runs_before_bulk():
+    scheduler, order = make_scheduler(), []
+
+    async def job(lane: str, name: str):
+        async with scheduler.slot(lane):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        first = asyncio.ensure_future(job(BULK, "bulk-1"))
+        await asyncio.sleep(0)
+        rest = [asyncio.ensure_future(job(BULK, "bulk-2")), asyncio.ensure_future(job(INTERACTIVE, "interactive"))]
+        await asyncio.gather(first, *rest)
+
+    asyncio.run(run())
+    assert order == ["bulk-1", "interactive", "bulk-2"]
+    assert scheduler.stats()["active"] == 0
+
+
+def test_wait_budget_and_queue_limits_shed():
+    async def run(scheduler: LaneScheduler):
+        async with scheduler.slot(INTERACTIVE):
+            with pytest.raises(LaneOverloadedError) as shed:
+                async with scheduler.slot(INTERACTIVE):
+                    pass
+            return shed.value
+
+    error = asyncio.run(run(make_scheduler(max_wait_seconds=0.01)))
+    assert error.reason == "wait budget exceeded"
+    error = asyncio.run(run(make_scheduler(max_queue=0)))
+    assert (error.reason, error.retry_after) == ("queue full", 5)
+
+
+def test_quota_sheds_beyond_the_wait_budget():
+    scheduler = make_scheduler(total_slots=4, max_wait_seconds=1, rate_per_minute=2)
+
+    async def run():
+        for _ in range(2):
+            async with scheduler.slot(INTERACTIVE):
+                pass
+        with pytest.raises(LaneOverloadedError) as shed:
+            async with scheduler.slot(INTERACTIVE):
+                pass
+        return shed.value
+
+    assert asyncio.run(run()).reason == "quota exhausted"
+    assert scheduler.lanes[INTERACTIVE].stats()["shed"] == 1
+
+
+@pytest.mark.parametrize("spins", range(4))
+def test_cancelled_waiter_never_leaks_a_slot(spins):
+    scheduler = make_scheduler()
+
+    async def run():
+        holder_entered, release = asyncio.Event(), asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot(INTERACTIVE):
+                holder_entered.set()
+                await release.wait()
+
+        async def waiter():
+            async with scheduler.slot(INTERACTIVE):
+                await asyncio.sleep(0.05)
+
+        first = asyncio.ensure_future(holder())
+        await holder_entered.wait()
+        second = asyncio.ensure_future(waiter())
+        await asyncio.sleep(0)
+        release.set()
+        # Cancel at different points around the slot being handed over
+        for _ in range(spins):
+            await asyncio.sleep(0)
+        second.cancel()
+        await asyncio.gather(first, second, return_exceptions=True)
+
+    asyncio.run(run())
+    assert scheduler.stats()["active"] == 0
+    assert scheduler.lanes[INTERACTIVE].stats()["active"] == 0
+    assert scheduler.waiting == 0
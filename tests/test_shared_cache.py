@@ -0,0 +1,36 @@
+"""Tests for the shared cache backends' atomic counter (answer-cache generations)."""
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from services.shared_cache import MemoryCache, SQLiteCache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteCache("answers", path=str(tmp_path / "cache.db"))
+    return MemoryCache("answers")
+
+
+def test_incr_starts_from_zero_and_is_readable(cache):
+    assert cache.incr("__generation__") == 1
+    assert cache.incr("__generation__", 2) == 3
+    assert cache.get("__generation__") == 3
+
+
+def test_concurrent_incr_loses_no_updates(cache):
+    def bump():
+        for _ in range(50):
+            cache.incr("__generation__")
+
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.get("__generation__") == 200
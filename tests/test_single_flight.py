@@ -0,0 +1,85 @@
+"""Tests for thread and event-loop single-flight groups."""
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from services.single_flight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_callers_share_one_run():
+    group, runs, started = SingleFlight("test"), [], threading.Event()
+    release = threading.Event()
+
+    def work():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(group.do("key", work))) for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(runs) == 1
+    assert results == ["result"] * 4
+
+
+def test_errors_reach_every_waiter_and_are_not_kept():
+    group = SingleFlight("test")
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        group.do("key", fail)
+    assert group.do("key", lambda: "retried") == "retried"
+
+
+def test_different_keys_run_separately():
+    group = SingleFlight("test")
+    assert [group.do(key, lambda key=key: key * 2) for key in (1, 2)] == [2, 4]
+
+
+def test_async_callers_share_one_task():
+    group, runs = AsyncSingleFlight("test"), []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def run():
+        return await asyncio.gather(*(group.do("key", work) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["result"] * 5
+    assert len(runs) == 1
+    assert group._tasks == {}
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    group = AsyncSingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        first = asyncio.ensure_future(group.do("key", work))
+        second = asyncio.ensure_future(group.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(run()) == ("result", True)
@@ -0,0 +1,85 @@
+"""Tests for token counting and token-aware chunking.
+
+A whitespace tokenizer stands in for the embedding model's, so the tests
+check the splitter and cache logic without downloading the model.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from config import Config
+from services import document_processor
+from services.document_processor import DocumentProcessor
+from services.tokenizer import TokenCounter
+
+
+class WhitespaceTokenizer:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, texts, **kwargs):
+        self.calls += 1
+        return {"input_ids": [text.split() for text in texts]}
+
+    def num_special_tokens_to_add(self, pair=False):
+        return 2
+
+
+def make_counter(cache_size: int = 1000) -> TokenCounter:
+    counter = TokenCounter(model_name="whitespace", cache_size=cache_size)
+    counter._tokenizer = WhitespaceTokenizer()
+    return counter
+
+
+def test_count_batch_tokenizes_each_distinct_text_once():
+    counter = make_counter()
+    assert counter.count_batch(["a b", "c", "a b"]) == [2, 1, 2]
+    assert counter.count("a b") == 2
+    assert counter.tokenizer.calls == 1
+    assert (counter.hits, counter.misses) == (1, 2)
+
+
+def test_cache_evicts_least_recently_used():
+    counter = make_counter(cache_size=2)
+    counter.count("one")
+    counter.count("two")
+    counter.count("one")
+    counter.count("three")
+    assert list(counter._cache) == ["one", "three"]
+
+
+def test_count_truncated_leaves_room_for_special_tokens():
+    counter = make_counter()
+    budget = counter.max_tokens - 2
+    texts = [" ".join(["w"] * budget), " ".join(["w"] * (budget + 1))]
+    assert counter.count_truncated(texts) == 1
+
+
+def test_token_chunks_fit_the_token_budget(monkeypatch):
+    counter = make_counter()
+    monkeypatch.setattr(document_processor, "get_token_counter", lambda: counter)
+    processor = DocumentProcessor("tokens")
+    assert processor.chunk_mode == "tokens"
+
+    sentence = "Market share grew across every region this quarter."
+    text = "1. Overview\n" + "\n\n".join([" ".join([sentence] * 4)] * 20)
+    documents = processor.process_document(text, source="report.txt")
+
+    assert len(documents) > 1
+    for doc in documents:
+        assert doc.metadata["token_count"] == len(doc.page_content.split())
+        assert doc.metadata["token_count"] <= Config.CHUNK_SIZE_TOKENS
+
+
+def test_missing_tokenizer_falls_back_to_characters(monkeypatch):
+    class Unavailable(TokenCounter):
+        @property
+        def tokenizer(self):
+            raise OSError("model not found")
+
+    monkeypatch.setattr(document_processor, "get_token_counter", lambda: Unavailable(model_name="missing"))
+    processor = DocumentProcessor("tokens")
+    assert processor.chunk_mode == "characters"
+    assert processor.token_counter is None
+    assert processor.text_splitter is processor.char_splitter
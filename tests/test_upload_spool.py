@@ -0,0 +1,64 @@
+"""Tests for chunked upload spooling and its size limit."""
+import asyncio
+import hashlib
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from config import Config
+from services.upload_spool import UploadTooLargeError, spool_upload
+
+
+class FakeUpload:
+    """Minimal UploadFile stand-in that records read sizes."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+        self.reads = []
+
+    async def read(self, size: int) -> bytes:
+        self.reads.append(size)
+        chunk = self.data[self.offset:self.offset + size]
+        self.offset += len(chunk)
+        return chunk
+
+
+@pytest.fixture(autouse=True)
+def spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "UPLOAD_SPOOL_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_upload_is_spooled_in_chunks_with_digest(spool_dir):
+    data = os.urandom(10_000)
+    upload = FakeUpload(data)
+
+    with asyncio.run(spool_upload(upload, max_bytes=20_000, chunk_size=1024, suffix=".pdf")) as spooled:
+        assert spooled.size == len(data)
+        assert spooled.sha256 == hashlib.sha256(data).hexdigest()
+        assert spooled.path.endswith(".pdf")
+        assert Path(spooled.path).read_bytes() == data
+        assert set(upload.reads) == {1024}
+    assert not os.path.exists(spooled.path)
+
+
+def test_upload_at_the_limit_is_accepted():
+    upload = FakeUpload(b"x" * 4096)
+    with asyncio.run(spool_upload(upload, max_bytes=4096, chunk_size=1000)) as spooled:
+        assert spooled.size == 4096
+
+
+def test_oversized_upload_stops_at_the_limit_and_leaves_no_file(spool_dir):
+    upload = FakeUpload(b"x" * 100_000)
+
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(spool_upload(upload, max_bytes=4096, chunk_size=1024))
+
+    # Reading stops once the limit is passed instead of consuming the whole body
+    assert upload.offset == 5 * 1024
+    assert list(spool_dir.iterdir()) == []
@@ -0,0 +1,109 @@
+"""Tests for the compressed vector codecs and the local index's training threshold."""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from config import Config
+from services.chunk_store import ChunkStore
+from services.local_index import LocalVectorIndex
+from services.vector_codec import CODECS, CompressedVectors, PQCodec, make_codec, top_k
+
+DIMENSION = 64
+K = 10
+
+
+def clustered(rows: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors around 32 topics, like embeddings of a mixed corpus."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((32, DIMENSION))
+    vectors = centers[rng.integers(0, len(centers), rows)] + 0.6 * rng.standard_normal((rows, DIMENSION))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    base = clustered(4096)
+    queries = clustered(50, seed=1)
+    truth = [set(top_k(base @ query, K).tolist()) for query in queries]
+    return base, queries, truth
+
+
+def recall(codec_name: str, corpus, rescore: bool = False) -> float:
+    base, queries, truth = corpus
+    codec = PQCodec(DIMENSION, subvectors=16) if codec_name == "pq" else make_codec(codec_name, DIMENSION)
+    codec.fit(base)
+    vectors = CompressedVectors(codec)
+    vectors.add(base)
+    exact = (lambda rows: [base[row] for row in rows]) if rescore else None
+    hits = sum(
+        len({row for row, _ in vectors.search(query, K, rescore=exact)} & expected)
+        for query, expected in zip(queries, truth)
+    )
+    return hits / (K * len(queries))
+
+
+@pytest.mark.parametrize("codec_name, minimum", [("float32", 1.0), ("float16", 0.98), ("int8", 0.9), ("pq", 0.45)])
+def test_recall(corpus, codec_name, minimum):
+    assert recall(codec_name, corpus) >= minimum
+
+
+def test_rescoring_recovers_pq_recall(corpus):
+    assert recall("pq", corpus, rescore=True) >= 0.85
+
+
+@pytest.mark.parametrize("codec_name", sorted(CODECS))
+def test_state_round_trip(codec_name):
+    vectors = clustered(512)
+    codec = PQCodec(DIMENSION, subvectors=16) if codec_name == "pq" else make_codec(codec_name, DIMENSION)
+    codec.fit(vectors)
+    restored = PQCodec(DIMENSION, subvectors=16) if codec_name == "pq" else make_codec(codec_name, DIMENSION)
+    restored.load_state(codec.state())
+    assert np.array_equal(codec.encode(vectors), restored.encode(vectors))
+    assert codec.encode(vectors).shape == (len(vectors), codec.code_width)
+
+
+def test_top_k_is_ordered_and_bounded():
+    scores = np.array([0.1, 0.9, 0.5, 0.7], dtype=np.float32)
+    assert top_k(scores, 2).tolist() == [1, 3]
+    assert top_k(scores, 10).tolist() == [1, 3, 2, 0]
+    assert top_k(scores, 0).tolist() == []
+
+
+class HashEmbeddings:
+    """Deterministic stand-in for the document embedder."""
+
+    def embed_documents(self, texts):
+        return [clustered(1, seed=abs(hash(text)) % 2 ** 32)[0] for text in texts]
+
+
+def wait_for_build(index: LocalVectorIndex):
+    for _ in range(200):
+        if not index.stats()["building"]:
+            return
+        time.sleep(0.01)
+
+
+def test_codec_not_trained_on_a_small_corpus(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "EMBEDDING_DIMENSION", DIMENSION)
+    monkeypatch.setattr(Config, "LOCAL_INDEX_MIN_TRAINING_ROWS", 300)
+    store = ChunkStore(str(tmp_path / "chunks"))
+    index = LocalVectorIndex(HashEmbeddings(), "int8", chunk_store=store, directory=str(tmp_path / "index"))
+
+    store.add_documents([Document(page_content=f"chunk {i}", metadata={"source": "a.txt"}) for i in range(100)])
+    assert index.search(clustered(1)[0], 5) is None
+    wait_for_build(index)
+    assert not index.state_path.exists()
+    assert index.search(clustered(1)[0], 5) is None  # Still on Pinecone
+
+    store.add_documents([Document(page_content=f"chunk {i}", metadata={"source": "b.txt"}) for i in range(100, 400)])
+    index.search(clustered(1)[0], 5)
+    wait_for_build(index)
+    assert index.state_path.exists()
+    table, hits = index.search(clustered(1)[0], 5)
+    assert len(hits) == 5 and len(table) == 400